@@ -5,11 +5,11 @@ Aplicação Flask principal
 
 from flask import Flask, render_template, request, jsonify, Response, send_file, session, redirect, url_for, make_response
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from datetime import datetime
+from datetime import datetime, date
 import csv
+import io
 import os
 import json
-import re
 import subprocess
 import signal
 import threading
@@ -23,10 +23,20 @@ import websocket
 import base64
 from urllib.parse import urlparse, urljoin, quote as url_quote, unquote
 import zipfile
+import zlib
 import tempfile
-import calendar
-from config import WORKDIR, PYTHONPATH, AUTOREGPATH, CORE_README_PATH, DOCKER_CONTAINER, USE_DOCKER, SECRET_KEY
+import hashlib
+from markupsafe import escape
+from config import WORKDIR, PYTHONPATH, AUTOREGPATH, CORE_README_PATH, DOCKER_CONTAINER, USE_DOCKER, SECRET_KEY, ROBO_URL, ROBO_UPSTREAM_URL, ROBO_PROXY_MODO, ROBO_REWRITE_PROCESSOS, ROBO_PREWARM, RELATORIO_BACKEND, RELATORIO_GRUPO_MS, RELATORIO_GRUPO_MAX
 from auth import autenticar, listar_usuarios, adicionar_usuario, remover_usuario, alterar_senha, usuario_existe, obter_usuario_por_chave_api, gerar_chaves_para_usuarios_existentes
+from proxy_rewrite import rewrite_body_timed, rewrite_body_prefix_timed, rewrite_body_stream, rewrite_body_prefix_stream, is_streamable
+from rewrite_pool import RewritePool
+from proxy_prewarm import ProxyWarmer
+from proxy_cache import ProxyCache, CachedResponse, is_cacheable, is_fingerprinted, compute_etag, HEADERS_CACHE_ORIGINAL
+from compression import Compressor
+from metrics import registry as metricas
+from relatorios import abrir_store, GravadorEmGrupo, CABECALHO, Registro, Filtro, parse_data, parse_data_filtro, parse_hora, formatar_hora
+from producao import dados_graficos, dados_mapa_calor, agregar, CacheConsultas, DIMENSOES_AGREGACAO, METRICAS_AGREGACAO
 
 # Desabilitar avisos de SSL não verificado
 warnings.filterwarnings('ignore', category=InsecureRequestWarning)
@@ -66,6 +76,46 @@ def jsonify_with_cors(data, status_code=200):
 # Aplicar CORS a todas as respostas
 app.after_request(adicionar_cors_headers)
 
+# Compressão negociada (brotli/gzip) de respostas grandes
+compressor = Compressor()
+
+
+def comprimir_resposta(response):
+    """
+    Comprime respostas em memória (JSON, HTML, CSS, JS...) conforme o Accept-Encoding
+    
+    Respostas em streaming (SSE), arquivos servidos diretamente, respostas
+    parciais e corpos já codificados não são tocados.
+    """
+    if (request.method == 'HEAD' or response.status_code != 200
+            or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or 'no-transform' in response.headers.get('Cache-Control', '')):
+        return response
+    
+    if not compressor.is_compressible(response.mimetype, response.calculate_content_length() or 0):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    encoding = compressor.negotiate(request.accept_encodings)
+    if not encoding:
+        return response
+    
+    corpo = compressor.compress(response.get_data(), encoding)
+    if corpo is None:
+        return response
+    
+    response.set_data(corpo)
+    response.headers['Content-Encoding'] = encoding
+    # ETag forte precisa ser diferente para cada codificação
+    etag, fraco = response.get_etag()
+    if etag and not fraco:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
+
+
+app.after_request(comprimir_resposta)
+
 # Gerar chaves de API para usuários existentes na inicialização
 # Isso garante que todos os usuários tenham chaves, mesmo os criados antes desta funcionalidade
 try:
@@ -277,7 +327,9 @@ def api_logout():
 @login_required
 def index():
     """Página inicial do sistema AUTOREG"""
-    return render_template('index.html')
+    # No modo prefixo o front-end abre o robô em /robo/; no modo query usa /api/robo-proxy?url=...
+    robo_url, _ = url_entrada_robo()
+    return render_template('index.html', robo_url=robo_url)
 
 
 @app.route('/api/docker/status')
@@ -888,12 +940,7 @@ def api_imprimir_tcs_pdf():
     if not pdf_path or not pdf_path.exists():
         return jsonify({'error': 'Nenhum arquivo PDF encontrado'}), 404
     
-    return send_file(
-        str(pdf_path),
-        mimetype='application/pdf',
-        as_attachment=False,
-        download_name=pdf_path.name
-    )
+    return enviar_pdf(pdf_path)
 
 
 @app.route('/api/imprimir-tcs/pdf/<nome_arquivo>')
@@ -920,12 +967,35 @@ def api_imprimir_tcs_pdf_especifico(nome_arquivo):
     if not pdf_path.name.startswith('solicitacoes_exames_imprimir') or pdf_path.suffix != '.pdf':
         return jsonify({'error': 'Arquivo inválido'}), 400
     
-    return send_file(
+    return enviar_pdf(pdf_path)
+
+
+def enviar_pdf(pdf_path):
+    """
+    Serve um PDF com respostas condicionais (ETag/Last-Modified -> 304) e
+    parciais (Range/If-Range -> 206)
+    
+    O arquivo é entregue pelo wsgi.file_wrapper, então o Gunicorn usa sendfile
+    nas respostas completas. O ETag forte (mtime, tamanho e caminho) faz o
+    If-Range do visualizador de PDF detectar quando o arquivo mudou; sem cache
+    longo, pois /api/imprimir-tcs/pdf aponta para o PDF mais recente.
+    """
+    response = send_file(
         str(pdf_path),
         mimetype='application/pdf',
         as_attachment=False,
-        download_name=pdf_path.name
+        download_name=pdf_path.name,
+        conditional=True,
+        etag=True,
+        last_modified=pdf_path.stat().st_mtime,
+        max_age=None
     )
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    # Anunciar suporte a Range também na resposta completa: o visualizador de
+    # PDF só passa a carregar por trechos quando vê este header
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
 
 
 @app.route('/api/imprimir-tcs/historico', methods=['GET'])
@@ -946,6 +1016,35 @@ def api_imprimir_tcs_historico():
         }), 500
 
 
+# Cache das respostas reescritas pelo proxy do robô (compartilhado entre as threads do worker)
+proxy_cache = ProxyCache()
+
+# Reescrita de corpos grandes em processos separados, para não segurar o GIL
+# das threads que servem os streams SSE
+rewrite_pool = RewritePool(max_workers=ROBO_REWRITE_PROCESSOS)
+
+# Prefixo sob o qual o servidor do robô é montado no modo prefixo
+ROBO_PREFIXO = '/robo'
+
+# Corpos maiores que isso não são carregados inteiros na memória: são
+# repassados (e reescritos, no caso de HTML/CSS) em streaming, sem cache
+PROXY_LIMIAR_STREAM = 1024 * 1024
+PROXY_TAMANHO_BLOCO = 64 * 1024
+
+# Headers do servidor original que não são repassados (bloqueiam o iframe ou
+# deixam de valer após a reescrita)
+PROXY_HEADERS_EXCLUIDOS = (
+    'x-frame-options',
+    'content-security-policy',
+    'x-content-type-options',
+    'strict-transport-security',
+    'content-encoding',
+    'content-length',
+    'transfer-encoding',
+    'connection'
+)
+
+
 @app.route('/api/robo-proxy')
 @app.route('/api/robo-proxy/<path:path>')
 @login_required
@@ -955,6 +1054,11 @@ def robo_proxy(path=None):
     Remove headers de segurança e reescreve URLs relativas no HTML
     Conecta diretamente ao servidor VNC do container Docker
     """
+    return proxy_robo_query(path)
+
+
+def proxy_robo_query(path=None):
+    """Proxy do modo query para a requisição atual (usado pela rota e pelo pré-aquecimento)"""
     # URL base do serviço do robô - sempre usar 127.0.0.1:6901
     base_url = request.args.get('url', 'https://127.0.0.1:6901')
     if base_url.startswith('http://'):
@@ -963,7 +1067,6 @@ def robo_proxy(path=None):
     # Construir URL completa
     if path:
         # Se há path, construir URL completa
-        from urllib.parse import urljoin
         target_url = urljoin(base_url.rstrip('/') + '/', path)
     else:
         target_url = base_url
@@ -974,12 +1077,132 @@ def robo_proxy(path=None):
         from urllib.parse import urlencode
         target_url += '?' + urlencode(query_params)
     
+    return executar_proxy_robo(
+        target_url,
+        lambda content, content_type: reescrever_corpo_proxy(content, content_type, base_url, path),
+        lambda content_type: reescritor_stream_proxy(content_type, base_url, path)
+    )
+
+
+@app.route('/robo/')
+@app.route('/robo/<path:path>')
+@login_required
+def robo_proxy_prefixo(path=''):
+    """
+    Proxy do robô no modo prefixo: /robo/<caminho> -> ROBO_UPSTREAM_URL/<caminho>
+    
+    O servidor original é montado 1:1 sob o prefixo, então URLs relativas
+    resolvem naturalmente no navegador; só caminhos absolutos na raiz
+    (/assets/...) precisam receber o prefixo.
+    """
+    return proxy_robo_prefixo(path)
+
+
+def proxy_robo_prefixo(path=''):
+    """Proxy do modo prefixo para a requisição atual (usado pela rota e pelo pré-aquecimento)"""
+    target_url = ROBO_UPSTREAM_URL.rstrip('/') + '/' + path
+    if request.query_string:
+        target_url += '?' + request.query_string.decode('utf-8', errors='ignore')
+    
+    return executar_proxy_robo(target_url, reescrever_corpo_prefixo, reescritor_stream_prefixo)
+
+
+def categoria_conteudo(content_type):
+    """Agrupa o Content-Type em poucas categorias para rotular as métricas"""
+    content_type = (content_type or '').lower()
+    if 'text/html' in content_type:
+        return 'html'
+    if 'javascript' in content_type:
+        return 'js'
+    if 'css' in content_type:
+        return 'css'
+    if 'json' in content_type:
+        return 'json'
+    if content_type.startswith('image/'):
+        return 'imagem'
+    if content_type.startswith('font/') or 'font' in content_type:
+        return 'fonte'
+    if 'wasm' in content_type:
+        return 'wasm'
+    return 'outro'
+
+
+def registrar_tempos_reescrita(content_type, tempos):
+    """Registra os tempos (ms) de decodificação, reescrita e codificação do proxy"""
+    tipo = categoria_conteudo(content_type)
+    for etapa, ms in tempos.items():
+        metricas.observe(f'proxy_{etapa}_ms', ms, tipo=tipo)
+
+
+metricas.describe('proxy_total_ms', 'Tempo total da requisição no proxy do robô (ms)')
+metricas.describe('proxy_upstream_ms', 'Tempo até os headers do servidor do robô: conexão, TLS e espera (ms)')
+metricas.describe('proxy_download_ms', 'Tempo de leitura do corpo do servidor do robô (ms)')
+metricas.describe('proxy_decodificacao_ms', 'Tempo de decodificação do corpo para reescrita (ms)')
+metricas.describe('proxy_reescrita_ms', 'Tempo de reescrita de URLs (ms)')
+metricas.describe('proxy_codificacao_ms', 'Tempo de codificação do corpo reescrito (ms)')
+metricas.describe('proxy_stream_ms', 'Duração das respostas entregues em streaming (ms)')
+metricas.describe('proxy_bytes_entrada', 'Bytes recebidos do servidor do robô')
+metricas.describe('proxy_bytes_saida', 'Bytes entregues ao navegador (antes da compressão do after_request)')
+metricas.describe('proxy_cache', 'Resultado da consulta ao cache do proxy (hit, revalidado, miss)')
+metricas.describe('proxy_respostas', 'Respostas do proxy por status')
+
+
+def executar_proxy_robo(target_url, reescrever, reescritor_stream):
+    """
+    Executa o proxy (_executar_proxy_robo) registrando o tempo total e os bytes entregues
+    """
+    inicio = time.perf_counter()
+    resposta = make_response(_executar_proxy_robo(target_url, reescrever, reescritor_stream))
+    tipo = categoria_conteudo(resposta.mimetype)
+    metricas.observe('proxy_total_ms', (time.perf_counter() - inicio) * 1000, tipo=tipo)
+    metricas.incr('proxy_respostas', tipo=tipo, status=resposta.status_code)
+    if not resposta.is_streamed:
+        metricas.incr('proxy_bytes_saida', resposta.calculate_content_length() or 0, tipo=tipo)
+    return resposta
+
+
+def _executar_proxy_robo(target_url, reescrever, reescritor_stream):
+    """
+    Busca um recurso no servidor do robô e monta a resposta do proxy
+    
+    Args:
+        target_url: URL completa no servidor original
+        reescrever: Função (content, content_type) -> bytes que reescreve o corpo
+        reescritor_stream: Função (content_type) que retorna a função de
+            reescrita em streaming (blocos -> blocos); tipos que não são
+            reescritos (JavaScript, imagens, fontes) passam os blocos sem
+            alteração
+    
+    Respostas reescritas ficam em cache com um ETag calculado sobre o corpo
+    entregue; revalidações do navegador (If-None-Match/If-Modified-Since)
+    são respondidas com 304 aqui mesmo. Corpos acima de PROXY_LIMIAR_STREAM
+    são entregues em streaming, sem passar pelo cache.
+    """
+    # A reescrita depende da URL pedida ao proxy, então ela é a chave do cache
+    cache_key = request.full_path
+    
     try:
+        entrada = proxy_cache.get(cache_key)
+        
+        # Recursos com hash no nome não mudam: responder direto do cache
+        if entrada is not None and entrada.immutable:
+            metricas.incr('proxy_cache', resultado='hit', tipo=categoria_conteudo(entrada.content_type))
+            return resposta_proxy_cache(entrada)
+        
         # Preparar headers para a requisição
         headers = {
             'User-Agent': request.headers.get('User-Agent', 'Mozilla/5.0'),
         }
         
+        # Revalidar a entrada em cache com o servidor original; sem entrada,
+        # pedidos parciais (mídia) seguem para o servidor original
+        if entrada is not None:
+            headers.update(entrada.revalidation_headers())
+        elif request.headers.get('Range'):
+            headers['Range'] = request.headers['Range']
+            if request.headers.get('If-Range'):
+                headers['If-Range'] = request.headers['If-Range']
+        
         # Passar cookies do cliente para o servidor de destino (se necessário)
         # Nota: Para KasmVNC em 127.0.0.1, geralmente não precisa de cookies
         cookies = {}
@@ -997,390 +1220,63 @@ def robo_proxy(path=None):
             timeout=30,
             allow_redirects=True,
             headers=headers,
-            cookies=cookies if cookies else None
+            cookies=cookies if cookies else None,
+            stream=True
         )
         
-        # Obter o conteúdo
-        content = response.content
-        content_type = response.headers.get('content-type', '').lower()
+        # Conteúdo não mudou no servidor original: reaproveitar o corpo já reescrito
+        if entrada is not None and response.status_code == 304:
+            response.close()
+            metricas.observe('proxy_upstream_ms', response.elapsed.total_seconds() * 1000,
+                             tipo=categoria_conteudo(entrada.content_type))
+            metricas.incr('proxy_cache', resultado='revalidado', tipo=categoria_conteudo(entrada.content_type))
+            return resposta_proxy_cache(entrada)
         
-        # Processar diferentes tipos de conteúdo
-        if 'text/html' in content_type:
-            try:
-                # Detectar encoding
-                encoding = 'utf-8'
-                if 'charset=' in content_type:
-                    try:
-                        encoding = content_type.split('charset=')[1].split(';')[0].strip()
-                    except:
-                        pass
-                
-                html_content = content.decode(encoding, errors='ignore')
-                
-                # Não usar <base> pois está causando problemas com resolução de URLs relativas
-                # O navegador resolve URLs relativas baseado no <base>, o que interfere com nosso proxy
-                # Em vez disso, vamos processar todas as URLs no HTML/JS/CSS antes de servir
-                base_href = request.url.split('?')[0]  # URL atual sem query string (para referência)
-                if base_href.startswith('http://'):
-                    base_href = base_href.replace('http://', 'https://', 1)
-                
-                # Remover qualquer tag <base> existente no HTML para evitar interferência
-                html_content = re.sub(r'<base[^>]*>', '', html_content, flags=re.IGNORECASE)
-                
-                # IMPORTANTE: O navegador resolve URLs relativas baseado no caminho do arquivo atual
-                # Se o CSS está em /api/robo-proxy?url=.../assets/file.css e tem url(splash.jpg),
-                # o navegador tenta /api/robo-proxy?url=.../assets/file.css/splash.jpg
-                # Por isso, precisamos reescrever TODAS as URLs relativas no CSS para URLs absolutas
-                
-                # Calcular base path para URLs relativas
-                if path:
-                    # Se há path, o base é o diretório do path
-                    base_path = '/' + '/'.join(path.split('/')[:-1]) if '/' in path else '/'
-                    if not base_path.endswith('/'):
-                        base_path += '/'
-                else:
-                    base_path = '/'
-                
-                # Função para reescrever URLs
-                def rewrite_url(match):
-                    attr = match.group(1)  # href, src, etc.
-                    quote = match.group(2)  # " ou '
-                    url = match.group(3).strip()
-                    
-                    # Se já é URL absoluta externa, manter
-                    if url.startswith(('http://', 'https://', '//', 'data:', 'javascript:', 'mailto:', 'tel:', '#')):
-                        return match.group(0)
-                    
-                    # Se já passa pelo proxy, manter
-                    if url.startswith('/api/robo-proxy'):
-                        return match.group(0)
-                    
-                    # Construir URL completa no servidor original
-                    from urllib.parse import quote as url_quote
-                    if url.startswith('/'):
-                        # URL absoluta relativa ao servidor
-                        original_url = base_url.rstrip('/') + url
-                    elif url.startswith('./'):
-                        # URL relativa ao diretório atual
-                        original_url = base_url.rstrip('/') + base_path.rstrip('/') + '/' + url[2:]
-                    elif url.startswith('../'):
-                        # URL relativa ao diretório pai (simplificar usando base_path)
-                        original_url = base_url.rstrip('/') + base_path.rstrip('/') + '/' + url
-                    else:
-                        # URL relativa ao diretório atual
-                        original_url = base_url.rstrip('/') + base_path.rstrip('/') + '/' + url
-                    
-                    # Codificar a URL para o parâmetro
-                    encoded_url = url_quote(original_url, safe='')
-                    new_url = f'/api/robo-proxy?url={encoded_url}'
-                    
-                    return f'{attr}={quote}{new_url}{quote}'
-                
-                # Reescrever URLs em atributos: href, src, action, etc.
-                html_content = re.sub(
-                    r'\b(href|src|action|formaction|data|background|cite|codebase|longdesc|usemap|profile|manifest)\s*=\s*(["\'])([^"\']+)\2',
-                    rewrite_url,
-                    html_content,
-                    flags=re.IGNORECASE
-                )
-                
-                # Reescrever URLs em CSS: url(...)
-                def rewrite_css_url(match):
-                    quote = match.group(1)  # " ou ' ou nada
-                    url = match.group(2).strip()
-                    
-                    if url.startswith(('http://', 'https://', '//', 'data:', '#')):
-                        return match.group(0)
-                    
-                    if url.startswith('/api/robo-proxy'):
-                        return match.group(0)
-                    
-                    from urllib.parse import quote as url_quote
-                    if url.startswith('/'):
-                        original_url = base_url.rstrip('/') + url
-                    elif url.startswith('./'):
-                        original_url = base_url.rstrip('/') + base_path.rstrip('/') + '/' + url[2:]
-                    elif url.startswith('../'):
-                        original_url = base_url.rstrip('/') + base_path.rstrip('/') + '/' + url
-                    else:
-                        original_url = base_url.rstrip('/') + base_path.rstrip('/') + '/' + url
-                    
-                    encoded_url = url_quote(original_url, safe='')
-                    new_url = f'/api/robo-proxy?url={encoded_url}'
-                    
-                    return f'url({quote}{new_url}{quote})'
-                
-                html_content = re.sub(
-                    r'url\s*\(\s*(["\']?)([^"\'()]+)\1\s*\)',
-                    rewrite_css_url,
-                    html_content,
-                    flags=re.IGNORECASE
-                )
-                
-                # Garantir que base_url seja HTTPS antes de injetar script
-                if base_url.startswith('http://'):
-                    base_url_https = base_url.replace('http://', 'https://', 1)
-                else:
-                    base_url_https = base_url
-                
-                # Injetar script para reescrever WebSocket connections em tempo de execução
-                html_content = inject_websocket_rewrite_script(html_content, base_url_https)
-                
-                content = html_content.encode(encoding)
-            except Exception as e:
-                # Se houver erro ao processar HTML, usar conteúdo original
-                print(f"Erro ao processar HTML: {e}")
-                pass
-        elif 'javascript' in content_type or content_type.endswith('/javascript') or 'application/javascript' in content_type:
-            # Processar arquivos JavaScript para reescrever URLs
-            try:
-                encoding = 'utf-8'
-                js_content = content.decode(encoding, errors='ignore')
-                
-                # Garantir que base_url seja HTTPS
-                if base_url.startswith('http://'):
-                    base_url_https = base_url.replace('http://', 'https://', 1)
-                else:
-                    base_url_https = base_url
-                
-                # Função auxiliar para construir URL do proxy
-                def build_proxy_url(url_path):
-                    """
-                    Constrói URL do proxy para um caminho
-                    IMPORTANTE: URLs relativas são resolvidas pelo navegador baseado no arquivo atual
-                    Por isso, sempre convertemos para URL absoluta na raiz
-                    """
-                    if url_path.startswith('/'):
-                        # URL absoluta - usar diretamente
-                        original_url = base_url_https.rstrip('/') + url_path
-                    elif url_path.startswith('./'):
-                        # URL relativa ao diretório atual
-                        # PROBLEMA: Se JS está em /main.bundle.js e URL é ./assets/file.js
-                        # O navegador tenta /main.bundle.js/assets/file.js (ERRADO!)
-                        # SOLUÇÃO: Converter para URL absoluta na raiz
-                        original_url = base_url_https.rstrip('/') + '/' + url_path[2:]
-                    elif url_path.startswith('../'):
-                        # URL relativa ao diretório pai
-                        # Simplificar: assumir que está na raiz
-                        url_clean = url_path.lstrip('../').lstrip('/')
-                        original_url = base_url_https.rstrip('/') + '/' + url_clean
-                    else:
-                        # URL relativa sem prefixo
-                        # PROBLEMA: Se JS está em /main.bundle.js e URL é assets/file.js
-                        # O navegador tenta /main.bundle.js/assets/file.js (ERRADO!)
-                        # SOLUÇÃO: Converter para URL absoluta na raiz
-                        original_url = base_url_https.rstrip('/') + '/' + url_path
-                    encoded_url = url_quote(original_url, safe='')
-                    return f'/api/robo-proxy?url={encoded_url}'
-                
-                # Reescrever import() dinâmico
-                def rewrite_js_import(match):
-                    import_path = match.group(1).strip().strip('"\'')
-                    if import_path.startswith(('http://', 'https://', '//', '/api/robo-proxy', 'data:', 'blob:')):
-                        return match.group(0)
-                    new_url = build_proxy_url(import_path)
-                    return f'import("{new_url}")'
-                
-                js_content = re.sub(
-                    r'import\s*\(\s*["\']([^"\']+)["\']\s*\)',
-                    rewrite_js_import,
-                    js_content
-                )
-                
-                # Reescrever new WebSocket()
-                def rewrite_websocket(match):
-                    ws_url = match.group(1).strip().strip('"\'')
-                    if ws_url.startswith(('ws://', 'wss://', '/api/robo-ws')):
-                        # Se já é WebSocket, converter para nosso proxy WebSocket
-                        if ws_url.startswith(('ws://', 'wss://')):
-                            # Converter ws:// ou wss:// para nosso proxy
-                            ws_url_clean = ws_url.replace('ws://', '').replace('wss://', '')
-                            if '://' in ws_url_clean:
-                                parsed = urlparse(ws_url_clean if '://' in ws_url_clean else 'https://' + ws_url_clean)
-                                path = parsed.path or '/'
-                                original_url = f'https://{parsed.netloc}{path}'
-                            else:
-                                original_url = base_url_https.rstrip('/') + (ws_url_clean if ws_url_clean.startswith('/') else '/' + ws_url_clean)
-                            encoded_url = url_quote(original_url, safe='')
-                            return f'new WebSocket("/api/robo-ws?url={encoded_url}")'
-                        return match.group(0)
-                    # URL relativa - converter para WebSocket proxy
-                    original_url = base_url_https.rstrip('/') + (ws_url if ws_url.startswith('/') else '/' + ws_url)
-                    encoded_url = url_quote(original_url, safe='')
-                    return f'new WebSocket("/api/robo-ws?url={encoded_url}")'
-                
-                js_content = re.sub(
-                    r'new\s+WebSocket\s*\(\s*["\']([^"\']+)["\']\s*\)',
-                    rewrite_websocket,
-                    js_content,
-                    flags=re.IGNORECASE
-                )
-                
-                # Reescrever fetch()
-                def rewrite_fetch(match):
-                    fetch_url = match.group(1).strip().strip('"\'')
-                    if fetch_url.startswith(('http://', 'https://', '//', 'data:', 'blob:', '/api/robo-proxy')):
-                        # Se já é HTTP/HTTPS absoluto, garantir HTTPS
-                        if fetch_url.startswith('http://'):
-                            fetch_url = fetch_url.replace('http://', 'https://', 1)
-                        return match.group(0).replace(match.group(1), fetch_url)
-                    new_url = build_proxy_url(fetch_url)
-                    return match.group(0).replace(match.group(1), new_url)
-                
-                js_content = re.sub(
-                    r'fetch\s*\(\s*["\']([^"\']+)["\']',
-                    rewrite_fetch,
-                    js_content,
-                    flags=re.IGNORECASE
-                )
-                
-                # Reescrever XMLHttpRequest.open()
-                def rewrite_xhr_open(match):
-                    method = match.group(1)
-                    xhr_url = match.group(2).strip().strip('"\'')
-                    if xhr_url.startswith(('http://', 'https://', '//', 'data:', 'blob:', '/api/robo-proxy')):
-                        if xhr_url.startswith('http://'):
-                            xhr_url = xhr_url.replace('http://', 'https://', 1)
-                        return f'.open({method}, "{xhr_url}"'
-                    new_url = build_proxy_url(xhr_url)
-                    return f'.open({method}, "{new_url}"'
-                
-                js_content = re.sub(
-                    r'\.open\s*\(\s*(["\']?\w+["\']?)\s*,\s*["\']([^"\']+)["\']',
-                    rewrite_xhr_open,
-                    js_content,
-                    flags=re.IGNORECASE
-                )
-                
-                # Reescrever URLs em strings genéricas (para recursos estáticos)
-                def rewrite_js_url_string(match):
-                    full_match = match.group(0)
-                    url = match.group(1)
-                    quote = match.group(2)  # " ou '
-                    
-                    if url.startswith(('http://', 'https://', '//', 'data:', 'blob:', 'javascript:', 'mailto:', 'tel:', '#', '/api/robo-proxy', '/api/robo-ws')):
-                        # Se já é absoluto, garantir HTTPS
-                        if url.startswith('http://'):
-                            url = url.replace('http://', 'https://', 1)
-                        return f'{quote}{url}{quote}'
-                    
-                    # URL relativa - converter para proxy
-                    new_url = build_proxy_url(url)
-                    return f'{quote}{new_url}{quote}'
-                
-                # Padrão mais abrangente para capturar URLs em strings
-                js_content = re.sub(
-                    r'(["\'])((?:\./|\.\./|/)?[^"\']*(?:\.js|\.css|\.png|\.jpg|\.jpeg|\.gif|\.svg|\.woff|\.woff2|\.ttf|\.eot|\.ico|\.mp3|\.oga|\.mp4|\.webm)[^"\']*)\1',
-                    rewrite_js_url_string,
-                    js_content
-                )
-                
-                # Reescrever import.meta.url se existir
-                js_content = re.sub(
-                    r'import\.meta\.url',
-                    f'"{base_href}"',
-                    js_content
-                )
-                
-                content = js_content.encode(encoding)
-            except Exception as e:
-                print(f"Erro ao processar JavaScript: {e}")
-                import traceback
-                traceback.print_exc()
-                pass
-        elif 'css' in content_type or 'text/css' in content_type:
-            # Processar arquivos CSS para reescrever URLs
-            try:
-                encoding = 'utf-8'
-                css_content = content.decode(encoding, errors='ignore')
-                
-                # Determinar o diretório base do arquivo CSS
-                # Se o path é /assets/webutil-Dix4qgyj.css, o base_path é /assets/
-                css_base_path = '/'
-                if path:
-                    # Extrair diretório do path
-                    if '/' in path:
-                        css_base_path = '/' + '/'.join(path.split('/')[:-1]) + '/'
-                    else:
-                        css_base_path = '/'
-                else:
-                    # Se não há path, assumir que está na raiz
-                    css_base_path = '/'
-                
-                # Reescrever URLs em CSS
-                def rewrite_css_url_in_file(match):
-                    quote = match.group(1)  # " ou ' ou nada
-                    url = match.group(2).strip()
-                    
-                    if url.startswith(('http://', 'https://', '//', 'data:', '/api/robo-proxy')):
-                        return match.group(0)
-                    
-                    from urllib.parse import quote as url_quote
-                    
-                    # Resolver URL relativa considerando o contexto do arquivo CSS
-                    if url.startswith('/'):
-                        # URL absoluta - usar diretamente
-                        original_url = base_url.rstrip('/') + url
-                    elif url.startswith('../'):
-                        # URL relativa ao diretório pai
-                        # Simplificar: assumir que está na raiz
-                        url_clean = url.lstrip('../').lstrip('/')
-                        original_url = base_url.rstrip('/') + '/' + url_clean
-                    elif url.startswith('./'):
-                        # URL relativa ao diretório atual do CSS
-                        # PROBLEMA: Se CSS está em /assets/file.css e URL é ./splash.jpg
-                        # O navegador tenta /assets/file.css/splash.jpg (ERRADO!)
-                        # SOLUÇÃO: Converter para URL absoluta na raiz
-                        url_clean = url[2:]  # Remove ./
-                        # Assumir que recursos estão na raiz (mais comum)
-                        original_url = base_url.rstrip('/') + '/' + url_clean
-                    else:
-                        # URL relativa sem prefixo - o navegador resolve baseado no arquivo CSS atual
-                        # PROBLEMA: Se CSS está em /assets/file.css e URL é splash.jpg
-                        # O navegador tenta /assets/file.css/splash.jpg (ERRADO!)
-                        # SOLUÇÃO: Converter para URL absoluta na raiz
-                        original_url = base_url.rstrip('/') + '/' + url
-                    
-                    encoded_url = url_quote(original_url, safe='')
-                    new_url = f'/api/robo-proxy?url={encoded_url}'
-                    return f'url({quote}{new_url}{quote})'
-                
-                # Reescrever URLs em CSS - usar padrão mais abrangente
-                # Capturar url() com ou sem aspas, incluindo espaços
-                css_content = re.sub(
-                    r'url\s*\(\s*(["\']?)([^"\'()]+?)\1\s*\)',
-                    rewrite_css_url_in_file,
-                    css_content,
-                    flags=re.IGNORECASE
-                )
-                
-                # Também reescrever @import
-                def rewrite_css_import(match):
-                    import_url = match.group(1).strip().strip('"\'')
-                    if import_url.startswith(('http://', 'https://', '//', 'data:', '/api/robo-proxy')):
-                        return match.group(0)
-                    from urllib.parse import quote as url_quote
-                    if import_url.startswith('/'):
-                        original_url = base_url.rstrip('/') + import_url
-                    else:
-                        original_url = base_url.rstrip('/') + '/' + import_url
-                    encoded_url = url_quote(original_url, safe='')
-                    new_url = f'/api/robo-proxy?url={encoded_url}'
-                    return f'@import "{new_url}"'
-                
-                css_content = re.sub(
-                    r'@import\s+["\']([^"\']+)["\']',
-                    rewrite_css_import,
-                    css_content,
-                    flags=re.IGNORECASE
-                )
-                
-                content = css_content.encode(encoding)
-            except Exception as e:
-                print(f"Erro ao processar CSS: {e}")
-                import traceback
-                traceback.print_exc()
-                pass
+        content_type = response.headers.get('content-type', '').lower()
+        tipo = categoria_conteudo(content_type)
+        metricas.observe('proxy_upstream_ms', response.elapsed.total_seconds() * 1000, tipo=tipo)
+        
+        if response.status_code == 206:
+            if 'text/html' not in content_type and 'css' not in content_type:
+                return resposta_proxy_parcial(response)
+            # Trecho de conteúdo que precisa ser reescrito: buscar o corpo inteiro
+            response.close()
+            headers.pop('Range', None)
+            headers.pop('If-Range', None)
+            response = requests.get(
+                target_url, verify=False, timeout=30, allow_redirects=True,
+                headers=headers, cookies=cookies if cookies else None, stream=True
+            )
+            content_type = response.headers.get('content-type', '').lower()
+        metricas.incr('proxy_cache', resultado='miss', tipo=tipo)
+        
+        # Obter o conteúdo; corpos grandes seguem em streaming quando o tipo permite
+        inicio_download = time.perf_counter()
+        reescrever_blocos = reescritor_stream(content_type)
+        inicio, restante = ler_inicio_corpo(response, PROXY_LIMIAR_STREAM)
+        if restante is not None:
+            return resposta_proxy_stream(response, inicio, restante, reescrever_blocos)
+        content = b''.join(inicio)
+        metricas.observe('proxy_download_ms', (time.perf_counter() - inicio_download) * 1000, tipo=tipo)
+        metricas.incr('proxy_bytes_entrada', len(content), tipo=tipo)
+        
+        content = reescrever(content, content_type)
+        
+        if is_cacheable(response):
+            # Guardar corpo reescrito com os headers úteis (sem os de cache do original)
+            headers_repassados = [
+                (nome, valor) for nome, valor in response.headers.items()
+                if nome.lower() not in PROXY_HEADERS_EXCLUIDOS and nome.lower() not in HEADERS_CACHE_ORIGINAL
+            ]
+            entrada = CachedResponse(
+                content,
+                response.status_code,
+                headers_repassados,
+                upstream_etag=response.headers.get('etag'),
+                upstream_last_modified=response.headers.get('last-modified'),
+                immutable=is_fingerprinted(target_url)
+            )
+            return resposta_proxy_cache(proxy_cache.put(cache_key, entrada))
         
         # Criar resposta Flask
         flask_response = Response(
@@ -1392,21 +1288,9 @@ def robo_proxy(path=None):
         if 'content-type' in response.headers:
             flask_response.content_type = response.headers['content-type']
         
-        # Remover headers de segurança que bloqueiam iframe
-        excluded_headers = [
-            'x-frame-options',
-            'content-security-policy',
-            'x-content-type-options',
-            'strict-transport-security',
-            'content-encoding',
-            'content-length',
-            'transfer-encoding',
-            'connection'
-        ]
-        
         # Repassar outros headers úteis
         for header_name, header_value in response.headers.items():
-            if header_name.lower() not in excluded_headers:
+            if header_name.lower() not in PROXY_HEADERS_EXCLUIDOS:
                 flask_response.headers[header_name] = header_value
         
         return flask_response
@@ -1428,12 +1312,341 @@ def robo_proxy(path=None):
         }), 500
 
 
-# Função auxiliar para injetar script que reescreve WebSocket connections e corrige URLs
-def inject_websocket_rewrite_script(html_content, base_url_https):
-    """Injeta script JavaScript para reescrever conexões WebSocket e corrigir URLs em tempo de execução"""
+def ler_inicio_corpo(response, limite):
+    """
+    Lê o corpo do servidor original até passar de `limite` bytes
+    
+    Returns:
+        (blocos lidos, iterador com o restante); o iterador é None quando o
+        corpo terminou dentro do limite
+    """
+    tamanho = response.headers.get('content-length')
+    if tamanho and tamanho.isdigit() and int(tamanho) <= limite:
+        return [response.content], None
+    blocos, total = [], 0
+    iterador = response.iter_content(PROXY_TAMANHO_BLOCO)
+    for bloco in iterador:
+        blocos.append(bloco)
+        total += len(bloco)
+        if total > limite:
+            return blocos, iterador
+    return blocos, None
+
+
+def resposta_proxy_parcial(response):
+    """
+    Repassa uma resposta 206 do servidor original (mídia sem reescrita) em streaming
+    
+    Content-Range, Content-Length e os validadores do original são mantidos,
+    pois o corpo é entregue sem alteração.
+    """
+    def gerar():
+        try:
+            yield from response.iter_content(PROXY_TAMANHO_BLOCO)
+        finally:
+            response.close()
+    
+    flask_response = Response(gerar(), status=206)
+    for header_name, header_value in response.headers.items():
+        if header_name.lower() not in PROXY_HEADERS_EXCLUIDOS:
+            flask_response.headers[header_name] = header_value
+    if response.headers.get('content-length') and 'content-encoding' not in response.headers:
+        flask_response.headers['Content-Length'] = response.headers['content-length']
+    return flask_response
+
+
+def resposta_proxy_stream(response, inicio, restante, reescrever_blocos):
+    """
+    Entrega um corpo grande em streaming, reescrevendo bloco a bloco
+    
+    O ETag é derivado dos validadores do servidor original (mais a URL do
+    proxy e a versão do interceptador, dos quais a reescrita depende), então
+    revalidações do navegador ainda podem ser respondidas com 304.
+    """
+    tipo = categoria_conteudo(response.headers.get('content-type'))
+    contagem = {'entrada': 0, 'saida': 0}
+    
+    def blocos_originais():
+        while inicio:
+            bloco = inicio.pop(0)
+            contagem['entrada'] += len(bloco)
+            yield bloco
+        for bloco in restante:
+            contagem['entrada'] += len(bloco)
+            yield bloco
+    
+    def gerar():
+        comeco = time.perf_counter()
+        try:
+            for bloco in reescrever_blocos(blocos_originais()):
+                contagem['saida'] += len(bloco)
+                yield bloco
+        finally:
+            response.close()
+            metricas.observe('proxy_stream_ms', (time.perf_counter() - comeco) * 1000, tipo=tipo)
+            metricas.incr('proxy_bytes_entrada', contagem['entrada'], tipo=tipo)
+            metricas.incr('proxy_bytes_saida', contagem['saida'], tipo=tipo)
+    
+    flask_response = Response(gerar(), status=response.status_code)
+    for header_name, header_value in response.headers.items():
+        nome = header_name.lower()
+        if nome not in PROXY_HEADERS_EXCLUIDOS and nome not in HEADERS_CACHE_ORIGINAL:
+            flask_response.headers[header_name] = header_value
+    
+    validador = response.headers.get('etag') or response.headers.get('last-modified')
+    if response.status_code != 200 or not validador:
+        return flask_response
+    
+    flask_response.set_etag(compute_etag(
+        f'{validador}|{request.full_path}|{ROBO_INTERCEPTOR_VERSAO}'.encode('utf-8')
+    ))
+    if response.headers.get('last-modified'):
+        flask_response.headers['Last-Modified'] = response.headers['last-modified']
+    flask_response.headers['Cache-Control'] = 'private, no-cache'
+    flask_response = flask_response.make_conditional(request)
+    if flask_response.status_code == 304:
+        response.close()
+    return flask_response
+
+
+def resposta_proxy_cache(entrada):
+    """
+    Monta a resposta a partir de uma entrada do cache do proxy
+    
+    Aplica ETag, Last-Modified e Cache-Control próprios, entrega a variante
+    comprimida negociada e responde 304 quando o navegador já tem a mesma versão.
+    """
+    corpo, etag = entrada.body, entrada.etag
+    
+    # Variante comprimida, calculada uma vez e guardada junto da entrada
+    encoding = None
+    if compressor.is_compressible(entrada.content_type, len(entrada.body)):
+        encoding = compressor.negotiate(request.accept_encodings)
+        if encoding:
+            variante = entrada.variants.get(encoding)
+            if variante is None:
+                variante = compressor.compress(entrada.body, encoding, cached=True)
+                if variante is not None:
+                    proxy_cache.add_variant(request.full_path, entrada, encoding, variante)
+            if variante is None:
+                encoding = None
+            else:
+                corpo, etag = variante, f'{entrada.etag}-{encoding}'
+    
+    flask_response = Response(corpo, status=entrada.status)
+    for header_name, header_value in entrada.headers:
+        flask_response.headers[header_name] = header_value
+    if encoding:
+        flask_response.headers['Content-Encoding'] = encoding
+    flask_response.vary.add('Accept-Encoding')
+    flask_response.set_etag(etag)
+    if entrada.upstream_last_modified:
+        flask_response.headers['Last-Modified'] = entrada.upstream_last_modified
+    flask_response.headers['Cache-Control'] = entrada.cache_control
+    # Range/If-Range atendidos sobre o corpo em cache (Accept-Ranges: bytes)
+    return flask_response.make_conditional(request, accept_ranges=True, complete_length=len(corpo))
+
+
+def reescrever_corpo_proxy(content, content_type, base_url, path):
+    """
+    Reescreve as URLs do corpo de uma resposta do proxy conforme o tipo de conteúdo
+
+    A reescrita em si fica em proxy_rewrite.rewrite_body; corpos grandes são
+    processados no rewrite_pool, fora do GIL deste processo. Só HTML e CSS
+    mudam; JavaScript e demais conteúdos passam sem alteração.
+    """
+    if 'text/html' not in content_type and 'css' not in content_type:
+        return content
+    # Tags <base> são removidas e todas as URLs reescritas antes de servir
+    corpo, tempos = rewrite_pool.run(
+        rewrite_body_timed, content, content_type, base_url, path,
+        tag_script_interceptor(base_url)
+    )
+    registrar_tempos_reescrita(content_type, tempos)
+    return corpo
+
+
+def reescritor_stream_proxy(content_type, base_url, path):
+    """Reescrita em streaming do modo query (só HTML/CSS mudam; o resto passa direto)"""
+    if is_streamable(content_type):
+        script_tag = tag_script_interceptor(base_url)
+        return lambda blocos: rewrite_body_stream(blocos, content_type, base_url, path, script_tag)
+    return lambda blocos: blocos
+
+
+def reescrever_corpo_prefixo(content, content_type):
+    """
+    Reescrita mínima do modo prefixo (/robo/<caminho>)
+    
+    Apenas caminhos absolutos na raiz em HTML e CSS recebem o prefixo;
+    JavaScript e demais conteúdos passam sem alteração.
+    """
+    if 'text/html' not in content_type and 'css' not in content_type:
+        return content
+    corpo, tempos = rewrite_pool.run(
+        rewrite_body_prefix_timed, content, content_type, ROBO_PREFIXO,
+        tag_script_interceptor(ROBO_UPSTREAM_URL, prefix=ROBO_PREFIXO)
+    )
+    registrar_tempos_reescrita(content_type, tempos)
+    return corpo
+
+
+def reescritor_stream_prefixo(content_type):
+    """Reescrita em streaming do modo prefixo (só HTML/CSS mudam; o resto passa direto)"""
+    if is_streamable(content_type):
+        script_tag = tag_script_interceptor(ROBO_UPSTREAM_URL, prefix=ROBO_PREFIXO)
+        return lambda blocos: rewrite_body_prefix_stream(blocos, content_type, ROBO_PREFIXO, script_tag)
+    return lambda blocos: blocos
+
+
+# Script de interceptação (WebSocket e correção de URLs) servido como arquivo estático versionado
+ROBO_INTERCEPTOR_PATH = Path(__file__).parent / 'static' / 'js' / 'robo_proxy_interceptor.js'
+ROBO_INTERCEPTOR_JS = ROBO_INTERCEPTOR_PATH.read_bytes()
+ROBO_INTERCEPTOR_VERSAO = hashlib.blake2b(ROBO_INTERCEPTOR_JS, digest_size=6).hexdigest()
+
+
+def url_entrada_robo():
+    """
+    Página de entrada do robô conforme o modo do proxy
+    
+    Returns:
+        (URL local aberta no iframe, URL correspondente no servidor do robô)
+    """
+    if ROBO_PROXY_MODO == 'prefixo':
+        return ROBO_PREFIXO + '/', ROBO_UPSTREAM_URL
+    return '/api/robo-proxy?url=' + url_quote(ROBO_URL, safe=''), ROBO_URL
+
+
+# Funções de proxy por endpoint, para o pré-aquecimento chamar sem passar pelo login
+PROXY_VIEWS = {
+    'robo_proxy': proxy_robo_query,
+    'robo_proxy_prefixo': proxy_robo_prefixo,
+}
+
+
+def buscar_para_prewarm(url):
+    """
+    Executa o proxy para uma URL local, como o navegador faria, e retorna o corpo entregue
+    
+    A requisição anuncia as codificações do compressor, então a variante
+    comprimida também fica pronta no cache.
+    
+    Returns:
+        (status, content_type, texto) - texto é None para conteúdo que não é HTML/CSS/JS
+    """
+    headers = {'User-Agent': 'AUTOREG-prewarm', 'Accept-Encoding': ', '.join(compressor.encodings)}
+    with app.test_request_context(url, headers=headers):
+        view = PROXY_VIEWS.get(request.url_rule.endpoint) if request.url_rule else None
+        if view is None:
+            return 404, '', None
+        resposta = make_response(view(**request.view_args))
+        content_type = resposta.mimetype or ''
+        if resposta.is_streamed or not any(tipo in content_type for tipo in ('html', 'css', 'javascript')):
+            resposta.close()
+            return resposta.status_code, content_type, None
+        entrada = proxy_cache.get(request.full_path)
+        if entrada is not None:
+            corpo = entrada.body
+        elif 'Content-Encoding' not in resposta.headers:
+            corpo = resposta.get_data()
+        else:
+            return resposta.status_code, content_type, None
+        return resposta.status_code, content_type, corpo.decode('utf-8', errors='ignore')
+
+
+def sondar_robo():
+    """Verifica se o servidor do robô responde; a assinatura identifica a versão da entrada"""
+    _, url_upstream = url_entrada_robo()
+    try:
+        response = requests.get(url_upstream, verify=False, timeout=5, stream=True)
+        response.close()
+    except requests.exceptions.RequestException:
+        return False, None
+    assinatura = response.headers.get('etag') or response.headers.get('last-modified')
+    return response.status_code < 500, assinatura
+
+
+aquecedor_proxy = ProxyWarmer(
+    buscar_para_prewarm,
+    sondar_robo,
+    lambda: [url_entrada_robo()[0]],
+    prefixos=('/api/robo-proxy?', '/api/robo-proxy/', ROBO_PREFIXO + '/')
+)
+
+
+def iniciar_aquecedor_proxy():
+    """
+    Inicia o pré-aquecimento do cache do proxy (se ROBO_PREWARM)
+    
+    Chamado pelo servidor (post_worker_init do gunicorn_config.py ou o
+    bloco __main__), nunca na importação: scripts e benchmarks que importam
+    o app não sondam o servidor do robô.
+    """
+    if ROBO_PREWARM:
+        aquecedor_proxy.iniciar()
+
+
+@app.route('/api/metricas')
+@login_required
+def api_metricas():
+    """Métricas do proxy do robô em JSON (histogramas por tipo de conteúdo, bytes e cache) e do store de relatórios"""
+    return jsonify({
+        'success': True,
+        'metricas': metricas.snapshot(),
+        'proxy_cache': proxy_cache.stats(),
+        'rewrite_pool': rewrite_pool.stats(),
+        'prewarm': aquecedor_proxy.stats(),
+        'relatorios': relatorio_store.stats(),
+        'gravador_relatorio': gravador_relatorio.stats(),
+        'cache_producao': cache_producao.stats()
+    })
+
+
+@app.route('/api/metricas/prometheus')
+def api_metricas_prometheus():
+    """
+    Métricas no formato texto do Prometheus
+    
+    Aceita a sessão do usuário ou a chave de API no header X-API-Key
+    (para coletores que não fazem login).
+    """
+    if not current_user.is_authenticated:
+        chave_api = request.headers.get('X-API-Key')
+        if not chave_api or not obter_usuario_por_chave_api(chave_api):
+            return jsonify({'success': False, 'error': 'Não autorizado'}), 401
+    return Response(metricas.prometheus_text(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/robo-proxy-interceptor/<versao>.js')
+def robo_proxy_interceptor(versao):
+    """
+    Serve o script de interceptação injetado nas páginas do proxy
+    
+    A URL contém o hash do conteúdo, então o navegador pode guardá-lo por
+    tempo indeterminado; versões antigas recebem o conteúdo atual sem cache longo.
+    """
+    response = Response(ROBO_INTERCEPTOR_JS, mimetype='application/javascript')
+    response.set_etag(ROBO_INTERCEPTOR_VERSAO)
+    if versao == ROBO_INTERCEPTOR_VERSAO:
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+# Tag do script que reescreve WebSocket connections e corrige URLs (injetada no <head>)
+def tag_script_interceptor(base_url_https, prefix=None):
+    """
+    Monta a tag do script de interceptação (WebSocket e correção de URLs)
+    
+    O script em si é estático e fica em cache no navegador; apenas a URL base
+    do WebSocket e do servidor original (e o prefixo, no modo prefixo) vão
+    nos atributos data-* da tag.
+    """
     # Extrair host e porta do base_url
     try:
-        from urllib.parse import urlparse
         parsed = urlparse(base_url_https)
         ws_host = parsed.netloc
         ws_protocol = 'wss' if parsed.scheme == 'https' else 'ws'
@@ -1442,592 +1655,13 @@ def inject_websocket_rewrite_script(html_content, base_url_https):
         ws_host = '127.0.0.1:6901'
         ws_protocol = 'wss'
     
-    script = f"""
-    <script>
-    (function() {{
-        console.log('[Proxy] Script de interceptação WebSocket carregado');
-        const originalWebSocket = window.WebSocket;
-        const wsBaseUrl = '{ws_protocol}://{ws_host}';
-        const proxyBase = '/api/robo-proxy';
-        const baseUrl = '{base_url_https}';
-        
-        // EXECUTAR IMEDIATAMENTE - antes de qualquer outro script
-        // Interceptar recursos ANTES que sejam carregados pelo CSS
-        // Isso é crítico porque o CSS pode carregar recursos antes que nosso script execute completamente
-        
-        // Função auxiliar para corrigir URLs
-        // DEFINIR PRIMEIRO para que possa ser usada imediatamente
-        function fixUrl(url) {{
-            if (!url || typeof url !== 'string') return url;
-            
-            const originalUrl = url;
-            
-            // Se já é uma URL absoluta válida e passa pelo proxy, manter
-            if (url.startsWith('/api/robo-proxy')) {{
-                // Verificar se a URL está malformada (contém .css/ ou .js/ no path)
-                // Exemplo: /api/robo-proxy?url=https%3A%2F%2F127.0.0.1%3A6901%2Fassets%2Fwebutil-Dix4qgyj.css%2Fsplash-D03O8R4K.jpg
-                if (url.includes('.css/') || url.includes('.js/')) {{
-                    // Extrair a parte após url=
-                    const match = url.match(/url=([^&]+)/);
-                    if (match) {{
-                        try {{
-                            const decodedUrl = decodeURIComponent(match[1]);
-                            console.log('[Proxy] URL malformada detectada, decodificada:', decodedUrl);
-                            
-                            // Extrair o caminho do recurso após .css/ ou .js/
-                            // Padrão: captura o nome do arquivo .css/.js e o caminho após
-                            // Exemplo: /assets/webutil-Dix4qgyj.css/splash-D03O8R4K.jpg
-                            const resourceMatch = decodedUrl.match(/([^/]+\\.(css|js))\\/([^?&#]+)/);
-                            if (resourceMatch) {{
-                                const resourcePath = resourceMatch[3];
-                                // Limpar o caminho do recurso (remover query strings, etc.)
-                                const cleanPath = resourcePath.split('?')[0].split('#')[0];
-                                // Construir URL correta na raiz
-                                // Se o recurso começa com /, usar diretamente, senão adicionar /
-                                const correctedPath = cleanPath.startsWith('/') ? cleanPath : '/' + cleanPath;
-                                const correctedUrl = baseUrl + correctedPath;
-                                const encodedUrl = encodeURIComponent(correctedUrl);
-                                url = proxyBase + '?url=' + encodedUrl;
-                                console.log('[Proxy] URL malformada corrigida:', originalUrl, '->', url);
-                                return url;
-                            }}
-                            
-                            // Tentar padrão alternativo: pode ser que o caminho esteja codificado de forma diferente
-                            // Exemplo: assets%2Fwebutil-Dix4qgyj.css%2Fsplash-D03O8R4K.jpg
-                            const altMatch = decodedUrl.match(/([^/]+\.(css|js))\\/([^?&#]+)/);
-                            if (altMatch) {{
-                                const resourcePath = altMatch[3];
-                                const cleanPath = resourcePath.split('?')[0].split('#')[0];
-                                const correctedPath = cleanPath.startsWith('/') ? cleanPath : '/' + cleanPath;
-                                const correctedUrl = baseUrl + correctedPath;
-                                const encodedUrl = encodeURIComponent(correctedUrl);
-                                url = proxyBase + '?url=' + encodedUrl;
-                                console.log('[Proxy] URL malformada corrigida (padrão alternativo):', originalUrl, '->', url);
-                                return url;
-                            }}
-                        }} catch (e) {{
-                            console.warn('[Proxy] Erro ao decodificar URL:', e, 'URL original:', originalUrl);
-                        }}
-                    }}
-                }}
-                return url;
-            }}
-            
-            // Se começa com /api/ mas não é /api/robo-proxy, reescrever
-            if (url.startsWith('/api/') && !url.startsWith('/api/robo-proxy')) {{
-                const resourcePath = url.replace('/api/', '');
-                const correctedUrl = baseUrl + '/' + resourcePath;
-                const encodedUrl = encodeURIComponent(correctedUrl);
-                url = proxyBase + '?url=' + encodedUrl;
-                console.log('[Proxy] URL /api/ reescrita:', originalUrl, '->', url);
-                return url;
-            }}
-            
-            // Se é URL absoluta externa, manter
-            if (url.startsWith('http://') || url.startsWith('https://') || url.startsWith('//') || 
-                url.startsWith('data:') || url.startsWith('blob:') || url.startsWith('javascript:') || 
-                url.startsWith('mailto:') || url.startsWith('tel:') || url.startsWith('#')) {{
-                return url;
-            }}
-            
-            // Se é URL relativa, converter para proxy
-            const absoluteUrl = url.startsWith('/') ? baseUrl + url : baseUrl + '/' + url;
-            const encodedUrl = encodeURIComponent(absoluteUrl);
-            url = proxyBase + '?url=' + encodedUrl;
-            console.log('[Proxy] URL relativa reescrita:', originalUrl, '->', url);
-            return url;
-        }}
-        
-        // INTERCEPTAÇÃO PRECOCE - Executar ANTES de qualquer outro script
-        // Interceptar fetch() e XMLHttpRequest IMEDIATAMENTE para capturar recursos carregados pelo CSS
-        const originalFetch = window.fetch;
-        window.fetch = function(input, init) {{
-            let url = typeof input === 'string' ? input : (input.url || input);
-            const fixedUrl = fixUrl(url);
-            if (fixedUrl !== url) {{
-                console.log('[Proxy] fetch() URL corrigida (precoce):', url, '->', fixedUrl);
-            }}
-            if (typeof input !== 'string' && input instanceof Request) {{
-                return originalFetch.call(this, new Request(fixedUrl, init || {{}}));
-            }}
-            return originalFetch.call(this, fixedUrl, init);
-        }};
-        
-        const originalXHROpen = XMLHttpRequest.prototype.open;
-        XMLHttpRequest.prototype.open = function(method, url, async, user, password) {{
-            const fixedUrl = fixUrl(url);
-            if (fixedUrl !== url) {{
-                console.log('[Proxy] XMLHttpRequest URL corrigida (precoce):', url, '->', fixedUrl);
-            }}
-            return originalXHROpen.call(this, method, fixedUrl, async, user, password);
-        }};
-        
-        // Interceptar WebSocket - DEVE ser executado antes de qualquer outro script
-        window.WebSocket = function(url, protocols) {{
-            console.log('[Proxy] WebSocket chamado com URL:', url);
-            
-            // Se já é uma URL absoluta wss://, usar diretamente (garantindo HTTPS)
-            if (url.startsWith('wss://')) {{
-                console.log('[Proxy] WebSocket wss:// detectado, usando diretamente');
-                return new originalWebSocket(url, protocols);
-            }}
-            
-            // Se é ws://, converter para wss://
-            if (url.startsWith('ws://')) {{
-                url = url.replace('ws://', 'wss://');
-                console.log('[Proxy] WebSocket ws:// convertido para wss://:', url);
-                return new originalWebSocket(url, protocols);
-            }}
-            
-            // Se é URL relativa, construir URL completa com base
-            let fullUrl;
-            if (url.startsWith('/')) {{
-                fullUrl = wsBaseUrl + url;
-            }} else {{
-                fullUrl = wsBaseUrl + '/' + url;
-            }}
-            
-            console.log('[Proxy] WebSocket rewrite:', url, '->', fullUrl);
-            return new originalWebSocket(fullUrl, protocols);
-        }};
-        
-        // Preservar propriedades do WebSocket original
-        Object.setPrototypeOf(window.WebSocket.prototype, originalWebSocket.prototype);
-        Object.setPrototypeOf(window.WebSocket, originalWebSocket);
-        
-        // Preservar constantes
-        window.WebSocket.CONNECTING = originalWebSocket.CONNECTING;
-        window.WebSocket.OPEN = originalWebSocket.OPEN;
-        window.WebSocket.CLOSING = originalWebSocket.CLOSING;
-        window.WebSocket.CLOSED = originalWebSocket.CLOSED;
-        
-        // Interceptar fetch() para corrigir URLs
-        const originalFetch = window.fetch;
-        window.fetch = function(input, init) {{
-            let url = typeof input === 'string' ? input : (input.url || input);
-            const fixedUrl = fixUrl(url);
-            if (fixedUrl !== url) {{
-                console.log('[Proxy] fetch() URL corrigida:', url, '->', fixedUrl);
-            }}
-            
-            // Se input é um objeto Request, criar novo Request com URL corrigida
-            if (typeof input !== 'string' && input instanceof Request) {{
-                return originalFetch.call(this, new Request(fixedUrl, init || {{}}));
-            }}
-            
-            return originalFetch.call(this, fixedUrl, init);
-        }};
-        
-        
-        // Interceptar todas as requisições de recursos ANTES que sejam feitas
-        // Isso é crítico para recursos carregados pelo CSS
-        const originalCreateElementNS = document.createElementNS;
-        document.createElementNS = function(namespace, tagName, options) {{
-            const element = originalCreateElementNS.call(this, namespace, tagName, options);
-            if (tagName.toLowerCase() === 'style') {{
-                // Interceptar quando CSS é adicionado via <style>
-                const originalTextContent = Object.getOwnPropertyDescriptor(Node.prototype, 'textContent');
-                Object.defineProperty(element, 'textContent', {{
-                    set: function(value) {{
-                        if (value) {{
-                            // Reescrever URLs no CSS inline
-                            value = value.replace(/url\s*\(\s*(["\']?)([^"\'()]+?)\1\s*\)/gi, function(match, quote, url) {{
-                                const fixedUrl = fixUrl(url.trim());
-                                return 'url(' + quote + fixedUrl + quote + ')';
-                            }});
-                        }}
-                        if (originalTextContent && originalTextContent.set) {{
-                            originalTextContent.set.call(this, value);
-                        }} else {{
-                            element.innerHTML = value;
-                        }}
-                    }},
-                    get: function() {{
-                        return originalTextContent && originalTextContent.get ? originalTextContent.get.call(this) : element.innerHTML;
-                    }},
-                    configurable: true
-                }});
-            }}
-            return element;
-        }};
-        
-        // Interceptar todas as requisições de recursos usando Resource Timing API
-        // Mas mais importante: interceptar quando o CSS tenta carregar recursos
-        // Isso é feito interceptando o carregamento de imagens, fontes, etc.
-        
-        // Interceptar Image constructor para capturar imagens carregadas pelo CSS
-        const originalImage = window.Image;
-        window.Image = function(...args) {{
-            const img = new originalImage(...args);
-            const originalSrcSetter = Object.getOwnPropertyDescriptor(HTMLImageElement.prototype, 'src').set;
-            Object.defineProperty(img, 'src', {{
-                set: function(value) {{
-                    const fixedValue = fixUrl(value);
-                    if (fixedValue !== value) {{
-                        console.log('[Proxy] Image src corrigido:', value, '->', fixedValue);
-                    }}
-                    originalSrcSetter.call(this, fixedValue);
-                }},
-                get: function() {{
-                    return this.getAttribute('src');
-                }},
-                configurable: true
-            }});
-            return img;
-        }};
-        
-        // Interceptar FontFace para capturar fontes carregadas pelo CSS
-        if (window.FontFace) {{
-            const originalFontFace = window.FontFace;
-            window.FontFace = function(family, source, descriptors) {{
-                if (typeof source === 'string') {{
-                    source = fixUrl(source);
-                }}
-                return new originalFontFace(family, source, descriptors);
-            }};
-        }}
-        
-        // Interceptar todas as requisições de recursos usando PerformanceObserver
-        // Isso captura recursos carregados pelo CSS antes que sejam requisitados
-        if (window.PerformanceObserver) {{
-            try {{
-                const resourceObserver = new PerformanceObserver(function(list) {{
-                    list.getEntries().forEach(function(entry) {{
-                        if (entry.initiatorType === 'css' || entry.name.includes('.css/') || entry.name.includes('.js/')) {{
-                            const fixedUrl = fixUrl(entry.name);
-                            if (fixedUrl !== entry.name) {{
-                                console.log('[Proxy] Recurso CSS detectado e corrigido:', entry.name, '->', fixedUrl);
-                                // Não podemos redirecionar aqui, mas podemos logar para debug
-                            }}
-                        }}
-                    }});
-                }});
-                resourceObserver.observe({{entryTypes: ['resource']}});
-            }} catch (e) {{
-                console.warn('[Proxy] PerformanceObserver não disponível:', e);
-            }}
-        }}
-        
-        // Interceptar todas as tags <style> para reescrever URLs no CSS inline
-        function rewriteInlineCSS(element) {{
-            if (element.tagName === 'STYLE' && element.textContent) {{
-                const originalContent = element.textContent;
-                const rewritten = originalContent.replace(/url\s*\(\s*(["\']?)([^"\'()]+?)\1\s*\)/gi, function(match, quote, url) {{
-                    const fixedUrl = fixUrl(url.trim());
-                    return 'url(' + quote + fixedUrl + quote + ')';
-                }});
-                if (rewritten !== originalContent) {{
-                    element.textContent = rewritten;
-                    console.log('[Proxy] CSS inline reescrito');
-                }}
-            }}
-        }}
-        
-        // Reescrever CSS inline em elementos existentes
-        document.querySelectorAll('style').forEach(rewriteInlineCSS);
-        
-        // Interceptar quando novos elementos <style> são adicionados
-        const styleObserver = new MutationObserver(function(mutations) {{
-            mutations.forEach(function(mutation) {{
-                mutation.addedNodes.forEach(function(node) {{
-                    if (node.nodeType === 1 && node.tagName === 'STYLE') {{
-                        rewriteInlineCSS(node);
-                    }}
-                }});
-            }});
-        }});
-        styleObserver.observe(document.documentElement, {{
-            childList: true,
-            subtree: true
-        }});
-        
-        // Interceptar recursos carregados pelo CSS usando um interceptor de recursos mais agressivo
-        // Isso captura recursos que são carregados diretamente pelo CSS antes que possamos interceptá-los
-        const originalInsertRule = CSSStyleSheet.prototype.insertRule;
-        CSSStyleSheet.prototype.insertRule = function(rule, index) {{
-            if (rule && typeof rule === 'string') {{
-                const rewritten = rule.replace(/url\s*\(\s*(["\']?)([^"\'()]+?)\1\s*\)/gi, function(match, quote, url) {{
-                    const fixedUrl = fixUrl(url.trim());
-                    return 'url(' + quote + fixedUrl + quote + ')';
-                }});
-                if (rewritten !== rule) {{
-                    console.log('[Proxy] CSS insertRule reescrito');
-                    rule = rewritten;
-                }}
-            }}
-            return originalInsertRule.call(this, rule, index);
-        }};
-        
-        // Interceptar quando estilos são adicionados via CSSStyleSheet
-        const originalAddRule = CSSStyleSheet.prototype.addRule;
-        if (originalAddRule) {{
-            CSSStyleSheet.prototype.addRule = function(selector, style, index) {{
-                if (style && typeof style === 'string') {{
-                    const rewritten = style.replace(/url\s*\(\s*(["\']?)([^"\'()]+?)\1\s*\)/gi, function(match, quote, url) {{
-                        const fixedUrl = fixUrl(url.trim());
-                        return 'url(' + quote + fixedUrl + quote + ')';
-                    }});
-                    if (rewritten !== style) {{
-                        console.log('[Proxy] CSS addRule reescrito');
-                        style = rewritten;
-                    }}
-                }}
-                return originalAddRule.call(this, selector, style, index);
-            }};
-        }}
-        
-        // Interceptar getComputedStyle para corrigir URLs em background-image, etc.
-        const originalGetComputedStyle = window.getComputedStyle;
-        window.getComputedStyle = function(element, pseudoElement) {{
-            const style = originalGetComputedStyle.call(this, element, pseudoElement);
-            
-            // Interceptar getPropertyValue para corrigir URLs
-            const originalGetPropertyValue = style.getPropertyValue;
-            style.getPropertyValue = function(property) {{
-                const value = originalGetPropertyValue.call(this, property);
-                if (value && (property === 'background-image' || property === 'background' || property === 'content')) {{
-                    // Tentar corrigir URLs em valores CSS
-                    const urlMatch = value.match(/url\\(["']?([^"')]+)["']?\\)/);
-                    if (urlMatch) {{
-                        const url = urlMatch[1];
-                        const fixedUrl = fixUrl(url);
-                        if (fixedUrl !== url) {{
-                            return value.replace(url, fixedUrl);
-                        }}
-                    }}
-                }}
-                return value;
-            }};
-            
-            return style;
-        }};
-        
-        // Interceptar também o setter da propriedade 'src' de elementos para capturar recursos carregados pelo CSS
-        // Isso é crítico porque o CSS pode carregar recursos antes que nosso script execute
-        const originalDefineProperty = Object.defineProperty;
-        const interceptedElements = new WeakSet();
-        
-        function interceptElementSrc(element) {{
-            if (interceptedElements.has(element)) return;
-            interceptedElements.add(element);
-            
-            // Interceptar src para img, script, link, etc.
-            if (element.tagName === 'IMG' || element.tagName === 'SCRIPT' || element.tagName === 'LINK') {{
-                const attrName = element.tagName === 'LINK' ? 'href' : 'src';
-                const originalDescriptor = Object.getOwnPropertyDescriptor(element, attrName);
-                
-                if (!originalDescriptor || originalDescriptor.configurable) {{
-                    Object.defineProperty(element, attrName, {{
-                        get: function() {{
-                            const value = this.getAttribute(attrName);
-                            return value ? fixUrl(value) : value;
-                        }},
-                        set: function(value) {{
-                            const fixedValue = fixUrl(value);
-                            this.setAttribute(attrName, fixedValue);
-                            if (fixedValue !== value) {{
-                                console.log('[Proxy] ' + element.tagName + ' ' + attrName + ' corrigido:', value, '->', fixedValue);
-                            }}
-                        }},
-                        configurable: true,
-                        enumerable: true
-                    }});
-                }}
-            }}
-        }}
-        
-        // Interceptar todos os elementos existentes
-        document.querySelectorAll('img, script, link').forEach(interceptElementSrc);
-        
-        // Interceptar TODAS as requisições de recursos usando um interceptor global
-        // Isso captura recursos carregados pelo CSS que não passam por fetch/XMLHttpRequest
-        const originalCreateElement = document.createElement;
-        document.createElement = function(tagName, options) {{
-            const element = originalCreateElement.call(this, tagName, options);
-            
-            // Interceptar elementos que podem carregar recursos
-            if (tagName.toLowerCase() === 'link' || tagName.toLowerCase() === 'script' || tagName.toLowerCase() === 'img') {{
-                const originalSetAttribute = element.setAttribute;
-                element.setAttribute = function(name, value) {{
-                    if ((name === 'href' || name === 'src') && value) {{
-                        const fixedValue = fixUrl(value);
-                        if (fixedValue !== value) {{
-                            console.log('[Proxy] <' + tagName + '> ' + name + ' corrigido:', value, '->', fixedValue);
-                        }}
-                        return originalSetAttribute.call(this, name, fixedValue);
-                    }}
-                    return originalSetAttribute.call(this, name, value);
-                }};
-                
-                // Interceptar também propriedades diretas
-                if (tagName.toLowerCase() === 'link') {{
-                    Object.defineProperty(element, 'href', {{
-                        get: function() {{
-                            return this.getAttribute('href');
-                        }},
-                        set: function(value) {{
-                            const fixedValue = fixUrl(value);
-                            this.setAttribute('href', fixedValue);
-                        }},
-                        configurable: true
-                    }});
-                }} else if (tagName.toLowerCase() === 'script' || tagName.toLowerCase() === 'img') {{
-                    Object.defineProperty(element, 'src', {{
-                        get: function() {{
-                            return this.getAttribute('src');
-                        }},
-                        set: function(value) {{
-                            const fixedValue = fixUrl(value);
-                            this.setAttribute('src', fixedValue);
-                        }},
-                        configurable: true
-                    }});
-                }}
-                
-                // Interceptar este elemento também
-                interceptElementSrc(element);
-            }}
-            
-            return element;
-        }};
-        
-        
-        // Interceptar elementos já existentes no DOM
-        function fixExistingElements() {{
-            // Corrigir <link> tags
-            document.querySelectorAll('link[href]').forEach(link => {{
-                const href = link.getAttribute('href');
-                if (href) {{
-                    const fixedHref = fixUrl(href);
-                    if (fixedHref !== href) {{
-                        link.setAttribute('href', fixedHref);
-                        console.log('[Proxy] <link> existente corrigido:', href, '->', fixedHref);
-                    }}
-                    // Interceptar este elemento
-                    interceptElementSrc(link);
-                }}
-            }});
-            
-            // Corrigir <script> tags
-            document.querySelectorAll('script[src]').forEach(script => {{
-                const src = script.getAttribute('src');
-                if (src) {{
-                    const fixedSrc = fixUrl(src);
-                    if (fixedSrc !== src) {{
-                        script.setAttribute('src', fixedSrc);
-                        console.log('[Proxy] <script> existente corrigido:', src, '->', fixedSrc);
-                    }}
-                    // Interceptar este elemento
-                    interceptElementSrc(script);
-                }}
-            }});
-            
-            // Corrigir <img> tags
-            document.querySelectorAll('img[src]').forEach(img => {{
-                const src = img.getAttribute('src');
-                if (src) {{
-                    const fixedSrc = fixUrl(src);
-                    if (fixedSrc !== src) {{
-                        img.setAttribute('src', fixedSrc);
-                        console.log('[Proxy] <img> existente corrigido:', src, '->', fixedSrc);
-                    }}
-                    // Interceptar este elemento
-                    interceptElementSrc(img);
-                }}
-            }});
-        }}
-        
-        // Executar imediatamente e também quando o DOM estiver pronto
-        if (document.readyState === 'loading') {{
-            document.addEventListener('DOMContentLoaded', fixExistingElements);
-        }} else {{
-            fixExistingElements();
-        }}
-        
-        // Usar MutationObserver para interceptar elementos adicionados dinamicamente
-        // Consolidar com o resourceObserver anterior
-        const observer = new MutationObserver(function(mutations) {{
-            mutations.forEach(function(mutation) {{
-                mutation.addedNodes.forEach(function(node) {{
-                    if (node.nodeType === 1) {{ // Element node
-                        // Corrigir URLs em elementos que podem carregar recursos
-                        if (node.tagName === 'LINK' && node.href) {{
-                            const fixedHref = fixUrl(node.href);
-                            if (fixedHref !== node.href) {{
-                                node.setAttribute('href', fixedHref);
-                                console.log('[Proxy] <link> dinâmico corrigido:', node.href, '->', fixedHref);
-                            }}
-                            interceptElementSrc(node);
-                        }} else if (node.tagName === 'SCRIPT' && node.src) {{
-                            const fixedSrc = fixUrl(node.src);
-                            if (fixedSrc !== node.src) {{
-                                node.setAttribute('src', fixedSrc);
-                                console.log('[Proxy] <script> dinâmico corrigido:', node.src, '->', fixedSrc);
-                            }}
-                            interceptElementSrc(node);
-                        }} else if (node.tagName === 'IMG' && node.src) {{
-                            const fixedSrc = fixUrl(node.src);
-                            if (fixedSrc !== node.src) {{
-                                node.setAttribute('src', fixedSrc);
-                                console.log('[Proxy] <img> dinâmico corrigido:', node.src, '->', fixedSrc);
-                            }}
-                            interceptElementSrc(node);
-                        }}
-                        
-                        // Corrigir URLs em atributos style inline
-                        if (node.hasAttribute('style')) {{
-                            const originalStyle = node.getAttribute('style');
-                            const fixedStyle = originalStyle.replace(/url\s*\(\s*(["\']?)([^"\'()]+?)\1\s*\)/gi, function(match, quote, url) {{
-                                const fixedUrl = fixUrl(url.trim());
-                                return 'url(' + quote + fixedUrl + quote + ')';
-                            }});
-                            if (fixedStyle !== originalStyle) {{
-                                node.setAttribute('style', fixedStyle);
-                                console.log('[Proxy] Estilo inline corrigido');
-                            }}
-                        }}
-                    }}
-                }});
-                
-                // Interceptar mudanças em atributos src/href
-                if (mutation.type === 'attributes') {{
-                    const target = mutation.target;
-                    if (mutation.attributeName === 'src' || mutation.attributeName === 'href') {{
-                        const originalValue = target.getAttribute(mutation.attributeName);
-                        if (originalValue) {{
-                            const fixedValue = fixUrl(originalValue);
-                            if (fixedValue !== originalValue) {{
-                                target.setAttribute(mutation.attributeName, fixedValue);
-                                console.log('[Proxy] Atributo ' + mutation.attributeName + ' modificado corrigido:', originalValue, '->', fixedValue);
-                            }}
-                        }}
-                    }}
-                }}
-            }});
-        }});
-        
-        observer.observe(document.documentElement, {{
-            childList: true,
-            subtree: true,
-            attributes: true,
-            attributeFilter: ['src', 'href', 'style']
-        }});
-    }})();
-    </script>
-    """
-    
-    # Injetar no início do <head> para garantir que seja executado antes de outros scripts
-    if '<head>' in html_content:
-        # Injetar logo após a tag <head>
-        html_content = html_content.replace('<head>', '<head>' + script, 1)
-    elif '</head>' in html_content:
-        html_content = html_content.replace('</head>', script + '</head>', 1)
-    elif '</body>' in html_content:
-        html_content = html_content.replace('</body>', script + '</body>', 1)
-    else:
-        html_content = script + html_content
-    
-    return html_content
+    return (
+        f'<script src="/api/robo-proxy-interceptor/{ROBO_INTERCEPTOR_VERSAO}.js"'
+        f' data-ws-base="{escape(f"{ws_protocol}://{ws_host}")}"'
+        f' data-base-url="{escape(base_url_https)}"'
+        + (f' data-prefix="{escape(prefix)}"' if prefix else '')
+        + '></script>'
+    )
 
 
 @app.route('/api/robo-ws')
@@ -2064,49 +1698,205 @@ def robo_ws_proxy():
     }), 426  # 426 Upgrade Required
 
 
+# Store dos relatórios de produção (relatorio.csv ou SQLite, conforme RELATORIO_BACKEND)
+relatorio_store = abrir_store(RELATORIO_BACKEND, Path(__file__).parent)
+# Gravação em grupo: uma thread junta as execuções enviadas em paralelo e confirma após o fsync do lote
+gravador_relatorio = GravadorEmGrupo(relatorio_store, RELATORIO_GRUPO_MS, RELATORIO_GRUPO_MAX)
+# Respostas do painel de produção por filtro; cada gravação inicia uma nova geração dos dados
+cache_producao = CacheConsultas(relatorio_store.versao)
+metricas.describe('producao_cache', 'Resultado da consulta ao cache do painel de produção (hit, miss)')
+
+
 def registrar_relatorio(rotina: str, usuario: str, registros: int):
     """
-    Registra uma execução de rotina no arquivo relatorio.csv
+    Registra uma execução de rotina no store de relatórios (relatorio.csv ou SQLite)
     
     Args:
         rotina: Nome da rotina executada
         usuario: Nome do usuário que executou
         registros: Número de registros processados
     """
-    relatorio_path = Path(__file__).parent / 'relatorio.csv'
-    
-    # Cabeçalho do CSV
-    CABECALHO = ['data', 'hora', 'rotina', 'usuario', 'registros']
-    
     try:
-        # Verificar se o arquivo existe
-        arquivo_existe = relatorio_path.exists()
-        
         # Obter data e hora atual
         agora = datetime.now()
-        data = agora.strftime('%d/%m/%Y')
-        hora = agora.strftime('%H:%M:%S')
-        
-        # Abrir arquivo em modo append (ou criar se não existir)
-        with open(relatorio_path, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            
-            # Se o arquivo não existe ou está vazio, escrever cabeçalho
-            if not arquivo_existe or relatorio_path.stat().st_size == 0:
-                writer.writerow(CABECALHO)
-            
-            # Escrever linha de dados
-            writer.writerow([data, hora, rotina, usuario, registros])
-        
+        gravador_relatorio.gravar([Registro(agora.date(), agora.strftime('%H:%M:%S'), rotina, usuario, registros)])
         return True
     except Exception as e:
         print(f"Erro ao registrar relatório: {e}")
         return False
+    finally:
+        cache_producao.invalidar()
+
+
+def registrar_relatorios(registros):
+    """
+    Registra várias execuções de uma vez (todas no mesmo lote de gravação)
+    
+    Args:
+        registros: Lista de Registro já validados
+    """
+    try:
+        gravador_relatorio.gravar(registros)
+        return True
+    except Exception as e:
+        print(f"Erro ao registrar relatórios em lote: {e}")
+        return False
+    finally:
+        cache_producao.invalidar()
+
+
+# Limite de itens por requisição em lote na API externa
+LOTE_MAXIMO_RELATORIO = 5000
+
+# Content-Types aceitos para lotes em NDJSON (um objeto JSON por linha)
+TIPOS_NDJSON = ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/x-jsonlines')
+
+
+def ler_lote_relatorio():
+    """
+    Lê o corpo de uma requisição em lote da API externa de relatórios
+    
+    Aceita um array JSON, um objeto com o campo "lote" (array) ou NDJSON.
+    
+    Returns:
+        (itens, api_key do corpo) ou None se o corpo não for um lote. Linhas
+        NDJSON inválidas viram itens ValueError, reportados por item.
+    """
+    if request.mimetype in TIPOS_NDJSON:
+        itens = []
+        for linha in request.get_data(as_text=True).splitlines():
+            if not linha.strip():
+                continue
+            try:
+                itens.append(json.loads(linha))
+            except ValueError as e:
+                itens.append(ValueError(f'JSON inválido: {e}'))
+        return itens, None
+    corpo = request.get_json(silent=True)
+    if isinstance(corpo, list):
+        return corpo, None
+    if isinstance(corpo, dict) and isinstance(corpo.get('lote'), list):
+        return corpo['lote'], corpo.get('api_key')
+    return None
+
+
+def validar_item_relatorio(item, usuario, agora):
+    """
+    Valida um item de lote e monta o Registro
+    
+    O momento da execução vem de "data_hora" (ISO 8601), de "data"
+    (DD/MM/YYYY ou YYYY-MM-DD) com "hora" opcional (HH:MM:SS), ou é o
+    momento do recebimento.
+    
+    Returns:
+        (Registro, None) ou (None, mensagem de erro)
+    """
+    if isinstance(item, ValueError):
+        return None, str(item)
+    if not isinstance(item, dict):
+        return None, 'Item deve ser um objeto JSON'
+    
+    rotina = item.get('rotina')
+    if not isinstance(rotina, str) or not rotina.strip():
+        return None, 'Campo "rotina" é obrigatório'
+    
+    try:
+        registros = int(item.get('registros', 0))
+    except (ValueError, TypeError):
+        return None, 'Campo "registros" deve ser um número inteiro'
+    if registros < 0:
+        return None, 'Número de registros deve ser positivo ou zero'
+    
+    if item.get('data_hora'):
+        try:
+            momento = datetime.fromisoformat(str(item['data_hora']))
+        except ValueError:
+            return None, 'Campo "data_hora" deve estar no formato ISO 8601 (ex: 2026-02-04T15:05:07)'
+        if momento.tzinfo is not None:
+            momento = momento.astimezone().replace(tzinfo=None)  # Horário local, como nas demais linhas
+        data_execucao, hora = momento.date(), momento.strftime('%H:%M:%S')
+    elif item.get('data'):
+        data_execucao = parse_data(str(item['data']).strip())
+        if data_execucao is None:
+            return None, 'Campo "data" deve estar no formato DD/MM/YYYY ou YYYY-MM-DD'
+        segundos = parse_hora(str(item.get('hora') or '00:00:00'))
+        if not 0 <= segundos < 86400:
+            return None, 'Campo "hora" deve estar no formato HH:MM:SS'
+        hora = formatar_hora(segundos)
+    else:
+        data_execucao, hora = agora.date(), agora.strftime('%H:%M:%S')
+    
+    return Registro(data_execucao, hora, rotina.strip(), usuario, registros), None
+
+
+def registrar_lote_externo(itens, usuario):
+    """Valida todos os itens, grava os válidos de uma vez e retorna o resultado por item"""
+    if not itens:
+        return jsonify_with_cors({'success': False, 'error': 'Lote vazio'}, 400)
+    if len(itens) > LOTE_MAXIMO_RELATORIO:
+        return jsonify_with_cors({
+            'success': False,
+            'error': f'Lote com {len(itens)} itens excede o limite de {LOTE_MAXIMO_RELATORIO}'
+        }, 413)
+    
+    # Com ?atomico=true nenhum item é gravado se algum for inválido
+    atomico = request.args.get('atomico', '').lower() in ['true', '1', 'yes', 'on']
+    agora = datetime.now()
+    validos = []
+    resultados = []
+    for indice, item in enumerate(itens):
+        registro, erro = validar_item_relatorio(item, usuario, agora)
+        if erro:
+            resultados.append({'indice': indice, 'success': False, 'error': erro})
+        else:
+            validos.append(registro)
+            resultados.append({
+                'indice': indice,
+                'success': True,
+                'rotina': registro.rotina,
+                'registros': registro.registros,
+                'data': registro.data.strftime('%d/%m/%Y'),
+                'hora': registro.hora
+            })
+    erros = len(itens) - len(validos)
+    
+    if validos and not (atomico and erros):
+        if not registrar_relatorios(validos):
+            return jsonify_with_cors({'success': False, 'error': 'Erro ao registrar relatório'}, 500)
+        gravados = len(validos)
+    else:
+        gravados = 0
+        if atomico:
+            for resultado in resultados:
+                if resultado['success']:
+                    resultado['success'] = False
+                    resultado['error'] = 'Não gravado: o lote atômico contém itens inválidos'
+    
+    if gravados == len(itens):
+        status = 200
+    elif gravados:
+        status = 207  # Multi-Status: parte dos itens foi gravada
+    else:
+        status = 400
+    return jsonify_with_cors({
+        'success': gravados == len(itens),
+        'message': f'{gravados} de {len(itens)} registros gravados',
+        'usuario': usuario,
+        'total': len(itens),
+        'registrados': gravados,
+        'erros': erros,
+        'resultados': resultados
+    }, status)
 
 
 @app.route('/api/externa/relatorio/registrar', methods=['POST', 'OPTIONS'])
 def api_externa_registrar_relatorio():
-    """API externa para registrar execução de rotina no relatório CSV usando chave de API"""
+    """
+    API externa para registrar execução de rotina no relatório usando chave de API
+    
+    Aceita um registro por chamada ({rotina, registros}) ou um lote de
+    registros com data/hora próprias (array JSON, {"lote": [...]} ou NDJSON).
+    """
     # Tratar CORS preflight
     if request.method == 'OPTIONS':
         response = make_response()
@@ -2116,6 +1906,21 @@ def api_externa_registrar_relatorio():
         return response
     
     try:
+        # Lote: array JSON, objeto com "lote" ou NDJSON (validado junto, gravado de uma vez)
+        lote = ler_lote_relatorio()
+        if lote is not None:
+            itens, chave_corpo = lote
+            chave_api = request.headers.get('X-API-Key') or chave_corpo
+            if not chave_api:
+                return jsonify_with_cors({
+                    'success': False,
+                    'error': 'Chave de API não fornecida. Use o header X-API-Key ou o campo api_key no body.'
+                }, 401)
+            usuario_data = obter_usuario_por_chave_api(chave_api)
+            if not usuario_data:
+                return jsonify_with_cors({'success': False, 'error': 'Chave de API inválida ou usuário inativo'}, 401)
+            return registrar_lote_externo(itens, usuario_data['username'])
+        
         # Obter chave de API do header ou do body
         chave_api = request.headers.get('X-API-Key') or request.json.get('api_key') if request.json else None
         
@@ -2244,285 +2049,80 @@ def api_registrar_relatorio():
             }), 500
 
 
+def filtro_producao_da_requisicao():
+    """
+    Filtro dos relatórios de produção a partir dos parâmetros da requisição
+    
+    Parâmetros: data_inicial e data_final (YYYY-MM-DD, datas inválidas são
+    ignoradas), usuarios[] (nomes ou usernames) e modulos[] (rotinas).
+    
+    Returns:
+        Tupla (Filtro, mapeamento username -> nome)
+    """
+    # Carregar mapeamento username -> nome
+    usuarios_data = listar_usuarios()
+    username_to_nome = {u['username']: u['nome'] for u in usuarios_data}
+    nome_to_username = {u['nome']: u['username'] for u in usuarios_data}
+    
+    usuarios_filtro = request.args.getlist('usuarios[]')  # Recebe nomes agora
+    modulos = request.args.getlist('modulos[]')
+    
+    # Converter nomes de usuário para usernames para filtro
+    usuarios_filtro_usernames = []
+    for nome in usuarios_filtro:
+        if nome in nome_to_username:
+            usuarios_filtro_usernames.append(nome_to_username[nome])
+        elif nome in username_to_nome:  # Se já for username, manter
+            usuarios_filtro_usernames.append(nome)
+    
+    filtro = Filtro.criar(parse_data_filtro(request.args.get('data_inicial', '')),
+                          parse_data_filtro(request.args.get('data_final', '')),
+                          usuarios_filtro_usernames, modulos)
+    return filtro, username_to_nome
+
+
+def periodo_producao(filtro):
+    """Período efetivo dos gráficos de produção: o do filtro ou o mês atual até hoje"""
+    if filtro.inicio and filtro.fim:
+        return filtro.inicio, filtro.fim
+    hoje = datetime.now()
+    return date(hoje.year, hoje.month, 1), hoje.date()
+
+
 @app.route('/api/producao-relatorios/dados', methods=['GET'])
 @login_required
 def get_producao_relatorios_dados():
-    """API para obter dados processados do relatorio.csv para os gráficos"""
+    """
+    API para obter dados processados dos relatórios de produção para os gráficos
+    
+    Com formato=esparso, as séries por módulo, por usuário e detalhada vêm em
+    CSR (só os valores não nulos: series, indptr, indices, valores) em vez de
+    um valor por rótulo do eixo X, nos gráficos em que a maior parte dos
+    valores é zero (ver producao.DENSIDADE_MAXIMA_CSR).
+    """
+    formato = request.args.get('formato', 'denso').lower()
+    if formato not in ('denso', 'esparso'):
+        return jsonify({'success': False, 'error': 'Parâmetro "formato" deve ser denso ou esparso'}), 400
     try:
-        relatorio_path = Path(__file__).parent / 'relatorio.csv'
-        
-        # Carregar mapeamento username -> nome
-        usuarios_data = listar_usuarios()
-        username_to_nome = {u['username']: u['nome'] for u in usuarios_data}
-        nome_to_username = {u['nome']: u['username'] for u in usuarios_data}
-        
-        # Parâmetros de filtro
-        data_inicial = request.args.get('data_inicial', '')
-        data_final = request.args.get('data_final', '')
-        usuarios_filtro = request.args.getlist('usuarios[]')  # Recebe nomes agora
-        modulos = request.args.getlist('modulos[]')
-        
-        # Converter nomes de usuário para usernames para filtro
-        usuarios_filtro_usernames = []
-        for nome in usuarios_filtro:
-            if nome in nome_to_username:
-                usuarios_filtro_usernames.append(nome_to_username[nome])
-            elif nome in username_to_nome:  # Se já for username, manter
-                usuarios_filtro_usernames.append(nome)
-        
-        # Ler CSV
-        dados_raw = []
-        if relatorio_path.exists():
-            with open(relatorio_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    dados_raw.append(row)
-        
-        # Processar e filtrar dados
-        dados_filtrados = []
-        usuarios_unicos = set()
-        modulos_unicos = set()
-        
-        for registro in dados_raw:
-            # Converter data de DD/MM/YYYY ou YYYY-MM-DD para datetime
-            data_str = registro.get('data', '').strip()
-            data_registro = None
-            try:
-                # Tentar formato DD/MM/YYYY primeiro (formato padrão)
-                data_registro = datetime.strptime(data_str, '%d/%m/%Y')
-            except:
-                try:
-                    # Tentar formato YYYY-MM-DD (formato alternativo)
-                    data_registro = datetime.strptime(data_str, '%Y-%m-%d')
-                except:
-                    # Se nenhum formato funcionar, pular este registro
-                    continue
-            
-            # Filtrar por período
-            if data_inicial:
-                try:
-                    data_ini = datetime.strptime(data_inicial, '%Y-%m-%d')
-                    if data_registro < data_ini:
-                        continue
-                except:
-                    pass
-            
-            if data_final:
-                try:
-                    data_fim = datetime.strptime(data_final, '%Y-%m-%d')
-                    if data_registro > data_fim:
-                        continue
-                except:
-                    pass
-            
-            # Filtrar por usuários (usando username do CSV)
-            usuario_username = registro.get('usuario', '').strip()
-            if usuarios_filtro_usernames and usuario_username not in usuarios_filtro_usernames:
-                continue
-            
-            # Filtrar por módulos
-            rotina = registro.get('rotina', '').strip()
-            if modulos and rotina not in modulos:
-                continue
-            
-            # Coletar usuários (nomes) e módulos únicos
-            if usuario_username and usuario_username in username_to_nome:
-                usuarios_unicos.add(username_to_nome[usuario_username])
-            elif usuario_username:
-                usuarios_unicos.add(usuario_username)  # Fallback se não encontrar nome
-            if rotina:
-                modulos_unicos.add(rotina)
-            
-            dados_filtrados.append({
-                'data': registro.get('data', ''),
-                'hora': registro.get('hora', ''),
-                'rotina': rotina,
-                'usuario': usuario_username,  # Manter username para processamento interno
-                'usuario_nome': username_to_nome.get(usuario_username, usuario_username),  # Nome para exibição
-                'registros': int(registro.get('registros', 0) or 0)
-            })
-        
-        # Período efetivo para os gráficos (usar filtro ou mês atual)
-        hoje = datetime.now()
-        if data_inicial and data_final:
-            try:
-                data_ini = datetime.strptime(data_inicial, '%Y-%m-%d')
-                data_fim = datetime.strptime(data_final, '%Y-%m-%d')
-                ano_ini, mes_ini = data_ini.year, data_ini.month
-                ano_fim, mes_fim = data_fim.year, data_fim.month
-            except Exception:
-                ano_ini, mes_ini = hoje.year, hoje.month
-                ano_fim, mes_fim = hoje.year, hoje.month
-                data_ini = datetime(hoje.year, hoje.month, 1)
-                data_fim = hoje
-        else:
-            ano_ini, mes_ini = hoje.year, hoje.month
-            ano_fim, mes_fim = hoje.year, hoje.month
-            data_ini = datetime(hoje.year, hoje.month, 1)
-            data_fim = hoje
-
-        # Período cobre um único mês ou múltiplos meses?
-        um_mes_only = (ano_ini == ano_fim and mes_ini == mes_fim)
-        meses_labels_pt = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
-
-        producao_modulo = {}
-        producao_usuario = {}
-        producao_modulo_usuario = {}  # (rotina, usuario_nome) -> dia ou (ano,mes) -> total
-        producao_periodo = {}
-
-        for registro in dados_filtrados:
-            try:
-                data_str = registro.get('data', '').strip()
-                try:
-                    data_reg = datetime.strptime(data_str, '%d/%m/%Y')
-                except Exception:
-                    try:
-                        data_reg = datetime.strptime(data_str, '%Y-%m-%d')
-                    except Exception:
-                        continue
+        filtro, username_to_nome = filtro_producao_da_requisicao()
 
-                rotina = registro['rotina']
-                usuario_username = registro['usuario']
-                usuario_nome = registro.get('usuario_nome', usuario_username)
-                registros = registro['registros']
-                ano, mes, dia = data_reg.year, data_reg.month, data_reg.day
+        # Período efetivo para os gráficos (usar filtro ou mês atual)
+        data_ini, data_fim = periodo_producao(filtro)
 
-                # Dentro do período filtrado?
-                if data_reg < data_ini or data_reg > data_fim:
-                    continue
+        # Totais diários (dia, rotina, usuário) do filtro, agregados pelo motor de produção;
+        # a resposta pronta fica em cache até a próxima gravação
+        chave = ('dados', formato, data_ini, data_fim, filtro.inicio, filtro.fim,
+                 tuple(sorted(filtro.usuarios or ())), tuple(sorted(filtro.rotinas or ())),
+                 tuple(sorted(username_to_nome.items())))
 
-                if um_mes_only:
-                    # Um único mês: agrupar por dia
-                    if rotina not in producao_modulo:
-                        producao_modulo[rotina] = {}
-                    producao_modulo[rotina][dia] = producao_modulo[rotina].get(dia, 0) + registros
-                    if usuario_nome not in producao_usuario:
-                        producao_usuario[usuario_nome] = {}
-                    producao_usuario[usuario_nome][dia] = producao_usuario[usuario_nome].get(dia, 0) + registros
-                    chave_mod_usr = (rotina, usuario_nome)
-                    if chave_mod_usr not in producao_modulo_usuario:
-                        producao_modulo_usuario[chave_mod_usr] = {}
-                    producao_modulo_usuario[chave_mod_usr][dia] = producao_modulo_usuario[chave_mod_usr].get(dia, 0) + registros
-                else:
-                    # Múltiplos meses: agrupar por (ano, mes)
-                    chave_mes = (ano, mes)
-                    if rotina not in producao_modulo:
-                        producao_modulo[rotina] = {}
-                    producao_modulo[rotina][chave_mes] = producao_modulo[rotina].get(chave_mes, 0) + registros
-                    if usuario_nome not in producao_usuario:
-                        producao_usuario[usuario_nome] = {}
-                    producao_usuario[usuario_nome][chave_mes] = producao_usuario[usuario_nome].get(chave_mes, 0) + registros
-                    chave_mod_usr = (rotina, usuario_nome)
-                    if chave_mod_usr not in producao_modulo_usuario:
-                        producao_modulo_usuario[chave_mod_usr] = {}
-                    producao_modulo_usuario[chave_mod_usr][chave_mes] = producao_modulo_usuario[chave_mod_usr].get(chave_mes, 0) + registros
-
-                chave_periodo = f"{ano}-{mes:02d}"
-                if chave_periodo not in producao_periodo:
-                    producao_periodo[chave_periodo] = {'ano': ano, 'mes': mes, 'registros': 0}
-                producao_periodo[chave_periodo]['registros'] += registros
+        def calcular():
+            colunas = relatorio_store.colunas(filtro)
+            dados = dados_graficos(colunas, filtro, data_ini, data_fim, username_to_nome, formato=formato)
+            return jsonify({'success': True, **dados}).get_data()
 
-            except Exception as e:
-                print(f"Erro ao processar registro para gráficos: {e}")
-                continue
-
-        # Lista de (ano, mes) no intervalo para labels de múltiplos meses
-        def meses_no_intervalo(ani, mi, anf, mf):
-            out = []
-            a, m = ani, mi
-            while (a, m) <= (anf, mf):
-                out.append((a, m))
-                if m == 12:
-                    a, m = a + 1, 1
-                else:
-                    m += 1
-            return out
-
-        if um_mes_only:
-            ano_ref, mes_ref = ano_ini, mes_ini
-            ultimo_dia_mes = calendar.monthrange(ano_ref, mes_ref)[1]
-            labels_modulo = list(range(1, ultimo_dia_mes + 1))
-            labels_usuario = list(range(1, ultimo_dia_mes + 1))
-            tipo_eixo = 'dia'
-        else:
-            lista_meses = meses_no_intervalo(ano_ini, mes_ini, ano_fim, mes_fim)
-            labels_modulo = [f"{meses_labels_pt[m - 1]}/{a}" for a, m in lista_meses]
-            labels_usuario = [f"{meses_labels_pt[m - 1]}/{a}" for a, m in lista_meses]
-            tipo_eixo = 'mes'
-            chaves_ordenadas = lista_meses
-
-        # Dados por módulo
-        dados_modulo = {'labels': labels_modulo, 'datasets': [], 'tipo_eixo': tipo_eixo}
-        if producao_modulo:
-            if um_mes_only:
-                for rotina in sorted(producao_modulo.keys()):
-                    dados = [producao_modulo[rotina].get(dia, 0) for dia in labels_modulo]
-                    dados_modulo['datasets'].append({'label': rotina, 'data': dados})
-            else:
-                for rotina in sorted(producao_modulo.keys()):
-                    dados = [producao_modulo[rotina].get(chave, 0) for chave in chaves_ordenadas]
-                    dados_modulo['datasets'].append({'label': rotina, 'data': dados})
-
-        # Dados por usuário
-        dados_usuario = {'labels': labels_usuario, 'datasets': [], 'tipo_eixo': tipo_eixo}
-        if producao_usuario:
-            if um_mes_only:
-                for nome_usuario in sorted(producao_usuario.keys()):
-                    dados = [producao_usuario[nome_usuario].get(dia, 0) for dia in labels_usuario]
-                    dados_usuario['datasets'].append({'label': nome_usuario, 'data': dados})
-            else:
-                for nome_usuario in sorted(producao_usuario.keys()):
-                    dados = [producao_usuario[nome_usuario].get(chave, 0) for chave in chaves_ordenadas]
-                    dados_usuario['datasets'].append({'label': nome_usuario, 'data': dados})
-
-        # Dados por período: eixo X = meses no intervalo (ex: fev/2026, mar/2026)
-        if um_mes_only:
-            lista_meses_periodo = [(ano_ini, mes_ini)]
-        else:
-            lista_meses_periodo = meses_no_intervalo(ano_ini, mes_ini, ano_fim, mes_fim)
-        labels_periodo = [f"{meses_labels_pt[m - 1]}/{a}" for a, m in lista_meses_periodo]
-        dados_periodo = {'labels': labels_periodo, 'datasets': []}
-        # Um dataset "Total" com totais por mês no intervalo
-        totais_por_mes = [producao_periodo.get(f"{a}-{m:02d}", {}).get('registros', 0) for a, m in lista_meses_periodo]
-        dados_periodo['datasets'].append({'label': 'Total', 'data': totais_por_mes})
-
-        # Resumo por módulo: total no período por módulo (dia x módulo, sem usuário)
-        dados_modulo_resumo = {'labels': [], 'data': []}
-        if producao_modulo:
-            for rotina in sorted(producao_modulo.keys()):
-                total = sum(producao_modulo[rotina].values())
-                dados_modulo_resumo['labels'].append(rotina)
-                dados_modulo_resumo['data'].append(total)
-
-        # Detalhada por usuário: módulo x usuário, eixo X = dias (ou meses)
-        dados_usuario_detalhado = {'labels': labels_modulo, 'datasets': [], 'tipo_eixo': tipo_eixo}
-        if producao_modulo_usuario:
-            if um_mes_only:
-                for (rotina, nome_usr) in sorted(producao_modulo_usuario.keys()):
-                    dados = [producao_modulo_usuario[(rotina, nome_usr)].get(d, 0) for d in labels_modulo]
-                    dados_usuario_detalhado['datasets'].append({
-                        'label': f"{rotina} — {nome_usr}",
-                        'data': dados
-                    })
-            else:
-                for (rotina, nome_usr) in sorted(producao_modulo_usuario.keys()):
-                    dados = [producao_modulo_usuario[(rotina, nome_usr)].get(chave, 0) for chave in chaves_ordenadas]
-                    dados_usuario_detalhado['datasets'].append({
-                        'label': f"{rotina} — {nome_usr}",
-                        'data': dados
-                    })
-        
-        return jsonify({
-            'success': True,
-            'dados_modulo_resumo': dados_modulo_resumo,
-            'dados_modulo': dados_modulo,
-            'dados_usuario': dados_usuario,
-            'dados_usuario_detalhado': dados_usuario_detalhado,
-            'dados_periodo': dados_periodo,
-            'usuarios_disponiveis': sorted(list(usuarios_unicos)),
-            'modulos_disponiveis': sorted(list(modulos_unicos)),
-            'total_registros': len(dados_filtrados)
-        })
+        corpo, acerto = cache_producao.obter(chave, calcular)
+        metricas.incr('producao_cache', resultado='hit' if acerto else 'miss')
+        return Response(corpo, mimetype='application/json')
         
     except Exception as e:
         import traceback
@@ -2536,6 +2136,184 @@ def get_producao_relatorios_dados():
         }), 500
 
 
+@app.route('/api/producao-relatorios/mapa-calor', methods=['GET'])
+@login_required
+def get_producao_relatorios_mapa_calor():
+    """
+    Mapa de calor da produção: registros e execuções por dia da semana e hora
+    
+    Mesmos filtros e período de /api/producao-relatorios/dados. Com
+    por=rotina ou por=usuario, traz também um mapa por rotina ou usuário.
+    """
+    por = request.args.get('por') or None
+    if por not in (None, 'rotina', 'usuario'):
+        return jsonify({'success': False, 'error': 'Parâmetro "por" deve ser rotina ou usuario'}), 400
+    try:
+        filtro, username_to_nome = filtro_producao_da_requisicao()
+        data_ini, data_fim = periodo_producao(filtro)
+        filtro_periodo = filtro.restringir(data_ini, data_fim)
+
+        chave = ('mapa_calor', por, data_ini, data_fim,
+                 tuple(sorted(filtro.usuarios or ())), tuple(sorted(filtro.rotinas or ())),
+                 tuple(sorted(username_to_nome.items())))
+
+        def calcular():
+            # Linhas brutas do período: a hora não existe nos totais diários
+            colunas = relatorio_store.colunas(filtro_periodo, detalhe='linha')
+            dados = dados_mapa_calor(colunas, filtro_periodo, username_to_nome, por=por)
+            return jsonify({'success': True, 'data_inicial': data_ini.isoformat(),
+                            'data_final': data_fim.isoformat(), **dados}).get_data()
+
+        corpo, acerto = cache_producao.obter(chave, calcular)
+        metricas.incr('producao_cache', resultado='hit' if acerto else 'miss')
+        return Response(corpo, mimetype='application/json')
+
+    except Exception as e:
+        print(f"Erro em get_producao_relatorios_mapa_calor: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/producao-relatorios/agregar', methods=['GET'])
+@login_required
+def get_producao_relatorios_agregar():
+    """
+    Agregação genérica da produção: métricas por combinação de dimensões
+    
+    Parâmetros: group_by (lista separada por vírgulas de rotina, usuario, dia,
+    dia_mes, semana, dia_semana, mes, ano, hora), metric (sum, count, avg;
+    padrão sum) e os mesmos filtros e período de /api/producao-relatorios/dados.
+    """
+    dimensoes = tuple(dict.fromkeys(d.strip() for d in request.args.get('group_by', '').split(',') if d.strip()))
+    nomes_metricas = tuple(dict.fromkeys(m.strip() for m in request.args.get('metric', 'sum').split(',') if m.strip()))
+    invalidas = [d for d in dimensoes if d not in DIMENSOES_AGREGACAO]
+    if invalidas:
+        return jsonify({'success': False, 'error': f'Dimensões inválidas: {", ".join(invalidas)}',
+                        'dimensoes_validas': list(DIMENSOES_AGREGACAO)}), 400
+    invalidas = [m for m in nomes_metricas if m not in METRICAS_AGREGACAO]
+    if invalidas or not nomes_metricas:
+        return jsonify({'success': False, 'error': f'Métricas inválidas: {", ".join(invalidas) or "(nenhuma)"}',
+                        'metricas_validas': list(METRICAS_AGREGACAO)}), 400
+    try:
+        filtro, username_to_nome = filtro_producao_da_requisicao()
+        data_ini, data_fim = periodo_producao(filtro)
+        filtro_periodo = filtro.restringir(data_ini, data_fim)
+
+        chave = ('agregar', dimensoes, nomes_metricas, data_ini, data_fim,
+                 tuple(sorted(filtro.usuarios or ())), tuple(sorted(filtro.rotinas or ())),
+                 tuple(sorted(username_to_nome.items())))
+
+        def calcular():
+            # Totais diários bastam, exceto para a hora (só nas linhas brutas)
+            colunas = relatorio_store.colunas(filtro_periodo, detalhe='linha' if 'hora' in dimensoes else 'dia')
+            dados = agregar(colunas, filtro_periodo, dimensoes, nomes_metricas, username_to_nome)
+            return jsonify({'success': True, 'group_by': list(dimensoes), 'metric': list(nomes_metricas),
+                            'data_inicial': data_ini.isoformat(), 'data_final': data_fim.isoformat(),
+                            **dados}).get_data()
+
+        corpo, acerto = cache_producao.obter(chave, calcular)
+        metricas.incr('producao_cache', resultado='hit' if acerto else 'miss')
+        return Response(corpo, mimetype='application/json')
+
+    except Exception as e:
+        print(f"Erro em get_producao_relatorios_agregar: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# Exportação: tamanho dos blocos enviados ao cliente (antes da compressão)
+EXPORTACAO_BLOCO = 64 * 1024
+CAMPOS_EXPORTACAO = {
+    'linha': CABECALHO,
+    'dia': ['data', 'rotina', 'usuario', 'registros', 'execucoes'],
+}
+
+
+def gerar_exportacao(itens, detalhe, formato, comprimir):
+    """
+    Serializa os registros em blocos (CSV ou NDJSON), opcionalmente em gzip
+    
+    O CSV segue o layout do relatorio.csv (data DD/MM/YYYY). No NDJSON a
+    data vai em YYYY-MM-DD, o mesmo formato aceito pelo envio em lote da
+    API externa.
+    """
+    campos = CAMPOS_EXPORTACAO[detalhe]
+    compressor_gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if comprimir else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def bloco():
+        texto = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor_gzip.compress(texto) if compressor_gzip else texto
+
+    # Registros do mesmo dia são consecutivos: a data formatada é reaproveitada
+    formatar_data = (lambda d: d.strftime('%d/%m/%Y')) if formato == 'csv' else date.isoformat
+    data_anterior = texto_data = None
+    if formato == 'csv':
+        writer.writerow(campos)
+    for item in itens:
+        if item.data != data_anterior:
+            data_anterior, texto_data = item.data, formatar_data(item.data)
+        if formato == 'csv':
+            writer.writerow([texto_data, *item[1:]])
+        else:
+            buffer.write(json.dumps(dict(zip(campos, [texto_data, *item[1:]])), ensure_ascii=False))
+            buffer.write('\n')
+        if buffer.tell() >= EXPORTACAO_BLOCO:
+            dados = bloco()
+            if dados:
+                yield dados
+    dados = bloco()
+    if compressor_gzip:
+        dados += compressor_gzip.flush()
+    if dados:
+        yield dados
+
+
+@app.route('/api/producao-relatorios/export', methods=['GET'])
+@login_required
+def exportar_producao_relatorios():
+    """
+    Exporta os registros de produção do filtro como arquivo, em streaming
+    
+    Aceita os mesmos filtros de /api/producao-relatorios/dados (sem datas,
+    exporta todo o histórico) e ainda:
+        formato: csv (padrão) ou ndjson
+        detalhe: linha (cada execução, padrão) ou dia (totais por dia, rotina e usuário)
+        gzip: true para baixar o arquivo comprimido (.gz)
+    """
+    formato = request.args.get('formato', 'csv').lower()
+    detalhe = request.args.get('detalhe', 'linha').lower()
+    comprimir = request.args.get('gzip', '').lower() in ['true', '1', 'yes', 'on']
+    if formato not in ('csv', 'ndjson'):
+        return jsonify({'success': False, 'error': 'Parâmetro "formato" deve ser csv ou ndjson'}), 400
+    if detalhe not in CAMPOS_EXPORTACAO:
+        return jsonify({'success': False, 'error': 'Parâmetro "detalhe" deve ser linha ou dia'}), 400
+
+    try:
+        filtro, _ = filtro_producao_da_requisicao()
+        if detalhe == 'dia':
+            itens = relatorio_store.totais_diarios(filtro)
+        else:
+            itens = relatorio_store.registros(filtro)
+    except Exception as e:
+        print(f"Erro em exportar_producao_relatorios: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    periodo = f"{filtro.inicio.isoformat() if filtro.inicio else 'inicio'}_{filtro.fim.isoformat() if filtro.fim else 'fim'}"
+    nome_arquivo = f"producao_{'diario' if detalhe == 'dia' else 'execucoes'}_{periodo}.{formato}"
+    mimetype = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+    if comprimir:
+        nome_arquivo += '.gz'
+        mimetype = 'application/gzip'
+
+    response = Response(gerar_exportacao(itens, detalhe, formato, comprimir), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @app.route('/api/internacoes-solicitar/load', methods=['GET'])
 @login_required
 def load_internacoes_csv():
@@ -4161,6 +3939,7 @@ def check_extension_type():
 
 
 if __name__ == '__main__':
+    iniciar_aquecedor_proxy()
     # Modo produção - escutar no IP do Tailscale
     app.run(debug=False, host='100.99.180.78', port=5000)
 
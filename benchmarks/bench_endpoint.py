@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos endpoints do painel de produção em qualquer versão do repositório
+
+Extrai a revisão pedida (git archive; "local" usa a árvore de trabalho,
+inclusive alterações não commitadas) para um diretório temporário, grava ali
+o relatorio.csv sintético (gerar_relatorio.py), o users.json e o env da
+execução, e roda o app dessa cópia em um processo separado, medindo pelo
+test client do Flask como uma requisição real. Nada do repositório (o
+relatorio.csv, os arquivos auxiliares, os globais do app) é tocado.
+
+Para cada tamanho e backend são medidos:
+
+- a importação do app (abertura do store; no SQLite, a importação do CSV)
+  e a primeira requisição;
+- cada cenário de filtro (período, usuários, rotinas) em cada endpoint, com
+  uma gravação pela API antes de cada repetição (invalida o cache de
+  respostas, como uma execução do robô em produção) e, por último, a mesma
+  requisição sem gravação (vinda do cache, nas versões que o têm).
+
+/api/producao-relatorios/dados é sempre medido, então a mesma chamada
+compara qualquer par de revisões. Os demais endpoints (formato esparso,
+mapa de calor, agregação) entram quando a versão os tem; o backend sqlite,
+quando a versão tem RELATORIO_BACKEND.
+
+Os resultados vão para um JSON (revisão, versões, parâmetros e tempos) que
+pode ser comparado com o de outra execução com --comparar.
+
+Uso:
+    python3 benchmarks/bench_endpoint.py
+    python3 benchmarks/bench_endpoint.py --revisao 30d302e --saida antes.json
+    python3 benchmarks/bench_endpoint.py --revisao local --saida depois.json --comparar antes.json
+    python3 benchmarks/bench_endpoint.py --tamanhos 10000 100000 1000000 --backends csv sqlite
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import quote
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+# Endpoint -> (URL, trecho que a resposta precisa conter para a versão suportá-lo)
+ENDPOINTS = {
+    'dados': ('/api/producao-relatorios/dados?{filtro}', None),
+    'esparso': ('/api/producao-relatorios/dados?formato=esparso&{filtro}', b'"indptr"'),
+    'mapa-calor': ('/api/producao-relatorios/mapa-calor?{filtro}', None),
+    'agregar': ('/api/producao-relatorios/agregar?group_by=rotina,usuario,semana&metric=sum,count,avg&{filtro}', None),
+}
+# Gravação feita antes de cada repetição (data de hoje, fora dos períodos medidos)
+GRAVACAO = {'rotina': 'Benchmark', 'registros': 1}
+
+
+def cenarios(gerado):
+    """Filtros medidos, relativos ao fim dos dados gerados: {nome: query string}"""
+    fim = gerado['fim']
+    mes = fim.replace(day=1)
+    trimestre = (mes - timedelta(days=62)).replace(day=1)
+    ano = fim - timedelta(days=364)
+    operador = quote(next(u['nome'] for u in gerado['usuarios'] if u['username'].startswith('operador')))
+    rotinas = [quote(r) for r in gerado['rotinas'][:2]]
+
+    def periodo(inicio):
+        return f'data_inicial={inicio.isoformat()}&data_final={fim.isoformat()}'
+
+    return {
+        'mes': periodo(mes),
+        'trimestre': periodo(trimestre),
+        'ano': periodo(ano),
+        'tudo': periodo(gerado['inicio']),
+        'mes_usuario': periodo(mes) + f'&usuarios[]={operador}',
+        'ano_rotinas': periodo(ano) + ''.join(f'&modulos[]={r}' for r in rotinas),
+        'ano_usuario_rotinas': periodo(ano) + f'&usuarios[]={operador}' + ''.join(f'&modulos[]={r}' for r in rotinas),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Processo filho: roda dentro da cópia da revisão (diretório atual)
+# ---------------------------------------------------------------------------
+
+def requisitar(cliente, url):
+    inicio = time.perf_counter()
+    resposta = cliente.get(url)
+    ms = (time.perf_counter() - inicio) * 1000
+    return ms, resposta.status_code, resposta.get_data()
+
+
+def gravar(cliente):
+    resposta = cliente.post('/api/relatorio/registrar', json=GRAVACAO)
+    if resposta.status_code != 200:
+        raise RuntimeError(f'gravação: HTTP {resposta.status_code} {resposta.get_data()[:200]!r}')
+
+
+def executar(caminho_config):
+    """Mede os endpoints do app do diretório atual e grava os tempos em config['saida']"""
+    with open(caminho_config, encoding='utf-8') as f:
+        config = json.load(f)
+    # O app da revisão, não o do repositório de onde o benchmark foi chamado
+    sys.path[0] = os.getcwd()
+    if config['sem_numpy']:
+        sys.modules['numpy'] = None  # import numpy falha: agregação em Python puro
+
+    inicio = time.perf_counter()
+    import app as aplicacao
+    abertura = time.perf_counter() - inicio
+    aplicacao.app.config['LOGIN_DISABLED'] = True
+    cliente = aplicacao.app.test_client()
+
+    consultas = config['consultas']
+    primeira, status, corpo = requisitar(cliente, ENDPOINTS['dados'][0].format(filtro=consultas['mes']))
+    if status != 200:
+        raise RuntimeError(f'dados: HTTP {status} {corpo[:200]!r}')
+
+    endpoints, nao_suportados = [], []
+    for endpoint in config['endpoints']:
+        url, marca = ENDPOINTS[endpoint]
+        _, status, corpo = requisitar(cliente, url.format(filtro=consultas['mes']))
+        if status == 404 or (status == 200 and marca is not None and marca not in corpo):
+            nao_suportados.append(endpoint)
+        elif status != 200:
+            raise RuntimeError(f'{endpoint}: HTTP {status} {corpo[:200]!r}')
+        else:
+            endpoints.append(endpoint)
+
+    resultados = []
+    for cenario, filtro in consultas.items():
+        for endpoint in endpoints:
+            url = ENDPOINTS[endpoint][0].format(filtro=filtro)
+            tempos = []
+            for _ in range(config['repeticoes']):
+                gravar(cliente)
+                ms, status, corpo = requisitar(cliente, url)
+                if status != 200:
+                    raise RuntimeError(f'{url}: HTTP {status} {corpo[:200]!r}')
+                tempos.append(ms)
+            cache_ms, _, _ = requisitar(cliente, url)
+            resultados.append({'cenario': cenario, 'endpoint': endpoint,
+                               'mediana_ms': round(statistics.median(tempos), 2), 'min_ms': round(min(tempos), 2),
+                               'cache_ms': round(cache_ms, 2), 'bytes': len(corpo)})
+
+    with open(config['saida'], 'w', encoding='utf-8') as f:
+        json.dump({'abertura_s': round(abertura, 3), 'primeira_ms': round(primeira, 2),
+                   'nao_suportados': nao_suportados, 'resultados': resultados}, f)
+
+
+# ---------------------------------------------------------------------------
+# Processo principal: prepara as cópias da revisão e coleta os resultados
+# ---------------------------------------------------------------------------
+
+def git(*argumentos):
+    return subprocess.run(['git', *argumentos], cwd=RAIZ, capture_output=True, check=True).stdout
+
+
+def identificar_revisao(revisao):
+    """Commit abreviado da revisão; na árvore de trabalho, com -modificado se há alterações"""
+    if revisao == 'local':
+        commit = git('rev-parse', '--short', 'HEAD').decode().strip()
+        return commit + ('-modificado' if git('status', '--porcelain', '--untracked-files=no').strip() else '')
+    return git('rev-parse', '--short', revisao + '^{commit}').decode().strip()
+
+
+def extrair_revisao(revisao, destino):
+    """Copia os arquivos da revisão (ou da árvore de trabalho, com "local") para destino"""
+    if revisao == 'local':
+        for nome in git('ls-files', '-z', '--cached', '--others', '--exclude-standard').decode().split('\0'):
+            origem = RAIZ / nome
+            if nome and origem.is_file():
+                (destino / nome).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(origem, destino / nome)
+        return
+    with tarfile.open(fileobj=io.BytesIO(git('archive', '--format=tar', revisao))) as tar:
+        if hasattr(tarfile, 'data_filter'):
+            tar.extractall(destino, filter='data')
+        else:
+            tar.extractall(destino)
+
+
+def preparar_execucao(fonte, destino, origem_csv, gerado, backend):
+    """Cópia da revisão com os dados, os usuários e o env desta execução"""
+    shutil.copytree(fonte, destino)
+    shutil.copy(origem_csv, destino / 'relatorio.csv')
+    usuarios = {u['username']: {'senha_hash': '', 'nome': u['nome'], 'ativo': True, 'api_key': ''}
+                for u in gerado['usuarios']}
+    (destino / 'users.json').write_text(json.dumps(usuarios, ensure_ascii=False), encoding='utf-8')
+    (destino / 'env').write_text(
+        'SECRET_KEY = bench-endpoint\n'
+        f'RELATORIO_BACKEND = {backend}\n'
+        'ROBO_PREWARM = false\n'
+        'ROBO_REWRITE_PROCESSOS = 0\n',
+        encoding='utf-8'
+    )
+
+
+def medir(args, fonte, diretorio_dados, diretorio_execucoes):
+    from gerar_relatorio import descrever, gerar_csv
+
+    backends_suportados = {'csv'}
+    if 'RELATORIO_BACKEND' in (fonte / 'config.py').read_text(encoding='utf-8'):
+        backends_suportados.add('sqlite')
+
+    carga, resultados, nao_suportados = [], [], set()
+    for linhas in args.tamanhos:
+        origem = diretorio_dados / f'relatorio_{linhas}_{args.usuarios}_{args.rotinas}_{args.anos}_{args.semente}.csv'
+        if origem.exists():
+            gerado = descrever(args.usuarios, args.rotinas, anos=args.anos)
+        else:
+            gerado = gerar_csv(origem, linhas, args.usuarios, args.rotinas, anos=args.anos, semente=args.semente)
+        consultas = cenarios(gerado)
+        for backend in args.backends:
+            if backend not in backends_suportados:
+                print(f'\n{backend} {linhas} linhas: backend não suportado nesta revisão')
+                continue
+            execucao = diretorio_execucoes / f'{backend}_{linhas}'
+            preparar_execucao(fonte, execucao, origem, gerado, backend)
+            config = {'consultas': consultas, 'endpoints': args.endpoints, 'repeticoes': args.repeticoes,
+                      'sem_numpy': args.sem_numpy, 'saida': str(execucao / 'bench_resultado.json')}
+            (execucao / 'bench_config.json').write_text(json.dumps(config), encoding='utf-8')
+            log = execucao / 'bench.log'
+            with open(log, 'wb') as saida:
+                processo = subprocess.run([sys.executable, str(Path(__file__).resolve()), '--executar',
+                                           str(execucao / 'bench_config.json')],
+                                          cwd=execucao, stdout=saida, stderr=subprocess.STDOUT)
+            if processo.returncode != 0:
+                print(log.read_text(encoding='utf-8', errors='replace')[-3000:])
+                raise RuntimeError(f'{backend} {linhas} linhas: processo de medição terminou com {processo.returncode}')
+            medido = json.loads((execucao / 'bench_resultado.json').read_text(encoding='utf-8'))
+
+            carga.append({'backend': backend, 'linhas': linhas, 'abertura_s': medido['abertura_s'],
+                          'primeira_ms': medido['primeira_ms']})
+            nao_suportados.update(medido['nao_suportados'])
+            print(f'\n{backend} {linhas} linhas: abertura {medido["abertura_s"]:.2f} s, '
+                  f'primeira requisição {medido["primeira_ms"]:.1f} ms')
+            print(f'  {"cenário":<20} {"endpoint":<11} {"mediana ms":>10} {"mín ms":>8} {"cache ms":>8} {"KB":>8}')
+            for r in medido['resultados']:
+                resultados.append({'backend': backend, 'linhas': linhas, **r})
+                print(f'  {r["cenario"]:<20} {r["endpoint"]:<11} {r["mediana_ms"]:>10.1f} {r["min_ms"]:>8.1f} '
+                      f'{r["cache_ms"]:>8.2f} {r["bytes"] / 1024:>8.1f}')
+            # Só os tempos interessam; a cópia (com o SQLite, partições etc.) pode ir embora
+            shutil.rmtree(execucao, ignore_errors=True)
+    if nao_suportados:
+        print(f'\nEndpoints não suportados nesta revisão: {", ".join(sorted(nao_suportados))}')
+    return carga, resultados, sorted(nao_suportados)
+
+
+def comparar(anterior, atual):
+    """Razão entre as medianas (anterior / atual) dos mesmos backend, tamanho, cenário e endpoint"""
+    chave = ('backend', 'linhas', 'cenario', 'endpoint')
+    base = {tuple(r[k] for k in chave): r for r in anterior['resultados']}
+    print(f'\nComparação com {anterior.get("versao") or "?"} ({anterior.get("data", "?")}); > 1 = mais rápido agora')
+    print(f'  {"backend":<7} {"linhas":>9} {"cenário":<20} {"endpoint":<11} {"antes ms":>9} {"agora ms":>9} {"razão":>7}')
+    for r in atual:
+        antes = base.get(tuple(r[k] for k in chave))
+        if antes is None:
+            continue
+        razao = antes['mediana_ms'] / r['mediana_ms'] if r['mediana_ms'] else float('inf')
+        print(f'  {r["backend"]:<7} {r["linhas"]:>9} {r["cenario"]:<20} {r["endpoint"]:<11} '
+              f'{antes["mediana_ms"]:>9.1f} {r["mediana_ms"]:>9.1f} {razao:>7.2f}')
+
+
+def versao_numpy(sem_numpy):
+    if sem_numpy:
+        return None
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy.__version__
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--revisao', default='HEAD', help='commit, branch ou tag medido ("local" = árvore de trabalho)')
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10_000, 100_000, 500_000])
+    parser.add_argument('--backends', nargs='+', choices=('csv', 'sqlite'), default=['csv', 'sqlite'])
+    parser.add_argument('--endpoints', nargs='+', choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--usuarios', type=int, default=40)
+    parser.add_argument('--rotinas', type=int, default=25)
+    parser.add_argument('--anos', type=int, default=3)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--sem-numpy', action='store_true', help='agrega em Python puro')
+    parser.add_argument('--dados', help='diretório onde guardar (e reaproveitar) os CSVs gerados')
+    parser.add_argument('--saida', help='arquivo JSON dos resultados (padrão: bench_endpoint_<revisão>_<data>.json)')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior')
+    parser.add_argument('--executar', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.executar:
+        executar(args.executar)
+        return 0
+
+    if 'dados' not in args.endpoints:
+        args.endpoints.insert(0, 'dados')
+    versao = identificar_revisao(args.revisao)
+
+    with tempfile.TemporaryDirectory() as temporario:
+        temporario = Path(temporario)
+        fonte = temporario / 'fonte'
+        fonte.mkdir()
+        extrair_revisao(args.revisao, fonte)
+        if args.dados:
+            diretorio_dados = Path(args.dados)
+            diretorio_dados.mkdir(parents=True, exist_ok=True)
+        else:
+            diretorio_dados = temporario / 'dados'
+            diretorio_dados.mkdir()
+        carga, resultados, nao_suportados = medir(args, fonte, diretorio_dados, temporario)
+
+    agora = datetime.now()
+    saida = Path(args.saida or f'bench_endpoint_{versao}_{agora:%Y%m%d_%H%M%S}.json')
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump({
+            'versao': versao,
+            'revisao': args.revisao,
+            'data': agora.isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': versao_numpy(args.sem_numpy),
+            'maquina': {'sistema': platform.platform(), 'cpus': os.cpu_count()},
+            'parametros': {k: v for k, v in vars(args).items() if k not in ('saida', 'comparar', 'dados', 'executar')},
+            'nao_suportados': nao_suportados,
+            'carga': carga,
+            'resultados': resultados,
+        }, f, ensure_ascii=False, indent=1)
+    print(f'\nResultados em {saida}')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(json.load(f), resultados)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Benchmark da gravação de relatórios sob envios concorrentes (relatorios.py)
+
+Várias threads registram execuções uma a uma, como as requisições da API e
+da interface, e mede-se a vazão (registros/s) e a latência até a
+confirmação de gravação em três modos:
+
+- legado: a gravação anterior de registrar_relatorio (abre o arquivo, confere
+  o tamanho e acrescenta uma linha por chamada, sem trava nem fsync)
+- direto: CsvStore.registrar por registro (trava fcntl e fsync por registro)
+- grupo: GravadorEmGrupo (lotes com uma trava e um fsync por lote)
+
+Com --processos, vários processos gravam ao mesmo tempo no mesmo arquivo
+pelo GravadorEmGrupo e o arquivo final é conferido (um único cabeçalho,
+nenhuma linha intercalada, nenhuma confirmação perdida).
+
+Uso:
+    python3 benchmarks/bench_gravacao.py
+    python3 benchmarks/bench_gravacao.py --threads 1 8 32 --por-thread 200 --processos 4
+"""
+
+import argparse
+import csv
+import multiprocessing
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from relatorios import CABECALHO, CsvStore, GravadorEmGrupo, Registro  # noqa: E402
+
+
+def registro(i):
+    agora = datetime.now()
+    return Registro(agora.date(), agora.strftime('%H:%M:%S'), f'Rotina {i % 8}', f'operador{i % 20:02d}', i % 40)
+
+
+def legado(caminho):
+    """Gravação anterior de registrar_relatorio (uma abertura por registro, sem trava)"""
+    def gravar(r):
+        arquivo_existe = caminho.exists()
+        with open(caminho, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if not arquivo_existe or caminho.stat().st_size == 0:
+                writer.writerow(CABECALHO)
+            writer.writerow([r.data.strftime('%d/%m/%Y'), r.hora, r.rotina, r.usuario, r.registros])
+    return gravar, None, None
+
+
+def direto(caminho):
+    store = CsvStore(caminho)
+    return lambda r: store.registrar([r]), None, store
+
+
+def grupo(caminho, intervalo_ms, max_lote):
+    store = CsvStore(caminho)
+    gravador = GravadorEmGrupo(store, intervalo_ms, max_lote)
+    return lambda r: gravador.gravar([r]), gravador, store
+
+
+def executar(gravar, threads, por_thread):
+    """Dispara as threads ao mesmo tempo; retorna (segundos, latências em ms)"""
+    latencias = []
+    barreira = threading.Barrier(threads + 1)
+
+    def trabalhador(t):
+        proprias = []
+        barreira.wait()
+        for i in range(por_thread):
+            inicio = time.perf_counter()
+            gravar(registro(t * por_thread + i))
+            proprias.append((time.perf_counter() - inicio) * 1000)
+        latencias.extend(proprias)
+
+    ativas = [threading.Thread(target=trabalhador, args=(t,)) for t in range(threads)]
+    for thread in ativas:
+        thread.start()
+    barreira.wait()
+    inicio = time.perf_counter()
+    for thread in ativas:
+        thread.join()
+    return time.perf_counter() - inicio, sorted(latencias)
+
+
+def percentil(valores, q):
+    return valores[min(len(valores) - 1, int(q * len(valores)))]
+
+
+def conferir(caminho, esperado):
+    """Confere o arquivo: um único cabeçalho e todas as linhas completas"""
+    with open(caminho, newline='', encoding='utf-8') as f:
+        linhas = list(csv.reader(f))
+    cabecalhos = sum(1 for linha in linhas if linha == CABECALHO)
+    corrompidas = sum(1 for linha in linhas[1:] if len(linha) != len(CABECALHO) or not linha[4].isdigit())
+    return cabecalhos, corrompidas, len(linhas) - 1, esperado
+
+
+def _processo(caminho, threads, por_thread, intervalo_ms, max_lote, fila):
+    gravar, gravador, store = grupo(Path(caminho), intervalo_ms, max_lote)
+    segundos, _ = executar(gravar, threads, por_thread)
+    gravador.parar()
+    store.gravar_pendente()
+    fila.put(segundos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--por-thread', type=int, default=200, help='registros enviados por thread')
+    parser.add_argument('--intervalo-ms', type=int, default=0)
+    parser.add_argument('--max-lote', type=int, default=1000)
+    parser.add_argument('--processos', type=int, default=4, help='processos gravando no mesmo arquivo (0 = não testar)')
+    args = parser.parse_args()
+
+    modos = {
+        'legado': legado,
+        'direto': direto,
+        'grupo': lambda caminho: grupo(caminho, args.intervalo_ms, args.max_lote),
+    }
+    print(f'{"threads":>7} {"modo":<7} {"registros/s":>12} {"p50 ms":>8} {"p99 ms":>8} {"lotes":>6}')
+    for threads in args.threads:
+        for nome, criar in modos.items():
+            with tempfile.TemporaryDirectory() as diretorio:
+                caminho = Path(diretorio) / 'relatorio.csv'
+                gravar, gravador, store = criar(caminho)
+                segundos, latencias = executar(gravar, threads, args.por_thread)
+                total = threads * args.por_thread
+                lotes = '-'
+                if gravador is not None:
+                    gravador.parar()
+                    lotes = gravador.stats()['lotes']
+                if store is not None:
+                    # Grava os totais diários e o índice pendentes antes de o diretório temporário sumir
+                    store.gravar_pendente()
+                print(f'{threads:>7} {nome:<7} {total / segundos:>12.0f} {percentil(latencias, 0.5):>8.2f} '
+                      f'{percentil(latencias, 0.99):>8.2f} {lotes:>6}')
+                if nome != 'legado':
+                    cabecalhos, corrompidas, linhas, esperado = conferir(caminho, total)
+                    if (cabecalhos, corrompidas, linhas) != (1, 0, esperado):
+                        print(f'ERRO: arquivo inconsistente ({nome}, {threads} threads): {cabecalhos} cabeçalhos, '
+                              f'{corrompidas} linhas corrompidas, {linhas} de {esperado} linhas')
+                        return 1
+
+    if args.processos:
+        threads = max(args.threads)
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = Path(diretorio) / 'relatorio.csv'
+            fila = multiprocessing.Queue()
+            processos = [multiprocessing.Process(target=_processo, args=(
+                str(caminho), threads, args.por_thread, args.intervalo_ms, args.max_lote, fila))
+                for _ in range(args.processos)]
+            inicio = time.perf_counter()
+            for processo in processos:
+                processo.start()
+            for processo in processos:
+                processo.join()
+            segundos = time.perf_counter() - inicio
+            total = args.processos * threads * args.por_thread
+            cabecalhos, corrompidas, linhas, esperado = conferir(caminho, total)
+            print(f'\n{args.processos} processos x {threads} threads no mesmo arquivo: {total / segundos:.0f} registros/s, '
+                  f'{cabecalhos} cabeçalho(s), {corrompidas} linhas corrompidas, {linhas} de {esperado} linhas')
+            if (cabecalhos, corrompidas, linhas) != (1, 0, esperado):
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
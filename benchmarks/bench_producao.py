@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Benchmark da agregação do painel de produção (producao.py)
+
+Compara a implementação anterior de get_producao_relatorios_dados (linha a
+linha, datetime.strptime duas vezes por linha e dicionários aninhados) com o
+motor em colunas, em Python puro e com NumPy, sobre linhas brutas do
+relatório. Os payloads são conferidos entre si em cada cenário.
+
+Com --payload, compara o tamanho e o tempo de serialização do payload
+denso (padrão) com o formato esparso (formato=esparso): em uma equipe com
+dezenas de usuários e rotinas, em que cada usuário executa poucas rotinas
+e não trabalha todos os dias, e nos dados uniformes acima (toda rotina de
+todo usuário em quase todo dia, o pior caso para o formato esparso).
+
+Uso:
+    python3 benchmarks/bench_producao.py
+    python3 benchmarks/bench_producao.py --tamanhos 10000 100000 1000000 --sem-legado
+    python3 benchmarks/bench_producao.py --payload
+"""
+
+import argparse
+import calendar
+import json
+import random
+import sys
+import time
+from array import array
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import producao  # noqa: E402
+from relatorios import Colunas, Filtro  # noqa: E402
+
+ROTINAS = ['Solicitar Tomografias', 'Internar Pacientes', 'Altas', 'Solicitar Internações',
+           'Evoluções', 'Exames Externos', 'Pendências', 'Transferências']
+USUARIOS = [f'operador{i:02d}' for i in range(20)]
+USERNAME_TO_NOME = {u: f'Operador {u[-2:]}' for u in USUARIOS[:15]}
+INICIO = date(2023, 1, 1)
+DIAS = 3 * 365
+
+
+def gerar(n, semente=42):
+    """Linhas sintéticas em ordem de data: dicionários (legado) e colunas (motor)"""
+    aleatorio = random.Random(semente)
+    linhas = []
+    dias, rotinas, usuarios, registros = array('i'), array('i'), array('i'), array('i')
+    for i in range(n):
+        dia = INICIO + timedelta(days=i * DIAS // n)
+        r, u, q = aleatorio.randrange(len(ROTINAS)), aleatorio.randrange(len(USUARIOS)), aleatorio.randint(0, 40)
+        linhas.append({'data': dia.strftime('%d/%m/%Y'), 'hora': '10:00:00', 'rotina': ROTINAS[r],
+                       'usuario': USUARIOS[u], 'registros': str(q)})
+        dias.append(dia.toordinal())
+        rotinas.append(r)
+        usuarios.append(u)
+        registros.append(q)
+    return linhas, Colunas(dias, None, rotinas, usuarios, registros, None, ROTINAS, USUARIOS)
+
+
+# ---------------------------------------------------------------------------
+# Implementação anterior (referência), sobre as linhas já lidas do CSV
+# ---------------------------------------------------------------------------
+
+def legado(dados_raw, data_inicial, data_final, usuarios_filtro_usernames, modulos, username_to_nome):
+    dados_filtrados = []
+    usuarios_unicos = set()
+    modulos_unicos = set()
+    for registro in dados_raw:
+        data_str = registro.get('data', '').strip()
+        try:
+            data_registro = datetime.strptime(data_str, '%d/%m/%Y')
+        except Exception:
+            try:
+                data_registro = datetime.strptime(data_str, '%Y-%m-%d')
+            except Exception:
+                continue
+        if data_inicial:
+            try:
+                if data_registro < datetime.strptime(data_inicial, '%Y-%m-%d'):
+                    continue
+            except Exception:
+                pass
+        if data_final:
+            try:
+                if data_registro > datetime.strptime(data_final, '%Y-%m-%d'):
+                    continue
+            except Exception:
+                pass
+        usuario_username = registro.get('usuario', '').strip()
+        if usuarios_filtro_usernames and usuario_username not in usuarios_filtro_usernames:
+            continue
+        rotina = registro.get('rotina', '').strip()
+        if modulos and rotina not in modulos:
+            continue
+        if usuario_username:
+            usuarios_unicos.add(username_to_nome.get(usuario_username, usuario_username))
+        if rotina:
+            modulos_unicos.add(rotina)
+        dados_filtrados.append({
+            'data': registro.get('data', ''), 'hora': registro.get('hora', ''), 'rotina': rotina,
+            'usuario': usuario_username, 'usuario_nome': username_to_nome.get(usuario_username, usuario_username),
+            'registros': int(registro.get('registros', 0) or 0)})
+
+    data_ini = datetime.strptime(data_inicial, '%Y-%m-%d')
+    data_fim = datetime.strptime(data_final, '%Y-%m-%d')
+    ano_ini, mes_ini, ano_fim, mes_fim = data_ini.year, data_ini.month, data_fim.year, data_fim.month
+    um_mes_only = (ano_ini == ano_fim and mes_ini == mes_fim)
+    producao_modulo, producao_usuario, producao_modulo_usuario, producao_periodo = {}, {}, {}, {}
+    for registro in dados_filtrados:
+        data_str = registro.get('data', '').strip()
+        try:
+            data_reg = datetime.strptime(data_str, '%d/%m/%Y')
+        except Exception:
+            try:
+                data_reg = datetime.strptime(data_str, '%Y-%m-%d')
+            except Exception:
+                continue
+        rotina, usuario_nome, registros = registro['rotina'], registro['usuario_nome'], registro['registros']
+        ano, mes, dia = data_reg.year, data_reg.month, data_reg.day
+        if data_reg < data_ini or data_reg > data_fim:
+            continue
+        chave = dia if um_mes_only else (ano, mes)
+        producao_modulo.setdefault(rotina, {})
+        producao_modulo[rotina][chave] = producao_modulo[rotina].get(chave, 0) + registros
+        producao_usuario.setdefault(usuario_nome, {})
+        producao_usuario[usuario_nome][chave] = producao_usuario[usuario_nome].get(chave, 0) + registros
+        producao_modulo_usuario.setdefault((rotina, usuario_nome), {})
+        producao_modulo_usuario[(rotina, usuario_nome)][chave] = producao_modulo_usuario[(rotina, usuario_nome)].get(chave, 0) + registros
+        chave_periodo = f"{ano}-{mes:02d}"
+        producao_periodo.setdefault(chave_periodo, {'ano': ano, 'mes': mes, 'registros': 0})
+        producao_periodo[chave_periodo]['registros'] += registros
+
+    if um_mes_only:
+        labels = list(range(1, calendar.monthrange(ano_ini, mes_ini)[1] + 1))
+        chaves, tipo_eixo, meses_periodo = labels, 'dia', [(ano_ini, mes_ini)]
+    else:
+        chaves = producao.meses_no_intervalo(ano_ini, mes_ini, ano_fim, mes_fim)
+        labels = [f"{producao.MESES_PT[m - 1]}/{a}" for a, m in chaves]
+        tipo_eixo, meses_periodo = 'mes', chaves
+
+    def series(tabela, rotulo=lambda k: k):
+        return [{'label': rotulo(k), 'data': [tabela[k].get(c, 0) for c in chaves]} for k in sorted(tabela)]
+
+    return {
+        'dados_modulo_resumo': {'labels': sorted(producao_modulo),
+                                'data': [sum(producao_modulo[r].values()) for r in sorted(producao_modulo)]},
+        'dados_modulo': {'labels': labels, 'datasets': series(producao_modulo), 'tipo_eixo': tipo_eixo},
+        'dados_usuario': {'labels': labels, 'datasets': series(producao_usuario), 'tipo_eixo': tipo_eixo},
+        'dados_usuario_detalhado': {'labels': labels, 'tipo_eixo': tipo_eixo,
+                                    'datasets': series(producao_modulo_usuario, lambda k: f"{k[0]} — {k[1]}")},
+        'dados_periodo': {'labels': [f"{producao.MESES_PT[m - 1]}/{a}" for a, m in meses_periodo],
+                          'datasets': [{'label': 'Total', 'data': [
+                              producao_periodo.get(f"{a}-{m:02d}", {}).get('registros', 0) for a, m in meses_periodo]}]},
+        'usuarios_disponiveis': sorted(usuarios_unicos),
+        'modulos_disponiveis': sorted(modulos_unicos),
+        'total_registros': len(dados_filtrados),
+    }
+
+
+def gerar_equipe(semente=7, usuarios=40, rotinas=25, inicio=date(2024, 1, 1), dias=2 * 365):
+    """Totais diários de uma equipe: em ~60% dos dias cada usuário executa de 1 a 3 das suas 6 rotinas"""
+    aleatorio = random.Random(semente)
+    perfis = [aleatorio.sample(range(rotinas), 6) for _ in range(usuarios)]
+    dias_col, rotinas_col, usuarios_col, registros, execucoes = (array('i') for _ in range(5))
+    for dia in range(dias):
+        ordinal = (inicio + timedelta(days=dia)).toordinal()
+        for u in range(usuarios):
+            if aleatorio.random() >= 0.6:
+                continue
+            for r in aleatorio.sample(perfis[u], aleatorio.randint(1, 3)):
+                dias_col.append(ordinal)
+                rotinas_col.append(r)
+                usuarios_col.append(u)
+                registros.append(aleatorio.randint(1, 40))
+                execucoes.append(1)
+    return Colunas(dias_col, None, rotinas_col, usuarios_col, registros, execucoes,
+                   [f'Rotina {r:02d}' for r in range(rotinas)], [f'operador{u:02d}' for u in range(usuarios)])
+
+
+def comparar_payload(repeticoes):
+    """Tamanho do JSON e tempo de serialização + leitura: denso x esparso"""
+    equipe = gerar_equipe()
+    _, uniforme = gerar(200_000)
+    bases = {
+        'equipe': (equipe, '2025-03-01', '2025-03-31', '2024-01-01', '2025-12-31'),
+        'uniforme': (uniforme, '2024-06-01', '2024-06-30', '2023-01-01', '2025-12-31'),
+    }
+    print(f'{"dados":<9} {"cenário":<12} {"denso KB":>9} {"esparso KB":>11} {"redução":>8} '
+          f'{"denso ms":>9} {"esparso ms":>11}')
+    for base, (colunas, mes_ini, mes_fim, ini, fim) in bases.items():
+        nomes = {u: u.title() for u in colunas.nomes_usuarios}
+        for nome, (a, b) in (('um mês', (mes_ini, mes_fim)), ('dois anos+', (ini, fim))):
+            filtro = Filtro.criar(date.fromisoformat(a), date.fromisoformat(b))
+            medidas = []
+            for formato in ('denso', 'esparso'):
+                payload = producao.dados_graficos(colunas, filtro, filtro.inicio, filtro.fim, nomes, formato=formato)
+
+                def serializar():
+                    texto = json.dumps(payload, separators=(',', ':'))
+                    json.loads(texto)
+                    return texto
+
+                texto, tempo = cronometrar(serializar, repeticoes)
+                medidas.append((len(texto.encode()), tempo))
+            (denso, t_denso), (esparso, t_esparso) = medidas
+            print(f'{base:<9} {nome:<12} {denso / 1024:>9.1f} {esparso / 1024:>11.1f} {1 - esparso / denso:>8.0%} '
+                  f'{t_denso:>9.2f} {t_esparso:>11.2f}')
+
+
+CENARIOS = {
+    'tres anos': ('2023-01-01', '2025-12-31', [], []),
+    'um mês': ('2024-06-01', '2024-06-30', [], []),
+    'um ano, filtros': ('2024-01-01', '2024-12-31', USUARIOS[:5], ROTINAS[:3]),
+}
+
+
+def cronometrar(funcao, repeticoes):
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return resultado, melhor * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--sem-legado', action='store_true', help='não mede a implementação anterior (lenta em 1M)')
+    parser.add_argument('--payload', action='store_true', help='compara o payload denso com o formato esparso')
+    args = parser.parse_args()
+
+    if args.payload:
+        comparar_payload(args.repeticoes)
+        return 0
+
+    if producao.np is None:
+        print('NumPy não instalado: apenas o motor em Python puro será medido')
+    print(f'{"linhas":>9} {"cenário":<16} {"legado ms":>10} {"python ms":>10} {"numpy ms":>10} {"ganho":>7}')
+    for n in args.tamanhos:
+        linhas, colunas = gerar(n)
+        for nome, (ini, fim, usuarios, rotinas) in CENARIOS.items():
+            filtro = Filtro.criar(date.fromisoformat(ini), date.fromisoformat(fim), usuarios, rotinas)
+
+            def motor(usar_numpy):
+                return producao.dados_graficos(colunas, filtro, filtro.inicio, filtro.fim, USERNAME_TO_NOME,
+                                               usar_numpy=usar_numpy)
+
+            puro, t_puro = cronometrar(lambda: motor(False), args.repeticoes)
+            t_legado = t_numpy = None
+            if producao.np is not None:
+                vetorizado, t_numpy = cronometrar(lambda: motor(True), args.repeticoes)
+                if vetorizado != puro:
+                    print(f'ERRO: NumPy e Python puro diferem ({n}, {nome})')
+                    return 1
+            if not args.sem_legado:
+                referencia, t_legado = cronometrar(
+                    lambda: legado(linhas, ini, fim, usuarios, rotinas, USERNAME_TO_NOME), 1)
+                if referencia != puro:
+                    print(f'ERRO: motor difere da implementação anterior ({n}, {nome})')
+                    return 1
+            melhor = t_numpy if t_numpy is not None else t_puro
+            ganho = f'{t_legado / melhor:>6.0f}x' if t_legado else '-'
+            print(f'{n:>9} {nome:<16} {t_legado or 0:>10.1f} {t_puro:>10.1f} {t_numpy or 0:>10.1f} {ganho:>7}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
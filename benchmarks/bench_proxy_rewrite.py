@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Benchmark do motor de reescrita do proxy do robô (proxy_rewrite)
+
+Compara o motor de passada única com a implementação anterior (várias
+chamadas re.sub sobre o corpo inteiro), conferindo que a saída é idêntica
+e medindo o tempo de cada uma.
+
+Uso:
+    python3 benchmarks/bench_proxy_rewrite.py
+    python3 benchmarks/bench_proxy_rewrite.py --bundle /caminho/captura_kasm
+    python3 benchmarks/bench_proxy_rewrite.py --sintetico
+
+O diretório de captura deve conter os arquivos baixados do Kasm
+(index.html, *.js, *.css). O padrão é benchmarks/captura_kasm, montado a
+partir do cliente KasmVNC (entrada, bundle do Vite minificado em uma linha,
+webutil e CSS), com as construções que desalinham um tokenizador ingênuo:
+aspas em expressões regulares, template literals e comentários. Para medir
+com um bundle maior, --sintetico gera em memória um bundle com a mesma
+estrutura.
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlparse, quote as url_quote
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from proxy_rewrite import rewrite_html, rewrite_js, rewrite_css  # noqa: E402
+
+BASE_URL = 'https://127.0.0.1:6901'
+BASE_HREF = 'https://autoreg.local/api/robo-proxy'
+CAPTURA_PADRAO = Path(__file__).resolve().parent / 'captura_kasm'
+
+
+# ---------------------------------------------------------------------------
+# Implementação anterior (referência), uma chamada re.sub por regra.
+# Em JS foram corrigidos os dois defeitos que impediam a reescrita de rodar
+# (base_href indefinido e grupos invertidos na regra de strings) e um terceiro:
+# a regra de strings, aplicada depois das outras, podia começar na aspa que
+# fecha a URL de um fetch()/open()/import() já reescrito e tratar o código
+# até a aspa seguinte como URL (fetch("/x").then(e=>e.json())...). A aspa de
+# fechamento dessas URLs é marcada com FIM_URL enquanto as regras rodam.
+# ---------------------------------------------------------------------------
+
+FIM_URL = '\x00'
+
+
+def _marcar_fim_url(callback):
+    """Marca a aspa que fecha a URL na substituição (a última aspa do texto)"""
+    def marcado(match):
+        texto = callback(match)
+        aspa = max(texto.rfind('"'), texto.rfind("'"))
+        return texto[:aspa] + FIM_URL + texto[aspa:]
+    return marcado
+
+def legacy_html(html_content, base_url, base_path='/'):
+    html_content = re.sub(r'<base[^>]*>', '', html_content, flags=re.IGNORECASE)
+
+    def resolver(url):
+        if url.startswith('/'):
+            return base_url.rstrip('/') + url
+        if url.startswith('./'):
+            return base_url.rstrip('/') + base_path.rstrip('/') + '/' + url[2:]
+        return base_url.rstrip('/') + base_path.rstrip('/') + '/' + url
+
+    def rewrite_url(match):
+        attr, quote, url = match.group(1), match.group(2), match.group(3).strip()
+        if url.startswith(('http://', 'https://', '//', 'data:', 'javascript:', 'mailto:', 'tel:', '#')):
+            return match.group(0)
+        if url.startswith('/api/robo-proxy'):
+            return match.group(0)
+        return f'{attr}={quote}/api/robo-proxy?url={url_quote(resolver(url), safe="")}{quote}'
+
+    html_content = re.sub(
+        r'\b(href|src|action|formaction|data|background|cite|codebase|longdesc|usemap|profile|manifest)\s*=\s*(["\'])([^"\']+)\2',
+        rewrite_url, html_content, flags=re.IGNORECASE)
+
+    def rewrite_css_url(match):
+        quote, url = match.group(1), match.group(2).strip()
+        if url.startswith(('http://', 'https://', '//', 'data:', '#')):
+            return match.group(0)
+        if url.startswith('/api/robo-proxy'):
+            return match.group(0)
+        return f'url({quote}/api/robo-proxy?url={url_quote(resolver(url), safe="")}{quote})'
+
+    return re.sub(r'url\s*\(\s*(["\']?)([^"\'()]+)\1\s*\)', rewrite_css_url, html_content, flags=re.IGNORECASE)
+
+
+def legacy_js(js_content, base_url_https, base_href):
+    def build_proxy_url(url_path):
+        if url_path.startswith('/'):
+            original_url = base_url_https.rstrip('/') + url_path
+        elif url_path.startswith('./'):
+            original_url = base_url_https.rstrip('/') + '/' + url_path[2:]
+        elif url_path.startswith('../'):
+            original_url = base_url_https.rstrip('/') + '/' + url_path.lstrip('../').lstrip('/')
+        else:
+            original_url = base_url_https.rstrip('/') + '/' + url_path
+        return f'/api/robo-proxy?url={url_quote(original_url, safe="")}'
+
+    def rewrite_js_import(match):
+        import_path = match.group(1).strip().strip('"\'')
+        if import_path.startswith(('http://', 'https://', '//', '/api/robo-proxy', 'data:', 'blob:')):
+            return match.group(0)
+        return f'import("{build_proxy_url(import_path)}")'
+
+    js_content = re.sub(r'import\s*\(\s*["\']([^"\']+)["\']\s*\)', _marcar_fim_url(rewrite_js_import), js_content)
+
+    def rewrite_websocket(match):
+        ws_url = match.group(1).strip().strip('"\'')
+        if ws_url.startswith(('ws://', 'wss://', '/api/robo-ws')):
+            if ws_url.startswith(('ws://', 'wss://')):
+                ws_url_clean = ws_url.replace('ws://', '').replace('wss://', '')
+                if '://' in ws_url_clean:
+                    parsed = urlparse(ws_url_clean)
+                    original_url = f'https://{parsed.netloc}{parsed.path or "/"}'
+                else:
+                    original_url = base_url_https.rstrip('/') + (ws_url_clean if ws_url_clean.startswith('/') else '/' + ws_url_clean)
+                return f'new WebSocket("/api/robo-ws?url={url_quote(original_url, safe="")}")'
+            return match.group(0)
+        original_url = base_url_https.rstrip('/') + (ws_url if ws_url.startswith('/') else '/' + ws_url)
+        return f'new WebSocket("/api/robo-ws?url={url_quote(original_url, safe="")}")'
+
+    js_content = re.sub(r'new\s+WebSocket\s*\(\s*["\']([^"\']+)["\']\s*\)', _marcar_fim_url(rewrite_websocket), js_content, flags=re.IGNORECASE)
+
+    def rewrite_fetch(match):
+        fetch_url = match.group(1).strip().strip('"\'')
+        if fetch_url.startswith(('http://', 'https://', '//', 'data:', 'blob:', '/api/robo-proxy')):
+            if fetch_url.startswith('http://'):
+                fetch_url = fetch_url.replace('http://', 'https://', 1)
+            return match.group(0).replace(match.group(1), fetch_url)
+        return match.group(0).replace(match.group(1), build_proxy_url(fetch_url))
+
+    js_content = re.sub(r'fetch\s*\(\s*["\']([^"\']+)["\']', _marcar_fim_url(rewrite_fetch), js_content, flags=re.IGNORECASE)
+
+    def rewrite_xhr_open(match):
+        method, xhr_url = match.group(1), match.group(2).strip().strip('"\'')
+        if xhr_url.startswith(('http://', 'https://', '//', 'data:', 'blob:', '/api/robo-proxy')):
+            if xhr_url.startswith('http://'):
+                xhr_url = xhr_url.replace('http://', 'https://', 1)
+            return f'.open({method}, "{xhr_url}"'
+        return f'.open({method}, "{build_proxy_url(xhr_url)}"'
+
+    js_content = re.sub(r'\.open\s*\(\s*(["\']?\w+["\']?)\s*,\s*["\']([^"\']+)["\']', _marcar_fim_url(rewrite_xhr_open), js_content, flags=re.IGNORECASE)
+
+    def rewrite_js_url_string(match):
+        quote, url = match.group(1), match.group(2)
+        if url.startswith(('http://', 'https://', '//', 'data:', 'blob:', 'javascript:', 'mailto:', 'tel:', '#', '/api/robo-proxy', '/api/robo-ws')):
+            if url.startswith('http://'):
+                url = url.replace('http://', 'https://', 1)
+            return f'{quote}{url}{quote}'
+        return f'{quote}{build_proxy_url(url)}{quote}'
+
+    js_content = re.sub(
+        r'(?<!\x00)(["\'])((?:\./|\.\./|/)?[^"\']*(?:\.js|\.css|\.png|\.jpg|\.jpeg|\.gif|\.svg|\.woff|\.woff2|\.ttf|\.eot|\.ico|\.mp3|\.oga|\.mp4|\.webm)[^"\']*)\1',
+        rewrite_js_url_string, js_content).replace(FIM_URL, '')
+
+    return re.sub(r'import\.meta\.url', f'"{base_href}"', js_content)
+
+
+def legacy_css(css_content, base_url):
+    def rewrite_css_url_in_file(match):
+        quote, url = match.group(1), match.group(2).strip()
+        if url.startswith(('http://', 'https://', '//', 'data:', '/api/robo-proxy')):
+            return match.group(0)
+        if url.startswith('/'):
+            original_url = base_url.rstrip('/') + url
+        elif url.startswith('../'):
+            original_url = base_url.rstrip('/') + '/' + url.lstrip('../').lstrip('/')
+        elif url.startswith('./'):
+            original_url = base_url.rstrip('/') + '/' + url[2:]
+        else:
+            original_url = base_url.rstrip('/') + '/' + url
+        return f'url({quote}/api/robo-proxy?url={url_quote(original_url, safe="")}{quote})'
+
+    css_content = re.sub(r'url\s*\(\s*(["\']?)([^"\'()]+?)\1\s*\)', rewrite_css_url_in_file, css_content, flags=re.IGNORECASE)
+
+    def rewrite_css_import(match):
+        import_url = match.group(1).strip().strip('"\'')
+        if import_url.startswith(('http://', 'https://', '//', 'data:', '/api/robo-proxy')):
+            return match.group(0)
+        if import_url.startswith('/'):
+            original_url = base_url.rstrip('/') + import_url
+        else:
+            original_url = base_url.rstrip('/') + '/' + import_url
+        return f'@import "/api/robo-proxy?url={url_quote(original_url, safe="")}"'
+
+    return re.sub(r'@import\s+["\']([^"\']+)["\']', rewrite_css_import, css_content, flags=re.IGNORECASE)
+
+
+# ---------------------------------------------------------------------------
+# Bundle sintético com a estrutura do cliente KasmVNC (Vite)
+# ---------------------------------------------------------------------------
+
+def gerar_bundle_sintetico(repeticoes=400):
+    """Gera HTML, JS e CSS com a mesma distribuição de construções do cliente Kasm"""
+    html = ['<!DOCTYPE html><html><head><meta charset="utf-8"><base href="/">',
+            '<link rel="stylesheet" href="./assets/webutil-Dix4qgyj.css">',
+            '<script type="module" crossorigin src="/assets/index-B1x9Qk2d.js"></script></head><body>']
+    for i in range(repeticoes // 4):
+        html.append(f'<div id="p{i}" class="noVNC_panel" style="background:url(img/bg{i}.png)">'
+                    f'<img src="app/images/icon{i}.svg" alt=""><a href="#sec{i}">x</a></div>')
+    html.append('</body></html>')
+
+    js = []
+    for i in range(repeticoes):
+        js.append(
+            f'const m{i}=()=>import("./chunk-{i:04x}.js");'
+            f'function f{i}(e){{if(e.keyCode==={i % 255}){{return "tecla {i}"}}'
+            f'const t=new XMLHttpRequest;t.open("GET","api/get_bottleneck_stats?i={i}");'
+            f'fetch("/api/get_frame_stats?client={i}");'
+            f'let s=\'icons/sound{i % 7}.mp3\',w="https://example.org/{i}";return s+w}}'
+            f'var k{i}={{name:"rfb_{i}",path:"websockify",msg:"Falha ao conectar ({i})"}};'
+        )
+        if i % 50 == 0:
+            js.append(f'this._sock=new WebSocket("websockify");const u{i}=new URL("x.wasm",import.meta.url);')
+    css = []
+    for i in range(repeticoes):
+        css.append(f'.noVNC_button_{i}{{background-image:url("../images/btn{i}.svg");color:#{i % 999:03d}}}'
+                   f'@font-face{{font-family:f{i};src:url(fonts/Orbitron{i}.woff2) format("woff2")}}')
+        if i % 100 == 0:
+            css.append(f'@import "base{i}.css";')
+    return {'index.html': ''.join(html), 'bundle.js': ''.join(js), 'estilo.css': ''.join(css)}
+
+
+def carregar_captura(diretorio):
+    arquivos = {}
+    for caminho in sorted(Path(diretorio).rglob('*')):
+        if caminho.suffix in ('.html', '.js', '.css') and caminho.is_file():
+            arquivos[str(caminho.relative_to(diretorio))] = caminho.read_text(encoding='utf-8', errors='ignore')
+    return arquivos
+
+
+def medir(funcao, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bundle', default=str(CAPTURA_PADRAO), help='Diretório com uma captura do cliente Kasm')
+    parser.add_argument('--sintetico', action='store_true', help='Usa um bundle sintético maior gerado em memória')
+    parser.add_argument('--repeticoes', type=int, default=20)
+    args = parser.parse_args()
+
+    arquivos = gerar_bundle_sintetico() if args.sintetico else carregar_captura(args.bundle)
+    if not arquivos:
+        print('Nenhum arquivo .html/.js/.css encontrado')
+        return 1
+
+    divergencias = 0
+    total_antigo = total_novo = 0.0
+    print(f"{'arquivo':40} {'KB':>8} {'antigo ms':>10} {'novo ms':>10} {'ganho':>7}")
+    for nome, conteudo in arquivos.items():
+        if nome.endswith('.html'):
+            antigo = lambda: legacy_html(conteudo, BASE_URL, '/')
+            novo = lambda: rewrite_html(conteudo, BASE_URL, '/')
+        elif nome.endswith('.js'):
+            antigo = lambda: legacy_js(conteudo, BASE_URL, BASE_HREF)
+            novo = lambda: rewrite_js(conteudo, BASE_URL, BASE_HREF)
+        else:
+            antigo = lambda: legacy_css(conteudo, BASE_URL)
+            novo = lambda: rewrite_css(conteudo, BASE_URL)
+
+        if antigo() != novo():
+            divergencias += 1
+            print(f'  ! saída divergente em {nome}')
+
+        t_antigo = medir(antigo, args.repeticoes)
+        t_novo = medir(novo, args.repeticoes)
+        total_antigo += t_antigo
+        total_novo += t_novo
+        print(f'{nome[:40]:40} {len(conteudo) / 1024:8.1f} {t_antigo * 1000:10.2f} {t_novo * 1000:10.2f} {t_antigo / t_novo:6.2f}x')
+
+    print(f"{'TOTAL':40} {'':8} {total_antigo * 1000:10.2f} {total_novo * 1000:10.2f} {total_antigo / total_novo:6.2f}x")
+    print('Saída equivalente' if not divergencias else f'{divergencias} arquivo(s) com saída divergente')
+    return 1 if divergencias else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memória da reescrita em streaming do proxy do robô
+
+Compara o pico de memória (tracemalloc) da reescrita do corpo inteiro
+(rewrite_body) com a reescrita em streaming (rewrite_body_stream) para
+HTML e CSS de vários tamanhos. Os blocos do modo streaming são gerados sob
+demanda, como chegariam do servidor original, e a saída é conferida contra
+a reescrita do corpo inteiro.
+
+Uso:
+    python3 benchmarks/bench_proxy_stream.py
+    python3 benchmarks/bench_proxy_stream.py --tamanhos 1 4 16 64
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from proxy_rewrite import rewrite_body, rewrite_body_stream  # noqa: E402
+
+BASE_URL = 'https://127.0.0.1:6901'
+SCRIPT_TAG = '<script src="/api/robo-proxy-interceptor/bench.js"></script>'
+BLOCO = 64 * 1024
+
+MODELOS = {
+    'html': ('text/html; charset=utf-8',
+             b'<!DOCTYPE html><html><head><base href="/"></head><body>',
+             b'<div class="p" style="background:url(img/bg.png)"><img src="app/images/icone.svg">'
+             b'<a href="#s">\xc3\xa7</a><link href="/assets/x.css"></div>\n',
+             b'</body></html>'),
+    'css': ('text/css',
+            b'@import "base.css";',
+            b'.b{background-image:url("../images/btn.svg");color:#123}'
+            b'@font-face{font-family:f;src:url(fonts/Orbitron.woff2) format("woff2")}\n',
+            b''),
+}
+
+
+def gerar_blocos(modelo, tamanho):
+    """Gera o corpo em blocos de BLOCO bytes, sem montá-lo inteiro"""
+    _, inicio, linha, fim = modelo
+    por_bloco = linha * (BLOCO // len(linha))
+    yield inicio
+    enviado = len(inicio)
+    while enviado < tamanho:
+        yield por_bloco
+        enviado += len(por_bloco)
+    yield fim
+
+
+def medir(funcao):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    total = funcao()
+    tempo = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return total, pico, tempo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[1, 8, 32], help='tamanhos dos corpos em MB')
+    args = parser.parse_args()
+
+    for nome, modelo in MODELOS.items():
+        content_type = modelo[0]
+        corpo = b''.join(gerar_blocos(modelo, 1024 * 1024))
+        inteiro = rewrite_body(corpo, content_type, BASE_URL, 'index.html', SCRIPT_TAG)
+        stream = b''.join(rewrite_body_stream(iter([corpo[i:i + 4099] for i in range(0, len(corpo), 4099)]),
+                                              content_type, BASE_URL, 'index.html', SCRIPT_TAG))
+        if inteiro != stream:
+            print(f'ERRO: saída em streaming diferente para {nome}')
+            return 1
+
+    print(f'{"tipo":<6} {"MB":>5} {"inteiro pico MB":>16} {"stream pico MB":>15} {"inteiro s":>10} {"stream s":>9}')
+    for nome, modelo in MODELOS.items():
+        content_type = modelo[0]
+        for mb in args.tamanhos:
+            tamanho = mb * 1024 * 1024
+
+            def inteiro():
+                corpo = b''.join(gerar_blocos(modelo, tamanho))
+                return len(rewrite_body(corpo, content_type, BASE_URL, 'index.html', SCRIPT_TAG))
+
+            def stream():
+                return sum(len(b) for b in rewrite_body_stream(
+                    gerar_blocos(modelo, tamanho), content_type, BASE_URL, 'index.html', SCRIPT_TAG))
+
+            total_inteiro, pico_inteiro, tempo_inteiro = medir(inteiro)
+            total_stream, pico_stream, tempo_stream = medir(stream)
+            if total_inteiro != total_stream:
+                print(f'ERRO: tamanhos diferentes para {nome} {mb} MB')
+                return 1
+            print(f'{nome:<6} {mb:>5} {pico_inteiro / 2**20:>16.1f} {pico_stream / 2**20:>15.2f} '
+                  f'{tempo_inteiro:>10.2f} {tempo_stream:>9.2f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
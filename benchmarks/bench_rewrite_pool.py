@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark da latência de eventos SSE durante a reescrita de bundles do proxy
+
+Simula o worker do Gunicorn: uma thread "SSE" emite um evento a cada
+intervalo fixo (como o gerador que repassa a saída de uma execução do
+AUTOREG) enquanto outras threads reescrevem bundles grandes do Kasm, como
+acontece quando alguém abre "Visualizar Robô". Mede o atraso de cada evento
+em relação ao horário previsto, com a reescrita na própria thread (antes) e
+no RewritePool (depois), e confere que a saída é idêntica.
+
+Uso:
+    python3 benchmarks/bench_rewrite_pool.py
+    python3 benchmarks/bench_rewrite_pool.py --segundos 10 --threads 2 --processos 2
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from proxy_rewrite import rewrite_body  # noqa: E402
+from rewrite_pool import RewritePool  # noqa: E402
+from bench_proxy_rewrite import gerar_bundle_sintetico, BASE_URL  # noqa: E402
+
+SCRIPT_TAG = '<script src="/api/robo-proxy-interceptor/bench.js"></script>'
+# Só HTML e CSS são reescritos pelo proxy; o JavaScript passa sem alteração
+TIPOS = {'index.html': 'text/html; charset=utf-8', 'estilo.css': 'text/css'}
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def medir(pool, corpos, segundos, threads, intervalo_ms):
+    """Roda a thread SSE e as threads de reescrita; retorna atrasos (ms) e bundles reescritos"""
+    parar = threading.Event()
+    atrasos = []
+    reescritos = [0]
+    lock = threading.Lock()
+
+    def sse():
+        intervalo = intervalo_ms / 1000
+        previsto = time.perf_counter() + intervalo
+        while not parar.is_set():
+            espera = previsto - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            atrasos.append((time.perf_counter() - previsto) * 1000)
+            previsto += intervalo
+
+    def reescrever():
+        while not parar.is_set():
+            for nome, corpo in corpos.items():
+                pool.run(rewrite_body, corpo, TIPOS[nome], BASE_URL, 'assets/' + nome, SCRIPT_TAG)
+            with lock:
+                reescritos[0] += 1
+
+    trabalhadores = [threading.Thread(target=reescrever, daemon=True) for _ in range(threads)]
+    tick = threading.Thread(target=sse, daemon=True)
+    tick.start()
+    for t in trabalhadores:
+        t.start()
+    time.sleep(segundos)
+    parar.set()
+    tick.join()
+    for t in trabalhadores:
+        t.join()
+    return atrasos, reescritos[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--segundos', type=float, default=5.0, help='duração de cada cenário')
+    parser.add_argument('--threads', type=int, default=2, help='threads reescrevendo em paralelo (gunicorn threads)')
+    parser.add_argument('--processos', type=int, default=2, help='processos do RewritePool')
+    parser.add_argument('--intervalo', type=float, default=10.0, help='intervalo entre eventos SSE (ms)')
+    parser.add_argument('--repeticoes', type=int, default=6000, help='tamanho do bundle sintético')
+    args = parser.parse_args()
+
+    corpos = {nome: texto.encode('utf-8') for nome, texto in gerar_bundle_sintetico(args.repeticoes).items()
+              if nome in TIPOS}
+    total_kb = sum(len(c) for c in corpos.values()) / 1024
+    print(f'Bundle sintético: {total_kb:.0f} KB ({", ".join(f"{n}={len(c) // 1024} KB" for n, c in corpos.items())})')
+
+    inline = RewritePool(max_workers=0)
+    processos = RewritePool(max_workers=args.processos)
+    for nome, corpo in corpos.items():
+        argumentos = (corpo, TIPOS[nome], BASE_URL, 'assets/' + nome, SCRIPT_TAG)
+        if inline.run(rewrite_body, *argumentos) != processos.run(rewrite_body, *argumentos):
+            print(f'ERRO: saída diferente entre inline e pool para {nome}')
+            return 1
+
+    atrasos_ociosos, _ = medir(inline, {}, min(args.segundos, 2.0), 0, args.intervalo)
+    print(f'\nSem carga: p50={statistics.median(atrasos_ociosos):.2f} ms  p99={percentil(atrasos_ociosos, 0.99):.2f} ms')
+
+    print(f'\n{"cenário":<10} {"eventos":>8} {"p50 ms":>8} {"p99 ms":>8} {"máx ms":>8} {"bundles/s":>10}')
+    for nome, pool in (('inline', inline), ('processos', processos)):
+        atrasos, reescritos = medir(pool, corpos, args.segundos, args.threads, args.intervalo)
+        print(f'{nome:<10} {len(atrasos):>8} {statistics.median(atrasos):>8.2f} '
+              f'{percentil(atrasos, 0.99):>8.2f} {max(atrasos):>8.2f} {reescritos / args.segundos:>10.1f}')
+    processos.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
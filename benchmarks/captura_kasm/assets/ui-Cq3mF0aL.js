@@ -0,0 +1,2 @@
+const __vite__mapDeps=(i,m=__vite__mapDeps,d=(m.f||(m.f=["assets/rfb-Dk29xQ1m.js","assets/webutil-BvX2kR9d.js","assets/keyboard-C8hLp0sN.js","assets/ui-D8sPq1Zt.css"])))=>i.map(i=>d[i]);import{initLogging as me,getQueryVar as C,readCookie as ge,setCookie as Ee,escapeHtml as be,loadTranslations as ye,loadSettings as Ae,defaults as Q,loadStyle as Se}from"./webutil-BvX2kR9d.js";(function(){const t=document.createElement("link").relList;if(t&&t.supports&&t.supports("modulepreload"))return;for(const r of document.querySelectorAll('link[rel="modulepreload"]'))s(r);new MutationObserver(r=>{for(const o of r)if(o.type==="childList")for(const i of o.addedNodes)i.tagName==="LINK"&&i.rel==="modulepreload"&&s(i)}).observe(document,{childList:!0,subtree:!0});function n(r){const o={};return r.integrity&&(o.integrity=r.integrity),r.referrerPolicy&&(o.referrerPolicy=r.referrerPolicy),r.crossOrigin==="use-credentials"?o.credentials="include":r.crossOrigin==="anonymous"?o.credentials="omit":o.credentials="same-origin",o}function s(r){if(r.ep)return;r.ep=!0;const o=n(r);fetch(r.href,o)}})();const we="modulepreload",Le=function(e){return"/"+e},Z={},$=function(t,n,s){let r=Promise.resolve();if(n&&n.length>0){document.getElementsByTagName("link");const i=document.querySelector("meta[property=csp-nonce]"),l=(i==null?void 0:i.nonce)||(i==null?void 0:i.getAttribute("nonce"));r=Promise.allSettled(n.map(c=>{if(c=Le(c),c in Z)return;Z[c]=!0;const a=c.endsWith(".css"),u=a?'[rel="stylesheet"]':"";if(document.querySelector(`link[href="${c}"]${u}`))return;const f=document.createElement("link");if(f.rel=a?"stylesheet":we,a||(f.as="script"),f.crossOrigin="",f.href=c,l&&f.setAttribute("nonce",l),document.head.appendChild(f),a)return new Promise((h,p)=>{f.addEventListener("load",h),f.addEventListener("error",()=>p(new Error(`Unable to preload CSS for ${c}`)))})}))}return r.then(i=>{for(const l of i||[])l.status==="rejected"&&o(l.reason);return t().catch(o)})};/* Translations: strings like "Can't connect" and 'Password "required"' come from app/locale/*.json */var r=/["']/g;var a="assets/x.js";fetch("/api/data");var b="img/y.png";const J={connecting:"Connecting...",connected:"Connected (encrypted) to ",disconnecting:"Disconnecting...",disconnected:"Disconnected",failed:"Can't connect: ",password:'Password "required"'};function Ie(e){return e.replace(/[.*+?^${}()|[\]\\]/g,"\\$&")}function xe(e){return String(e).replace(/\s+/g," ").replace(/^['"]|['"]$/g,"")}function Te(e){const t=e.match(/^(wss?):\/\/([^/:]+)(?::(\d+))?(\/.*)?$/i);return t?{scheme:t[1],host:t[2],port:t[3]||"",path:t[4]||"/"}:null}const _={connected:!1,desktopName:"",inhibitReconnect:!0,reconnectCallback:null,statusTimeout:null,hideKeyboardTimeout:null,controlbarGrabbed:!1,async start(){me(C("logging","warn"));const e=await Ae();_.settings=e;const t=navigator.language&&navigator.language.split("-")[0];try{_.messages=await ye(t||"en")}catch(n){console.warn(`Translation load failed for '${t}': ${n.message}`)}Se("app/styles/base.css"),document.documentElement.classList.remove("noVNC_loading");const s=new Audio(Q.bell);s.volume=.5,_.bell=s;document.getElementById("noVNC_bell").src="app/sounds/bell.oga";_.addControlbarHandlers(),_.addConnectionControlHandlers(),_.openConnectPanel()},connect(e){const t=C("host",window.location.hostname),n=C("port",window.location.port),s=C("path","websockify"),o=window.location.protocol==="https:"?"wss":"ws";let i=`${o}://${t}${n?":"+n:""}/${s}`;_.updateVisualState("connecting");_.sock=new WebSocket("websockify");const l=new URL("../images/cursor.png",import.meta.url);_.cursorUrl=l.href;return $(()=>import("./rfb-Dk29xQ1m.js").then(c=>(_.rfb=new c.default(document.getElementById("noVNC_container"),i,{shared:!0,credentials:{password:e}}),_.rfb)),__vite__mapDeps([0,1,2,3]))},showStatus(e,t,n){clearTimeout(_.statusTimeout);const s=document.getElementById("noVNC_status");s.classList.remove("noVNC_status_normal","noVNC_status_warn","noVNC_status_error"),s.classList.add(`noVNC_status_${t||"normal"}`),s.textContent=e;const o=t==="error"?'<img src="app/images/error.svg" alt="">':"";s.insertAdjacentHTML("afterbegin",o),n!==0&&(_.statusTimeout=setTimeout(()=>_.hideStatus(),n||1500))},hideStatus(){clearTimeout(_.statusTimeout),document.getElementById("noVNC_status").classList.remove("noVNC_open")},sendStats(){const e=new XMLHttpRequest;e.open("POST","api/get_frame_stats?client=all"),e.setRequestHeader("Content-Type","application/json"),e.send(JSON.stringify({ts:Date.now()}))},bottleneck(){return fetch('/api/get_bottleneck_stats').then(e=>e.json()).then(e=>_.showStatus(`CPU ${e.cpu}% / net ${e.net}ms`,"normal"))},downloadLog(){const e=document.createElement("a");e.href="/api/logs/kasmvnc.log",e.download="kasmvnc.log",e.click()},icons:{drag:"app/images/drag.svg",keyboard:'app/images/keyboard.svg',clipboard:"./app/images/clipboard.svg",fullscreen:"/app/images/fullscreen.svg",expander:"app/images/expander.svg",logo:"https://kasmweb.com/img/logo.svg",blob:"blob:https://localhost/x.png"},addControlbarHandlers(){document.getElementById("noVNC_control_bar").addEventListener("mousemove",_.activateControlbar),document.getElementById("noVNC_keyboard_button").addEventListener("click",_.toggleVirtualKeyboard)},escape:be,cookie:{read:ge,write:Ee},matchHost:Te,quote:xe,regex:Ie,labels:J};// Don't block on service worker registration: it's optional
+"serviceWorker"in navigator&&navigator.serviceWorker.register("./sw.js").catch(e=>console.log('SW "sw.js" failed: ',e));window.addEventListener("load",()=>_.start());export{_ as default};
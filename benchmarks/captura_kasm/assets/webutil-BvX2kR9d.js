@@ -0,0 +1 @@
+/*! KasmVNC webutil - MPL 2.0 - don't edit: generated file */const L={Debug:0,Info:1,Warn:2,Error:3};let v="warn";function j(e){v=e in L?e:"warn"}function Re(e){const t=document.location.href.match(new RegExp("[?&]"+e+"=([^&#]*)"));return t?decodeURIComponent(t[1]):null}function ke(e,t){const n=/^[\w.-]+$/.test(e)?e:e.replace(/[\\"']/g,"");document.cookie=n+"="+encodeURIComponent(t)+"; path=/; SameSite=Lax"}function Ne(e){const t=document.cookie.split(/;\s*/);for(const n of t){const[o,s]=n.split("=");if(o===e)return decodeURIComponent(s)}return null}const Y=e=>e.replace(/'/g,"&#39;").replace(/"/g,"&quot;").replace(/</g,"&lt;");function Fe(e,t){return`${e.replace(/\/+$/,"")}/${t.replace(/^\/+/,"")}`}async function qe(e){const t=await fetch("app/locale/"+e+".json");if(!t.ok)throw new Error(`Failed to load translations: ${t.status} '${e}'`);return t.json()}function Xe(){const e=new XMLHttpRequest;return e.open("GET","package.json",!1),e.send(),JSON.parse(e.responseText).version}async function He(){try{const e=await fetch("/api/settings").then(t=>t.json());return e}catch(e){return console.warn("can't read /api/settings: "+e),{}}}const Ge={icon:"app/images/icons/368_kasm_logo_only_32x32.png",bell:"app/sounds/bell.oga",splash:'app/images/splash.jpg',fonts:["app/styles/Orbitron700.woff","app/styles/Orbitron700.ttf"]};function Ze(e){const t=document.createElement("link");t.rel="stylesheet",t.href=e.endsWith(".css")?e:e+".css",document.head.appendChild(t)}/* Legacy browsers: "fetch" polyfill is loaded from 'app/vendor/promise.js' when needed */function Je(){return"fetch"in window?Promise.resolve():import("./promise-Bq1dK8x2.js")}export{L as LogLevels,j as initLogging,Re as getQueryVar,ke as setCookie,Ne as readCookie,Y as escapeHtml,Fe as joinPath,qe as loadTranslations,Xe as packageVersion,He as loadSettings,Ge as defaults,Ze as loadStyle,Je as ensureFetch};
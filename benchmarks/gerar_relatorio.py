@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Gerador determinístico de relatorio.csv sintéticos para benchmarks
+
+Escreve um arquivo no layout do relatorio.csv com o perfil de uso do NIR:
+operadores que trabalham em dias úteis e horário comercial, cada um com
+poucas rotinas habituais, e robôs que rodam as rotinas -eas a qualquer
+hora, inclusive de madrugada e nos fins de semana. As linhas saem em ordem
+cronológica, como as grava registrar_relatorio, exceto uma pequena fração
+de envios atrasados da API externa (data alguns dias anterior). Parte das
+datas vem em YYYY-MM-DD, como nas linhas antigas do arquivo, e o resto em
+DD/MM/YYYY.
+
+A mesma semente e os mesmos parâmetros geram sempre o mesmo arquivo.
+
+Uso:
+    python3 benchmarks/gerar_relatorio.py /tmp/relatorio.csv --linhas 500000
+    python3 benchmarks/gerar_relatorio.py /tmp/relatorio.csv --linhas 100000 --usuarios 60 --rotinas 30 --anos 5
+"""
+
+import argparse
+import csv
+import random
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from relatorios import CABECALHO  # noqa: E402
+
+ROTINAS_BASE = ['Solicitar Tomografias', 'Internar Pacientes', 'Altas', 'Solicitar Internações',
+                'Evoluções', 'Exames Externos', 'Pendências', 'Transferências', 'Internar Pacientes -eas',
+                'Altas -eas', 'Solicitar Tomografias -eas', 'Produção AIH']
+# Peso de cada dia da semana para os operadores (segunda a domingo)
+PESO_DIA_SEMANA = [1.0, 1.0, 1.0, 1.0, 0.9, 0.15, 0.1]
+# Fração dos usuários que são robôs (execuções automáticas, a qualquer hora)
+FRACAO_ROBOS = 0.1
+
+
+def nomes_rotinas(quantidade):
+    return [ROTINAS_BASE[i] if i < len(ROTINAS_BASE) else f'Rotina {i:02d}' for i in range(quantidade)]
+
+
+def usuarios_sinteticos(quantidade):
+    """Usuários no formato de auth.listar_usuarios() (username, nome), com a marca robo"""
+    robos = max(1, round(quantidade * FRACAO_ROBOS)) if quantidade > 1 else 0
+    usuarios = []
+    for i in range(quantidade):
+        if i < robos:
+            usuarios.append({'username': f'robo{i:02d}', 'nome': f'Robô {i:02d}', 'robo': True})
+        else:
+            usuarios.append({'username': f'operador{i:03d}', 'nome': f'Operador {i:03d}', 'robo': False})
+    return usuarios
+
+
+def descrever(usuarios=40, rotinas=25, inicio=date(2023, 1, 1), anos=3):
+    """Período, usuários e rotinas de um arquivo gerado com esses parâmetros (sem gerá-lo)"""
+    return {
+        'inicio': inicio,
+        'fim': inicio + timedelta(days=anos * 365 - 1),
+        'usuarios': [{'username': u['username'], 'nome': u['nome']} for u in usuarios_sinteticos(usuarios)],
+        'rotinas': nomes_rotinas(rotinas),
+    }
+
+
+def gerar_csv(destino, linhas, usuarios=40, rotinas=25, inicio=date(2023, 1, 1), anos=3,
+              fracao_iso=0.1, fracao_atrasadas=0.002, semente=42):
+    """
+    Grava o relatorio.csv sintético
+
+    Args:
+        linhas: número de execuções (linhas de dados)
+        inicio, anos: período coberto (anos * 365 dias a partir de inicio)
+        fracao_iso: fração das linhas com data em YYYY-MM-DD
+        fracao_atrasadas: fração das linhas gravadas com data de 1 a 10 dias antes
+
+    Returns:
+        descrever(): período gerado, usuários e rotinas
+    """
+    aleatorio = random.Random(semente)
+    nomes = nomes_rotinas(rotinas)
+    pessoas = usuarios_sinteticos(usuarios)
+    robos = [u for u in pessoas if u['robo']]
+    operadores = [u for u in pessoas if not u['robo']] or robos
+    rotinas_eas = [r for r in nomes if r.endswith('-eas')] or nomes
+    # Cada operador tem de 2 a 6 rotinas habituais, a primeira bem mais frequente
+    habituais = {u['username']: aleatorio.sample(nomes, min(len(nomes), aleatorio.randint(2, 6))) for u in operadores}
+    pesos_habituais = [1.0 / (i + 1) for i in range(6)]
+
+    dias = anos * 365
+    pesos_dias = [PESO_DIA_SEMANA[(inicio + timedelta(days=d)).weekday()] for d in range(dias)]
+    total_pesos = sum(pesos_dias)
+    # Linhas por dia proporcionais ao peso; o resto da divisão vai para os primeiros dias
+    por_dia = [int(linhas * p / total_pesos) for p in pesos_dias]
+    for d in range(linhas - sum(por_dia)):
+        por_dia[d % dias] += 1
+
+    with open(destino, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(CABECALHO)
+        for d, quantidade in enumerate(por_dia):
+            dia = inicio + timedelta(days=d)
+            execucoes = []
+            for _ in range(quantidade):
+                if robos and (aleatorio.random() < 0.2 or dia.weekday() >= 5):
+                    usuario, rotina = aleatorio.choice(robos)['username'], aleatorio.choice(rotinas_eas)
+                    segundos = aleatorio.randrange(86400)
+                    registros = aleatorio.randint(5, 120)
+                else:
+                    usuario = aleatorio.choice(operadores)['username']
+                    proprias = habituais.get(usuario, nomes)
+                    rotina = aleatorio.choices(proprias, pesos_habituais[:len(proprias)])[0]
+                    segundos = int(min(max(aleatorio.gauss(13.5 * 3600, 2.5 * 3600), 7 * 3600), 19 * 3600 - 1))
+                    registros = min(int(aleatorio.expovariate(1 / 8)), 80)
+                execucoes.append((segundos, rotina, usuario, registros))
+            execucoes.sort()
+            for segundos, rotina, usuario, registros in execucoes:
+                data_linha = dia
+                if aleatorio.random() < fracao_atrasadas:
+                    data_linha = max(inicio, dia - timedelta(days=aleatorio.randint(1, 10)))
+                texto_data = data_linha.isoformat() if aleatorio.random() < fracao_iso else data_linha.strftime('%d/%m/%Y')
+                hora = f'{segundos // 3600:02d}:{segundos // 60 % 60:02d}:{segundos % 60:02d}'
+                writer.writerow([texto_data, hora, rotina, usuario, registros])
+
+    return descrever(usuarios, rotinas, inicio, anos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('destino')
+    parser.add_argument('--linhas', type=int, default=100_000)
+    parser.add_argument('--usuarios', type=int, default=40)
+    parser.add_argument('--rotinas', type=int, default=25)
+    parser.add_argument('--inicio', type=date.fromisoformat, default=date(2023, 1, 1), help='YYYY-MM-DD')
+    parser.add_argument('--anos', type=int, default=3)
+    parser.add_argument('--fracao-iso', type=float, default=0.1, help='fração de datas em YYYY-MM-DD')
+    parser.add_argument('--fracao-atrasadas', type=float, default=0.002, help='fração de linhas com data anterior')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    gerado = gerar_csv(args.destino, args.linhas, args.usuarios, args.rotinas, args.inicio, args.anos,
+                       args.fracao_iso, args.fracao_atrasadas, args.semente)
+    print(f"✅ {args.linhas} linhas em {args.destino} ({gerado['inicio']:%d/%m/%Y} a {gerado['fim']:%d/%m/%Y}, "
+          f"{len(gerado['usuarios'])} usuários, {len(gerado['rotinas'])} rotinas)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Compressão negociada (brotli/gzip) das respostas HTTP
+
+A compressão só é aplicada a respostas com corpo em memória, acima de um
+tamanho mínimo e de tipos textuais. O custo é controlado por um orçamento de
+CPU: cada resposta tem um tempo máximo estimado de compressão (o nível é
+reduzido ou a compressão é dispensada quando a estimativa estoura) e o total
+de milissegundos gastos por segundo é limitado por um balde de créditos.
+
+O módulo brotli é opcional; sem ele apenas gzip é oferecido.
+"""
+
+import gzip
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Tamanho mínimo para valer a pena comprimir (abaixo disso o ganho não cobre o custo)
+MIN_SIZE = 1024
+
+# Tipos de conteúdo comprimíveis (comparação por prefixo/substring do mimetype)
+COMPRESSIBLE_TYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/xml',
+    'application/json', 'application/x-ndjson', 'application/xml',
+    'javascript', 'image/svg+xml', 'application/wasm',
+)
+
+# Níveis por perfil: 'rapido' quando o orçamento aperta, 'maximo' para variantes
+# que ficam em cache e são comprimidas uma única vez
+LEVELS = {
+    'br': {'rapido': 1, 'padrao': 5, 'maximo': 9},
+    'gzip': {'rapido': 1, 'padrao': 6, 'maximo': 9},
+}
+
+# Vazão inicial estimada (bytes/s) por (codificação, nível), ajustada com as medições
+_VAZAO_INICIAL = {
+    ('br', 1): 80e6, ('br', 5): 25e6, ('br', 9): 4e6,
+    ('gzip', 1): 90e6, ('gzip', 6): 30e6, ('gzip', 9): 12e6,
+}
+
+
+class Compressor:
+    """Comprime corpos de resposta respeitando um orçamento de CPU"""
+
+    def __init__(self, budget_ms=30, cpu_ms_per_second=250, min_size=MIN_SIZE):
+        self.budget_ms = budget_ms
+        self.cpu_ms_per_second = cpu_ms_per_second
+        self.min_size = min_size
+        self.encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+        self._vazao = dict(_VAZAO_INICIAL)
+        self._creditos_ms = float(cpu_ms_per_second)
+        self._ultima_recarga = time.monotonic()
+        self._lock = threading.Lock()
+
+    def negotiate(self, accept_encodings):
+        """Escolhe a melhor codificação aceita pelo cliente (Accept do werkzeug)"""
+        return accept_encodings.best_match(self.encodings)
+
+    def is_compressible(self, mimetype, size):
+        if size < self.min_size or not mimetype:
+            return False
+        mimetype = mimetype.lower()
+        if mimetype == 'text/event-stream':
+            return False
+        return any(tipo in mimetype for tipo in COMPRESSIBLE_TYPES)
+
+    def _recarregar(self):
+        agora = time.monotonic()
+        decorrido = agora - self._ultima_recarga
+        self._ultima_recarga = agora
+        self._creditos_ms = min(self.cpu_ms_per_second, self._creditos_ms + decorrido * self.cpu_ms_per_second)
+
+    def _escolher_nivel(self, encoding, size, perfil, limite_ms):
+        """Retorna o maior nível do perfil cuja estimativa cabe no limite (ou None)"""
+        for nome in (perfil, 'rapido'):
+            nivel = LEVELS[encoding][nome]
+            estimativa_ms = size / self._vazao[(encoding, nivel)] * 1000
+            if estimativa_ms <= limite_ms:
+                return nivel
+        return None
+
+    def compress(self, body, encoding, cached=False):
+        """
+        Comprime o corpo na codificação pedida
+
+        Args:
+            body: Corpo em bytes
+            encoding: 'br' ou 'gzip'
+            cached: True para variantes guardadas em cache (nível máximo e
+                orçamento maior, pois o custo é pago uma única vez)
+
+        Returns:
+            Corpo comprimido, ou None quando o orçamento de CPU não permite
+        """
+        size = len(body)
+        limite_ms = self.budget_ms * 10 if cached else self.budget_ms
+        with self._lock:
+            self._recarregar()
+            if self._creditos_ms <= 0:
+                return None
+            nivel = self._escolher_nivel(encoding, size, 'maximo' if cached else 'padrao', limite_ms)
+        if nivel is None:
+            return None
+
+        inicio = time.perf_counter()
+        if encoding == 'br':
+            comprimido = brotli.compress(body, quality=nivel)
+        else:
+            comprimido = gzip.compress(body, compresslevel=nivel, mtime=0)
+        gasto = time.perf_counter() - inicio
+
+        with self._lock:
+            self._creditos_ms -= gasto * 1000
+            if gasto > 0:
+                # Média móvel da vazão medida para este nível
+                chave = (encoding, nivel)
+                self._vazao[chave] = 0.8 * self._vazao[chave] + 0.2 * (size / gasto)
+        return comprimido
@@ -69,6 +69,45 @@ USE_DOCKER = USE_DOCKER_STR in ['true', '1', 'yes', 'on', 'enabled']
 # Use: python3 -c "import secrets; print(secrets.token_urlsafe(32))"
 SECRET_KEY = env_config.get('SECRET_KEY', None)
 
+# Proxy do robô (KasmVNC)
+# URL do robô aberta no iframe no modo query (/api/robo-proxy?url=...)
+ROBO_URL = env_config.get('ROBO_URL', 'https://cms.michelpaes.com.br').strip()
+# URL do servidor KasmVNC usada pelo modo prefixo (/robo/<caminho>)
+ROBO_UPSTREAM_URL = env_config.get('ROBO_UPSTREAM_URL', 'https://127.0.0.1:6901').strip()
+# Modo do proxy usado pelo front-end: 'query' (/api/robo-proxy?url=...) ou 'prefixo' (/robo/<caminho>)
+ROBO_PROXY_MODO = env_config.get('ROBO_PROXY_MODO', 'query').lower().strip()
+if ROBO_PROXY_MODO not in ('query', 'prefixo'):
+    print(f"Aviso: ROBO_PROXY_MODO inválido ({ROBO_PROXY_MODO}), usando 'query'")
+    ROBO_PROXY_MODO = 'query'
+# Pré-aquecer o cache do proxy na inicialização e quando o servidor do robô volta a responder
+ROBO_PREWARM_STR = env_config.get('ROBO_PREWARM', 'true').lower().strip()
+ROBO_PREWARM = ROBO_PREWARM_STR in ['true', '1', 'yes', 'on', 'enabled']
+# Processos usados para reescrever corpos grandes do proxy (0 = reescrever na própria thread)
+try:
+    ROBO_REWRITE_PROCESSOS = max(0, int(env_config.get('ROBO_REWRITE_PROCESSOS', '2')))
+except ValueError:
+    print("Aviso: ROBO_REWRITE_PROCESSOS inválido, usando 2")
+    ROBO_REWRITE_PROCESSOS = 2
+
+# Relatórios de produção: 'csv' (relatorio.csv) ou 'sqlite' (relatorio.db indexado, importa o CSV na primeira vez)
+RELATORIO_BACKEND = env_config.get('RELATORIO_BACKEND', 'csv').lower().strip()
+if RELATORIO_BACKEND not in ('csv', 'sqlite'):
+    print(f"Aviso: RELATORIO_BACKEND inválido ({RELATORIO_BACKEND}), usando 'csv'")
+    RELATORIO_BACKEND = 'csv'
+
+# Gravação em grupo dos relatórios: cada lote leva o que chegou durante a gravação anterior,
+# esperando até N ms por mais registros (0 = sem espera) e no máximo M registros
+try:
+    RELATORIO_GRUPO_MS = max(0, int(env_config.get('RELATORIO_GRUPO_MS', '0')))
+except ValueError:
+    print("Aviso: RELATORIO_GRUPO_MS inválido, usando 0")
+    RELATORIO_GRUPO_MS = 0
+try:
+    RELATORIO_GRUPO_MAX = max(1, int(env_config.get('RELATORIO_GRUPO_MAX', '1000')))
+except ValueError:
+    print("Aviso: RELATORIO_GRUPO_MAX inválido, usando 1000")
+    RELATORIO_GRUPO_MAX = 1000
+
 # Extrair nome do container do comando Docker
 # Formato esperado: /usr/bin/docker exec -it <container> bash
 DOCKER_CONTAINER = None
@@ -115,6 +154,14 @@ if __name__ == '__main__':
     print(f"DOCKER: {DOCKER}")
     print(f"USE_DOCKER: {USE_DOCKER}")
     print(f"DOCKER_CONTAINER: {DOCKER_CONTAINER if USE_DOCKER else 'Desabilitado'}")
+    print(f"ROBO_URL: {ROBO_URL}")
+    print(f"ROBO_UPSTREAM_URL: {ROBO_UPSTREAM_URL}")
+    print(f"ROBO_PROXY_MODO: {ROBO_PROXY_MODO}")
+    print(f"ROBO_REWRITE_PROCESSOS: {ROBO_REWRITE_PROCESSOS}")
+    print(f"ROBO_PREWARM: {ROBO_PREWARM}")
+    print(f"RELATORIO_BACKEND: {RELATORIO_BACKEND}")
+    print(f"RELATORIO_GRUPO_MS: {RELATORIO_GRUPO_MS}")
+    print(f"RELATORIO_GRUPO_MAX: {RELATORIO_GRUPO_MAX}")
     print("\n=== Validação de Caminhos ===\n")
     status = validate_paths()
     for var_name, info in status.items():
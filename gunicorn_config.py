@@ -10,5 +10,13 @@ accesslog = "-"
 errorlog = "-"
 loglevel = "info"
 keepalive = 5
+# sendfile() para arquivos entregues via wsgi.file_wrapper (PDFs de /api/imprimir-tcs)
+sendfile = True
 max_requests = 1000
 max_requests_jitter = 50
+
+
+def post_worker_init(worker):
+    # Threads de fundo só no worker que atende requisições (importar o app não inicia nada)
+    from app import iniciar_aquecedor_proxy
+    iniciar_aquecedor_proxy()
@@ -0,0 +1,159 @@
+"""
+Métricas em memória (histogramas de buckets fixos e contadores)
+
+Usado para instrumentar o proxy do robô: cada métrica tem um nome e rótulos
+(ex: tipo de conteúdo), e os valores ficam agregados no próprio processo.
+Os dados podem ser lidos como JSON (snapshot) ou no formato texto do
+Prometheus (prometheus_text).
+"""
+
+import bisect
+import threading
+
+# Limites (ms) dos buckets de latência; o último bucket (+Inf) é implícito
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class Histogram:
+    """Histograma de buckets fixos (contagens cumulativas apenas na exportação)"""
+
+    __slots__ = ('limites', 'contagens', 'soma', 'total')
+
+    def __init__(self, limites=BUCKETS_MS):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observe(self, valor):
+        self.contagens[bisect.bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def quantile(self, q):
+        """Estimativa do quantil pelo limite superior do bucket (None sem amostras)"""
+        if not self.total:
+            return None
+        alvo = q * self.total
+        acumulado = 0
+        for limite, contagem in zip(self.limites, self.contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return limite
+        return float('inf')
+
+    def to_dict(self):
+        return {
+            'total': self.total,
+            'soma': round(self.soma, 3),
+            'media': round(self.soma / self.total, 3) if self.total else None,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': {
+                **{str(limite): contagem for limite, contagem in zip(self.limites, self.contagens)},
+                '+Inf': self.contagens[-1],
+            },
+        }
+
+
+def _chave(rotulos):
+    return tuple(sorted(rotulos.items())) if rotulos else ()
+
+
+class MetricsRegistry:
+    """Conjunto de histogramas e contadores, seguro para uso entre threads"""
+
+    def __init__(self, prefixo='autoreg'):
+        self.prefixo = prefixo
+        self._histogramas = {}
+        self._contadores = {}
+        self._descricoes = {}
+        self._lock = threading.Lock()
+
+    def describe(self, nome, descricao):
+        self._descricoes[nome] = descricao
+
+    def observe(self, nome, valor, **rotulos):
+        """Registra uma amostra (ex: latência em ms) no histograma nome/rótulos"""
+        chave = (nome, _chave(rotulos))
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = Histogram()
+            histograma.observe(valor)
+
+    def incr(self, nome, valor=1, **rotulos):
+        chave = (nome, _chave(rotulos))
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def counter(self, nome, **rotulos):
+        with self._lock:
+            return self._contadores.get((nome, _chave(rotulos)), 0)
+
+    def reset(self):
+        with self._lock:
+            self._histogramas.clear()
+            self._contadores.clear()
+
+    def snapshot(self):
+        """Métricas agrupadas por nome: {nome: [{'rotulos': {...}, ...valores}]}"""
+        with self._lock:
+            histogramas = [(nome, dict(rotulos), h.to_dict()) for (nome, rotulos), h in self._histogramas.items()]
+            contadores = [(nome, dict(rotulos), v) for (nome, rotulos), v in self._contadores.items()]
+        resultado = {'histogramas': {}, 'contadores': {}}
+        for nome, rotulos, valores in sorted(histogramas, key=lambda item: (item[0], sorted(item[1].items()))):
+            resultado['histogramas'].setdefault(nome, []).append({'rotulos': rotulos, **valores})
+        for nome, rotulos, valor in sorted(contadores, key=lambda item: (item[0], sorted(item[1].items()))):
+            resultado['contadores'].setdefault(nome, []).append({'rotulos': rotulos, 'valor': valor})
+        return resultado
+
+    def prometheus_text(self):
+        """Exposição no formato texto do Prometheus (version 0.0.4)"""
+        with self._lock:
+            histogramas = sorted(((nome, rotulos, list(h.contagens), h.soma, h.total, h.limites)
+                                  for (nome, rotulos), h in self._histogramas.items()))
+            contadores = sorted(((nome, rotulos, v) for (nome, rotulos), v in self._contadores.items()))
+
+        linhas = []
+        declarados = set()
+
+        def cabecalho(nome, tipo, sufixo=''):
+            if nome in declarados:
+                return
+            declarados.add(nome)
+            if nome in self._descricoes:
+                linhas.append(f'# HELP {self.prefixo}_{nome}{sufixo} {self._descricoes[nome]}')
+            linhas.append(f'# TYPE {self.prefixo}_{nome}{sufixo} {tipo}')
+
+        for nome, rotulos, contagens, soma, total, limites in histogramas:
+            cabecalho(nome, 'histogram')
+            acumulado = 0
+            for limite, contagem in zip(limites + ('+Inf',), contagens):
+                acumulado += contagem
+                linhas.append(f'{self.prefixo}_{nome}_bucket{_formatar_rotulos(rotulos, le=limite)} {acumulado}')
+            linhas.append(f'{self.prefixo}_{nome}_sum{_formatar_rotulos(rotulos)} {soma:.3f}')
+            linhas.append(f'{self.prefixo}_{nome}_count{_formatar_rotulos(rotulos)} {total}')
+        for nome, rotulos, valor in contadores:
+            cabecalho(nome, 'counter', sufixo='_total')
+            linhas.append(f'{self.prefixo}_{nome}_total{_formatar_rotulos(rotulos)} {valor}')
+        return '\n'.join(linhas) + '\n'
+
+
+def _formatar_rotulos(rotulos, le=None):
+    pares = list(rotulos)
+    if le is not None:
+        pares.append(('le', le))
+    if not pares:
+        return ''
+    conteudo = ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in pares)
+    return '{' + conteudo + '}'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Registro único do processo
+registry = MetricsRegistry()
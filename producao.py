@@ -0,0 +1,611 @@
+"""
+Agregação dos relatórios de produção para o painel (gráficos)
+
+Os dados chegam em colunas (relatorios.Colunas): ordinal da data, códigos de
+rotina e usuário, registros e execuções por posição, sejam linhas brutas do
+relatório (uma execução cada) ou totais diários. O filtro vira uma máscara
+booleana e cada agrupamento (período x rotina x usuário, por exemplo) é uma
+soma com np.bincount sobre uma chave composta dos códigos.
+
+NumPy está no requirements.txt; sem ele (instalação parcial) as mesmas
+operações rodam em Python puro sobre os arrays, com o mesmo resultado.
+
+A mesma agregação atende a API genérica (agregar): qualquer combinação das
+dimensões de DIMENSOES_AGREGACAO com soma, contagem e média.
+
+O mapa de calor (dia da semana x hora) usa as linhas brutas, que trazem a
+hora, e acumula as células em vetores de 7 x 24 posições (Motor.mapa_calor).
+
+Os resultados prontos ficam em CacheConsultas (LRU por filtro normalizado),
+válidos enquanto a geração dos dados não muda.
+"""
+
+import calendar
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MESES_PT = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+DIAS_SEMANA_PT = ['Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb', 'Dom']
+
+# Mapa de calor: células dia da semana (0 = segunda) x hora do dia
+CELULAS_MAPA_CALOR = 7 * 24
+
+# Acima desse número de combinações possíveis as chaves compostas são
+# compactadas com np.unique antes do bincount (evita vetores enormes e vazios)
+LIMITE_BINCOUNT = 1 << 22
+
+# Formato esparso: gráficos com até essa fração de valores não nulos vão em
+# CSR (índice + valor por não nulo); acima disso a lista densa é menor
+DENSIDADE_MAXIMA_CSR = 0.4
+
+# Valor de cada dimensão derivada da data
+DIMENSOES_DATA = {
+    'dia': lambda d: d,
+    'dia_mes': lambda d: d.day,
+    'semana': lambda d: tuple(d.isocalendar())[:2],
+    'dia_semana': lambda d: d.weekday(),
+    'mes': lambda d: (d.year, d.month),
+    'ano': lambda d: d.year,
+}
+
+# Dimensões da agregação genérica (agregar) e como cada valor vai no JSON;
+# 'hora' precisa das linhas brutas
+DIMENSOES_AGREGACAO = {
+    'rotina': lambda v: v,
+    'usuario': lambda v: v,
+    'dia': lambda d: d.isoformat(),
+    'dia_mes': lambda v: v,
+    'semana': lambda v: f'{v[0]}-W{v[1]:02d}',
+    'dia_semana': lambda v: v,
+    'mes': lambda v: f'{v[0]}-{v[1]:02d}',
+    'ano': lambda v: v,
+    'hora': lambda v: v,
+}
+METRICAS_AGREGACAO = ('sum', 'count', 'avg')
+
+
+def _numpy(coluna):
+    return np.frombuffer(coluna, dtype=np.intc) if isinstance(coluna, array) else np.asarray(coluna, dtype=np.int64)
+
+
+def _codigos_filtro(nomes, filtro_nomes):
+    return [codigo for codigo, nome in enumerate(nomes) if nome in filtro_nomes]
+
+
+class _Dimensao:
+    """Código por posição (0..cardinalidade-1) e o valor de cada código"""
+
+    __slots__ = ('codigos', 'valores')
+
+    def __init__(self, codigos, valores):
+        self.codigos = codigos
+        self.valores = valores
+
+
+class Motor:
+    """
+    Filtro e agrupamento sobre colunas
+
+    Com NumPy as colunas são convertidas uma vez em arrays e todo o trabalho
+    é vetorizado; sem NumPy (ou com usar_numpy=False) a seleção é uma lista
+    de posições e as somas ficam em um dicionário.
+    """
+
+    def __init__(self, colunas, usar_numpy=True):
+        self.colunas = colunas
+        self.numpy = usar_numpy and np is not None
+        if self.numpy:
+            self.dias = _numpy(colunas.dias)
+            self.rotinas = _numpy(colunas.rotinas)
+            self.usuarios = _numpy(colunas.usuarios)
+            self.registros = _numpy(colunas.registros)
+            self.execucoes = _numpy(colunas.execucoes) if colunas.execucoes is not None else None
+            self.segundos = _numpy(colunas.segundos) if colunas.segundos is not None else None
+        else:
+            self.dias = colunas.dias
+            self.rotinas = colunas.rotinas
+            self.usuarios = colunas.usuarios
+            self.registros = colunas.registros
+            self.execucoes = colunas.execucoes
+            self.segundos = colunas.segundos
+
+    def selecionar(self, filtro):
+        """Posições que passam pelo filtro (máscara booleana ou lista de posições)"""
+        ini = filtro.inicio.toordinal() if filtro.inicio is not None else None
+        fim = filtro.fim.toordinal() if filtro.fim is not None else None
+        codigos_usuarios = _codigos_filtro(self.colunas.nomes_usuarios, filtro.usuarios) if filtro.usuarios is not None else None
+        codigos_rotinas = _codigos_filtro(self.colunas.nomes_rotinas, filtro.rotinas) if filtro.rotinas is not None else None
+
+        if self.numpy:
+            mascara = np.ones(len(self.dias), dtype=bool)
+            if ini is not None:
+                mascara &= self.dias >= ini
+            if fim is not None:
+                mascara &= self.dias <= fim
+            if codigos_usuarios is not None:
+                mascara &= np.isin(self.usuarios, codigos_usuarios)
+            if codigos_rotinas is not None:
+                mascara &= np.isin(self.rotinas, codigos_rotinas)
+            return np.flatnonzero(mascara)
+
+        codigos_usuarios = set(codigos_usuarios) if codigos_usuarios is not None else None
+        codigos_rotinas = set(codigos_rotinas) if codigos_rotinas is not None else None
+        dias, usuarios, rotinas = self.dias, self.usuarios, self.rotinas
+        return [i for i in range(len(dias))
+                if (ini is None or dias[i] >= ini) and (fim is None or dias[i] <= fim)
+                and (codigos_usuarios is None or usuarios[i] in codigos_usuarios)
+                and (codigos_rotinas is None or rotinas[i] in codigos_rotinas)]
+
+    def _tomar(self, coluna, selecao):
+        if self.numpy:
+            return coluna[selecao]
+        return [coluna[i] for i in selecao]
+
+    def _dimensao(self, nome, selecao, renomear_usuario=None):
+        if nome == 'rotina':
+            return _Dimensao(self._tomar(self.rotinas, selecao), list(self.colunas.nomes_rotinas))
+        if nome == 'usuario':
+            nomes = self.colunas.nomes_usuarios
+            if renomear_usuario is None:
+                return _Dimensao(self._tomar(self.usuarios, selecao), list(nomes))
+            # Usernames diferentes com o mesmo nome de exibição viram um único código
+            exibidos = sorted({renomear_usuario(n) for n in nomes})
+            indice = {n: i for i, n in enumerate(exibidos)}
+            tabela = [indice[renomear_usuario(n)] for n in nomes]
+            codigos = self._tomar(self.usuarios, selecao)
+            if self.numpy:
+                codigos = np.asarray(tabela, dtype=np.int64)[codigos] if len(tabela) else codigos
+            else:
+                codigos = [tabela[c] for c in codigos]
+            return _Dimensao(codigos, exibidos)
+        if nome == 'hora':
+            if self.segundos is None:
+                raise ValueError('Dimensão hora precisa das linhas brutas (detalhe=linha)')
+            # Horas 0-23; hora inválida vira o código 24 (valor None)
+            segundos = self._tomar(self.segundos, selecao)
+            if self.numpy:
+                codigos = np.where((segundos >= 0) & (segundos < 86400), segundos // 3600, 24)
+            else:
+                codigos = [s // 3600 if 0 <= s < 86400 else 24 for s in segundos]
+            return _Dimensao(codigos, list(range(24)) + [None])
+        if nome in DIMENSOES_DATA:
+            funcao = DIMENSOES_DATA[nome]
+            dias = self._tomar(self.dias, selecao)
+            if not len(dias):
+                return _Dimensao(dias, [])
+            menor, maior = (int(dias.min()), int(dias.max())) if self.numpy else (min(dias), max(dias))
+            # Tabela de consulta por ordinal: um valor por dia do intervalo, não por linha
+            por_dia = [funcao(date.fromordinal(o)) for o in range(menor, maior + 1)]
+            valores = sorted(set(por_dia))
+            indice = {v: i for i, v in enumerate(valores)}
+            tabela = [indice[v] for v in por_dia]
+            if self.numpy:
+                codigos = np.asarray(tabela, dtype=np.int64)[dias - menor]
+            else:
+                codigos = [tabela[d - menor] for d in dias]
+            return _Dimensao(codigos, valores)
+        raise ValueError(f'Dimensão desconhecida: {nome}')
+
+    def agrupar(self, selecao, dimensoes, renomear_usuario=None):
+        """
+        Soma registros e execuções por combinação das dimensões
+
+        Returns:
+            Lista de (valores das dimensões, soma de registros, execuções),
+            apenas combinações com pelo menos uma execução
+        """
+        dims = [self._dimensao(nome, selecao, renomear_usuario) for nome in dimensoes]
+        cardinalidades = [max(len(d.valores), 1) for d in dims]
+
+        if self.numpy:
+            chave = np.zeros(len(selecao), dtype=np.int64)
+            for d, cardinalidade in zip(dims, cardinalidades):
+                chave = chave * cardinalidade + d.codigos
+            pesos_execucoes = self.execucoes[selecao] if self.execucoes is not None else None
+            registros = self.registros[selecao]
+            combinacoes = 1
+            for cardinalidade in cardinalidades:
+                combinacoes *= cardinalidade
+            if combinacoes > LIMITE_BINCOUNT:
+                chaves_unicas, chave = np.unique(chave, return_inverse=True)
+                tamanho = len(chaves_unicas)
+            else:
+                chaves_unicas, tamanho = None, combinacoes
+            somas = np.bincount(chave, weights=registros, minlength=tamanho)
+            execucoes = np.bincount(chave, weights=pesos_execucoes, minlength=tamanho)
+            presentes = np.flatnonzero(execucoes)
+            chaves = chaves_unicas[presentes] if chaves_unicas is not None else presentes
+            indices = np.unravel_index(chaves, cardinalidades) if dims else ()
+            resultado = []
+            for posicao, k in enumerate(presentes):
+                valores = tuple(d.valores[int(indices[j][posicao])] for j, d in enumerate(dims))
+                resultado.append((valores, int(round(somas[k])), int(round(execucoes[k]))))
+            return resultado
+
+        acumulado = {}
+        registros = self.registros
+        execucoes = self.execucoes
+        codigos = [d.codigos for d in dims]
+        for posicao, i in enumerate(selecao):
+            chave = tuple(c[posicao] for c in codigos)
+            totais = acumulado.get(chave)
+            if totais is None:
+                totais = acumulado[chave] = [0, 0]
+            totais[0] += registros[i]
+            totais[1] += execucoes[i] if execucoes is not None else 1
+        return [(tuple(d.valores[c] for d, c in zip(dims, chave)), soma, quantidade)
+                for chave, (soma, quantidade) in sorted(acumulado.items()) if quantidade]
+
+
+    def mapa_calor(self, selecao, por=None, renomear_usuario=None):
+        """
+        Registros e execuções por dia da semana e hora do dia, em uma passada
+
+        Precisa das linhas brutas (segundos); linhas sem hora válida ficam de
+        fora e são contadas à parte.
+
+        Args:
+            por: None (um único mapa), 'rotina' ou 'usuario' (um mapa por valor)
+
+        Returns:
+            (valores da dimensão 'por' ([None] sem ela), registros, execuções,
+            linhas sem hora); registros e execuções são vetores de
+            len(valores) * CELULAS_MAPA_CALOR posições, célula
+            serie * 168 + dia_da_semana * 24 + hora
+        """
+        if self.segundos is None:
+            raise ValueError('Mapa de calor precisa das linhas brutas (detalhe=linha)')
+        dimensao = self._dimensao(por, selecao, renomear_usuario) if por else None
+        valores = dimensao.valores if dimensao else [None]
+        tamanho = max(len(valores), 1) * CELULAS_MAPA_CALOR
+
+        if self.numpy:
+            segundos = self.segundos[selecao]
+            validas = (segundos >= 0) & (segundos < 86400)
+            # date.fromordinal(1) é uma segunda-feira: dia da semana = (ordinal - 1) % 7
+            celula = ((self.dias[selecao] - 1) % 7) * 24 + segundos // 3600
+            if dimensao is not None:
+                celula = np.asarray(dimensao.codigos, dtype=np.int64) * CELULAS_MAPA_CALOR + celula
+            celula = celula[validas]
+            registros = np.bincount(celula, weights=self.registros[selecao][validas], minlength=tamanho)
+            pesos_execucoes = self.execucoes[selecao][validas] if self.execucoes is not None else None
+            execucoes = np.bincount(celula, weights=pesos_execucoes, minlength=tamanho)
+            return (valores, [int(round(v)) for v in registros], [int(round(v)) for v in execucoes],
+                    int(len(validas) - np.count_nonzero(validas)))
+
+        registros, execucoes = array('q', bytes(8 * tamanho)), array('q', bytes(8 * tamanho))
+        dias, segundos, somas, pesos = self.dias, self.segundos, self.registros, self.execucoes
+        codigos = dimensao.codigos if dimensao is not None else None
+        sem_hora = 0
+        for posicao, i in enumerate(selecao):
+            segundo = segundos[i]
+            if not 0 <= segundo < 86400:
+                sem_hora += 1
+                continue
+            celula = ((dias[i] - 1) % 7) * 24 + segundo // 3600
+            if codigos is not None:
+                celula += codigos[posicao] * CELULAS_MAPA_CALOR
+            registros[celula] += somas[i]
+            execucoes[celula] += pesos[i] if pesos is not None else 1
+        return valores, registros.tolist(), execucoes.tolist(), sem_hora
+
+
+def meses_no_intervalo(ani, mi, anf, mf):
+    """Lista de (ano, mes) entre dois meses, inclusive"""
+    out = []
+    a, m = ani, mi
+    while (a, m) <= (anf, mf):
+        out.append((a, m))
+        if m == 12:
+            a, m = a + 1, 1
+        else:
+            m += 1
+    return out
+
+
+def _csr(tabela, series, posicoes):
+    """
+    Séries em linhas comprimidas (CSR): os valores não nulos da série i são
+    valores[indptr[i]:indptr[i + 1]], nas posições indices[...] do eixo X
+    """
+    indptr, indices, valores = [0], [], []
+    for serie in series:
+        for posicao, valor in sorted((posicoes[chave], valor) for chave, valor in tabela[serie].items() if valor):
+            indices.append(posicao)
+            valores.append(valor)
+        indptr.append(len(indices))
+    return {'indptr': indptr, 'indices': indices, 'valores': valores}
+
+
+def dados_graficos(colunas, filtro, data_ini, data_fim, username_to_nome, usar_numpy=True, formato='denso'):
+    """
+    Monta o payload do painel de produção
+
+    Args:
+        colunas: relatorios.Colunas com ao menos as posições do filtro
+        filtro: relatorios.Filtro pedido (metadados: usuários, módulos e total)
+        data_ini, data_fim: Período efetivo dos gráficos (date)
+        username_to_nome: Mapeamento username -> nome de exibição
+        formato: 'denso' (um valor por rótulo do eixo X em cada dataset) ou
+            'esparso' (dados_modulo, dados_usuario e dados_usuario_detalhado
+            em CSR, só com os valores não nulos, quando são no máximo
+            DENSIDADE_MAXIMA_CSR do total; ver _csr)
+    """
+    motor = Motor(colunas, usar_numpy=usar_numpy)
+
+    def nome_usuario(username):
+        return username_to_nome.get(username, username)
+
+    # Usuários (nomes), módulos e número de execuções de todo o filtro
+    usuarios_unicos, modulos_unicos, total = set(), set(), 0
+    for (rotina, usuario), _, execucoes in motor.agrupar(motor.selecionar(filtro), ('rotina', 'usuario')):
+        total += execucoes
+        if usuario:
+            usuarios_unicos.add(nome_usuario(usuario))
+        if rotina:
+            modulos_unicos.add(rotina)
+
+    ano_ini, mes_ini = data_ini.year, data_ini.month
+    ano_fim, mes_fim = data_fim.year, data_fim.month
+
+    # Período cobre um único mês ou múltiplos meses?
+    um_mes_only = (ano_ini == ano_fim and mes_ini == mes_fim)
+
+    producao_modulo = {}
+    producao_usuario = {}
+    producao_modulo_usuario = {}  # (rotina, usuario_nome) -> dia ou (ano,mes) -> total
+    producao_periodo = {}
+
+    # Um único mês: agrupar por dia; múltiplos meses: agrupar por (ano, mes)
+    dimensao_periodo = 'dia_mes' if um_mes_only else 'mes'
+    selecao_periodo = motor.selecionar(filtro.restringir(data_ini, data_fim))
+    for (chave, rotina, usuario_nome), registros, _ in motor.agrupar(
+            selecao_periodo, (dimensao_periodo, 'rotina', 'usuario'), renomear_usuario=nome_usuario):
+        modulo = producao_modulo.setdefault(rotina, {})
+        modulo[chave] = modulo.get(chave, 0) + registros
+        usuario = producao_usuario.setdefault(usuario_nome, {})
+        usuario[chave] = usuario.get(chave, 0) + registros
+        modulo_usuario = producao_modulo_usuario.setdefault((rotina, usuario_nome), {})
+        modulo_usuario[chave] = modulo_usuario.get(chave, 0) + registros
+
+    for ((ano, mes),), registros, _ in motor.agrupar(selecao_periodo, ('mes',)):
+        producao_periodo[f"{ano}-{mes:02d}"] = {'ano': ano, 'mes': mes, 'registros': registros}
+
+    if um_mes_only:
+        ultimo_dia_mes = calendar.monthrange(ano_ini, mes_ini)[1]
+        labels_modulo = list(range(1, ultimo_dia_mes + 1))
+        labels_usuario = list(range(1, ultimo_dia_mes + 1))
+        chaves_ordenadas = labels_modulo
+        tipo_eixo = 'dia'
+    else:
+        chaves_ordenadas = meses_no_intervalo(ano_ini, mes_ini, ano_fim, mes_fim)
+        labels_modulo = [f"{MESES_PT[m - 1]}/{a}" for a, m in chaves_ordenadas]
+        labels_usuario = [f"{MESES_PT[m - 1]}/{a}" for a, m in chaves_ordenadas]
+        tipo_eixo = 'mes'
+
+    # Formato esparso: cada gráfico vai em CSR quando a maior parte dos valores é zero
+    esparso = formato == 'esparso'
+    posicoes = {chave: i for i, chave in enumerate(chaves_ordenadas)}
+
+    def grafico(tabela, labels, rotulo, series_esparsas=None):
+        series = sorted(tabela)
+        if esparso and series:
+            csr = _csr(tabela, series, posicoes)
+            if len(csr['indices']) <= DENSIDADE_MAXIMA_CSR * len(series) * len(chaves_ordenadas):
+                identificacao = series_esparsas(series) if series_esparsas else {'series': series}
+                return {'labels': labels, 'tipo_eixo': tipo_eixo, **identificacao, **csr}
+        datasets = [{'label': rotulo(serie), 'data': [tabela[serie].get(chave, 0) for chave in chaves_ordenadas]}
+                    for serie in series]
+        return {'labels': labels, 'datasets': datasets, 'tipo_eixo': tipo_eixo}
+
+    # Dados por módulo
+    dados_modulo = grafico(producao_modulo, labels_modulo, lambda rotina: rotina)
+
+    # Dados por usuário
+    dados_usuario = grafico(producao_usuario, labels_usuario, lambda nome_usr: nome_usr)
+
+    # Dados por período: eixo X = meses no intervalo (ex: fev/2026, mar/2026)
+    if um_mes_only:
+        lista_meses_periodo = [(ano_ini, mes_ini)]
+    else:
+        lista_meses_periodo = meses_no_intervalo(ano_ini, mes_ini, ano_fim, mes_fim)
+    labels_periodo = [f"{MESES_PT[m - 1]}/{a}" for a, m in lista_meses_periodo]
+    dados_periodo = {'labels': labels_periodo, 'datasets': []}
+    # Um dataset "Total" com totais por mês no intervalo
+    totais_por_mes = [producao_periodo.get(f"{a}-{m:02d}", {}).get('registros', 0) for a, m in lista_meses_periodo]
+    dados_periodo['datasets'].append({'label': 'Total', 'data': totais_por_mes})
+
+    # Resumo por módulo: total no período por módulo (dia x módulo, sem usuário)
+    dados_modulo_resumo = {'labels': [], 'data': []}
+    for rotina in sorted(producao_modulo.keys()):
+        dados_modulo_resumo['labels'].append(rotina)
+        dados_modulo_resumo['data'].append(sum(producao_modulo[rotina].values()))
+
+    # Detalhada por usuário: módulo x usuário, eixo X = dias (ou meses)
+    def pares_esparsos(series):
+        # Cada série é um par [índice em rotinas, índice em usuarios] no lugar do rótulo "rotina — usuário"
+        rotinas, usuarios = sorted(producao_modulo), sorted(producao_usuario)
+        indice_rotina = {rotina: i for i, rotina in enumerate(rotinas)}
+        indice_usuario = {nome_usr: i for i, nome_usr in enumerate(usuarios)}
+        return {'rotinas': rotinas, 'usuarios': usuarios,
+                'series': [[indice_rotina[rotina], indice_usuario[nome_usr]] for rotina, nome_usr in series]}
+
+    dados_usuario_detalhado = grafico(producao_modulo_usuario, labels_modulo,
+                                      lambda serie: f"{serie[0]} — {serie[1]}", pares_esparsos)
+
+    return {
+        'dados_modulo_resumo': dados_modulo_resumo,
+        'dados_modulo': dados_modulo,
+        'dados_usuario': dados_usuario,
+        'dados_usuario_detalhado': dados_usuario_detalhado,
+        'dados_periodo': dados_periodo,
+        'usuarios_disponiveis': sorted(usuarios_unicos),
+        'modulos_disponiveis': sorted(modulos_unicos),
+        'total_registros': total,
+        **({'formato': 'esparso'} if esparso else {}),
+    }
+
+
+def dados_mapa_calor(colunas, filtro, username_to_nome, por=None, usar_numpy=True):
+    """
+    Monta o payload do mapa de calor (dia da semana x hora) da produção
+
+    Args:
+        colunas: relatorios.Colunas das linhas brutas (detalhe='linha')
+        filtro: relatorios.Filtro já limitado ao período efetivo
+        por: None, 'rotina' ou 'usuario' (um mapa por rotina ou por usuário,
+            além do total)
+
+    Cada mapa traz registros e execuções em 7 linhas (segunda a domingo)
+    de 24 horas.
+    """
+    motor = Motor(colunas, usar_numpy=usar_numpy)
+
+    def nome_usuario(username):
+        return username_to_nome.get(username, username)
+
+    valores, registros, execucoes, sem_hora = motor.mapa_calor(motor.selecionar(filtro), por, nome_usuario)
+
+    def matriz(vetor, inicio):
+        return [vetor[inicio + d * 24:inicio + (d + 1) * 24] for d in range(7)]
+
+    total_registros, total_execucoes = [0] * CELULAS_MAPA_CALOR, [0] * CELULAS_MAPA_CALOR
+    series = []
+    for s, valor in enumerate(valores):
+        inicio = s * CELULAS_MAPA_CALOR
+        for c in range(CELULAS_MAPA_CALOR):
+            total_registros[c] += registros[inicio + c]
+            total_execucoes[c] += execucoes[inicio + c]
+        if por and any(execucoes[inicio:inicio + CELULAS_MAPA_CALOR]):
+            series.append({'label': valor, 'registros': matriz(registros, inicio), 'execucoes': matriz(execucoes, inicio)})
+
+    return {
+        'dias_semana': DIAS_SEMANA_PT,
+        'horas': list(range(24)),
+        'total': {'registros': matriz(total_registros, 0), 'execucoes': matriz(total_execucoes, 0)},
+        **({'por': por, 'series': series} if por else {}),
+        'total_registros': sum(total_registros),
+        'total_execucoes': sum(total_execucoes),
+        'sem_hora': sem_hora,
+    }
+
+
+def agregar(colunas, filtro, dimensoes, metricas, username_to_nome, usar_numpy=True):
+    """
+    Agregação genérica: métricas por combinação das dimensões pedidas
+
+    Usa o mesmo Motor.agrupar dos gráficos do painel (dados_graficos).
+
+    Args:
+        colunas: relatorios.Colunas (linhas brutas se 'hora' estiver nas dimensões)
+        filtro: relatorios.Filtro já limitado ao período efetivo
+        dimensoes: nomes de DIMENSOES_AGREGACAO (vazio = só o total)
+        metricas: nomes de METRICAS_AGREGACAO: sum (soma dos registros),
+            count (execuções) e avg (registros por execução)
+
+    Returns:
+        {'linhas': [{dimensão: valor, ..., métrica: valor, ...}], 'total': {métrica: valor}},
+        linhas em ordem dos valores das dimensões
+    """
+    motor = Motor(colunas, usar_numpy=usar_numpy)
+
+    def nome_usuario(username):
+        return username_to_nome.get(username, username)
+
+    def valores_metricas(soma, quantidade):
+        calculadas = {'sum': soma, 'count': quantidade, 'avg': round(soma / quantidade, 4) if quantidade else None}
+        return {nome: calculadas[nome] for nome in metricas}
+
+    grupos = motor.agrupar(motor.selecionar(filtro), dimensoes, renomear_usuario=nome_usuario)
+    grupos.sort(key=lambda grupo: tuple((v is None, v) for v in grupo[0]))
+    linhas = []
+    for valores, soma, quantidade in grupos:
+        linha = {nome: DIMENSOES_AGREGACAO[nome](v) if v is not None else None for nome, v in zip(dimensoes, valores)}
+        linha.update(valores_metricas(soma, quantidade))
+        linhas.append(linha)
+    return {
+        'linhas': linhas,
+        'total': valores_metricas(sum(g[1] for g in grupos), sum(g[2] for g in grupos)),
+    }
+
+
+class CacheConsultas:
+    """
+    Cache LRU de resultados do painel de produção
+
+    Cada entrada vale para a geração dos dados em que foi calculada: um
+    contador incrementado a cada gravação do próprio processo (invalidar())
+    mais a versão informada pelo store (tamanho/mtime dos arquivos), que
+    muda também com gravações de outros processos. invalidar() descarta as
+    entradas na hora; as que ficam desatualizadas por gravações de outros
+    processos nunca mais são encontradas e saem pelo LRU. Cada consulta é
+    recalculada só quando volta a ser pedida.
+    """
+
+    def __init__(self, versao=None, max_entradas=128):
+        """
+        Args:
+            versao: Função () -> valor comparável que muda quando os dados
+                gravados mudam (ex: store.versao)
+            max_entradas: Número máximo de resultados guardados
+        """
+        self.versao = versao
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._geracao = 0
+        self._acertos = 0
+        self._falhas = 0
+        self._lock = threading.Lock()
+
+    def invalidar(self):
+        """Nova geração: os resultados guardados deixam de valer"""
+        with self._lock:
+            self._geracao += 1
+            self._entradas.clear()
+
+    def geracao(self):
+        """Geração atual dos dados (lida antes de calcular um resultado)"""
+        return self._geracao, self.versao() if self.versao else None
+
+    def obter(self, chave, calcular):
+        """
+        Resultado da chave na geração atual, calculado na falta
+
+        Returns:
+            Tupla (valor, acerto)
+        """
+        chave = (self.geracao(), chave)
+        with self._lock:
+            valor = self._entradas.get(chave)
+            if valor is not None:
+                self._entradas.move_to_end(chave)
+                self._acertos += 1
+                return valor, True
+            self._falhas += 1
+        valor = calcular()
+        with self._lock:
+            # Uma gravação durante o cálculo já limpou o cache: não guarda o resultado antigo
+            if chave[0][0] == self._geracao:
+                self._entradas[chave] = valor
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+        return valor, False
+
+    def stats(self):
+        with self._lock:
+            consultas = self._acertos + self._falhas
+            return {
+                'entradas': len(self._entradas),
+                'max_entradas': self.max_entradas,
+                'geracao': self._geracao,
+                'acertos': self._acertos,
+                'falhas': self._falhas,
+                'taxa_acerto': round(self._acertos / consultas, 4) if consultas else None,
+            }
@@ -0,0 +1,150 @@
+"""
+Cache de respostas do proxy do robô (KasmVNC)
+
+Guarda o corpo já reescrito de cada recurso junto com um ETag calculado
+sobre esse corpo. O ETag do servidor original não serve para o navegador,
+pois o conteúdo entregue é diferente do original após a reescrita.
+Os validadores do servidor original são mantidos apenas para revalidar a
+entrada com ele (If-None-Match / If-Modified-Since).
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+# Recursos com hash de conteúdo no nome (ex: index-B1x9Qk2d.js, webutil-Dix4qgyj.css)
+# nunca mudam para a mesma URL e podem ser guardados pelo navegador por um ano
+_FINGERPRINT_PATTERN = re.compile(
+    r'[-_.](?:[0-9a-f]{8,}|(?=[A-Za-z0-9_]*[0-9])[A-Za-z0-9_]{8,})'
+    r'\.(?:js|mjs|css|png|jpe?g|gif|svg|webp|ico|woff2?|ttf|eot|wasm|mp3|oga|mp4|webm)$'
+)
+
+CACHE_CONTROL_IMUTAVEL = 'private, max-age=31536000, immutable'
+CACHE_CONTROL_REVALIDAR = 'private, no-cache'
+
+# Headers de cache do servidor original que não valem para o corpo reescrito
+HEADERS_CACHE_ORIGINAL = ('etag', 'last-modified', 'cache-control', 'expires', 'age', 'pragma')
+
+
+def is_fingerprinted(url):
+    """Verifica se o caminho da URL contém um hash de conteúdo"""
+    return bool(_FINGERPRINT_PATTERN.search(urlparse(url).path))
+
+
+def compute_etag(body):
+    """Calcula um ETag forte e estável para o corpo entregue ao navegador"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+class CachedResponse:
+    """Resposta reescrita guardada no cache"""
+
+    __slots__ = ('body', 'status', 'headers', 'etag', 'upstream_etag',
+                 'upstream_last_modified', 'immutable', 'stored_at', 'variants')
+
+    def __init__(self, body, status, headers, upstream_etag=None, upstream_last_modified=None, immutable=False):
+        self.body = body
+        self.status = status
+        # Lista de (nome, valor) já filtrada, sem os headers de cache do original
+        self.headers = headers
+        self.etag = compute_etag(body)
+        self.upstream_etag = upstream_etag
+        self.upstream_last_modified = upstream_last_modified
+        self.immutable = immutable
+        self.stored_at = time.time()
+        # Corpos já comprimidos por codificação ('gzip', 'br')
+        self.variants = {}
+
+    @property
+    def size(self):
+        return len(self.body) + sum(len(v) for v in self.variants.values())
+
+    @property
+    def content_type(self):
+        for nome, valor in self.headers:
+            if nome.lower() == 'content-type':
+                return valor
+        return ''
+
+    @property
+    def cache_control(self):
+        return CACHE_CONTROL_IMUTAVEL if self.immutable else CACHE_CONTROL_REVALIDAR
+
+    def revalidation_headers(self):
+        """Headers condicionais para revalidar a entrada com o servidor original"""
+        headers = {}
+        if self.upstream_etag:
+            headers['If-None-Match'] = self.upstream_etag
+        if self.upstream_last_modified:
+            headers['If-Modified-Since'] = self.upstream_last_modified
+        return headers
+
+
+class ProxyCache:
+    """Cache LRU limitado pelo total de bytes guardados"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entry_bytes=8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        """Guarda a entrada (se couber) e retorna a própria entrada"""
+        if entry.size > self.max_entry_bytes:
+            return entry
+        with self._lock:
+            antiga = self._entries.pop(key, None)
+            if antiga is not None:
+                self._total_bytes -= antiga.size
+            self._entries[key] = entry
+            self._total_bytes += entry.size
+            while self._total_bytes > self.max_bytes and self._entries:
+                _, removida = self._entries.popitem(last=False)
+                self._total_bytes -= removida.size
+        return entry
+
+    def add_variant(self, key, entry, encoding, body):
+        """Guarda a versão comprimida de uma entrada, contabilizando seus bytes"""
+        with self._lock:
+            if encoding in entry.variants:
+                return
+            entry.variants[encoding] = body
+            if self._entries.get(key) is entry:
+                self._total_bytes += len(body)
+
+    def discard(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._total_bytes -= entry.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entradas': len(self._entries), 'bytes': self._total_bytes, 'limite_bytes': self.max_bytes}
+
+
+def is_cacheable(response):
+    """Verifica se a resposta do servidor original pode ir para o cache"""
+    if response.status_code != 200:
+        return False
+    if 'set-cookie' in response.headers:
+        return False
+    cache_control = response.headers.get('cache-control', '').lower()
+    return 'no-store' not in cache_control and 'private' not in cache_control
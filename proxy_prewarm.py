@@ -0,0 +1,116 @@
+"""
+Pré-aquecimento do cache do proxy do robô (KasmVNC)
+
+Quem abre "Visualizar Robô" logo depois que o container sobe paga a carga
+fria inteira: busca de cada recurso no Kasm mais a reescrita de todos eles.
+O aquecedor percorre a página de entrada, descobre os recursos referenciados
+(com os mesmos padrões da reescrita, ver proxy_rewrite.discover_urls) e os
+pede ao próprio proxy, deixando o cache pronto.
+
+Roda em uma thread de fundo que sonda o servidor do robô periodicamente e
+aquece o cache na inicialização e sempre que o servidor volta a responder
+(ou a página de entrada muda, indicando que o container foi recriado).
+"""
+
+import threading
+import time
+from collections import deque
+from urllib.parse import urljoin, urldefrag
+
+from proxy_rewrite import discover_urls
+
+
+class ProxyWarmer:
+    """Percorre as URLs do proxy a partir da entrada e popula o cache"""
+
+    def __init__(self, buscar, sondar, entradas, prefixos, intervalo=30, max_urls=500):
+        """
+        Args:
+            buscar: Função (url local) -> (status, content_type, texto ou None)
+                que executa o proxy para a URL e retorna o corpo entregue
+            sondar: Função () -> (saudavel, assinatura) que verifica o servidor
+                do robô; a assinatura (ETag/Last-Modified da entrada) identifica
+                a versão servida
+            entradas: Função () -> lista de URLs locais de entrada
+            prefixos: Prefixos das URLs locais que passam pelo proxy
+            intervalo: Segundos entre as sondagens
+            max_urls: Limite de URLs por aquecimento
+        """
+        self.buscar = buscar
+        self.sondar = sondar
+        self.entradas = entradas
+        self.prefixos = tuple(prefixos)
+        self.intervalo = intervalo
+        self.max_urls = max_urls
+        self._parar = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._ultimo = {}
+
+    def aquecer(self):
+        """Aquece o cache a partir das URLs de entrada (busca em largura)"""
+        if not self._lock.acquire(blocking=False):
+            return None  # Já existe um aquecimento em andamento
+        try:
+            inicio = time.perf_counter()
+            fila = deque(self.entradas())
+            vistos = set(fila)
+            buscadas = erros = 0
+            while fila and buscadas < self.max_urls and not self._parar.is_set():
+                url = fila.popleft()
+                try:
+                    status, content_type, texto = self.buscar(url)
+                except Exception as e:
+                    print(f"[prewarm] Erro ao buscar {url}: {e}")
+                    erros += 1
+                    continue
+                buscadas += 1
+                if status >= 400:
+                    erros += 1
+                if not texto:
+                    continue
+                for referencia in discover_urls(texto, content_type):
+                    destino = urldefrag(urljoin(url, referencia))[0]
+                    if destino.startswith(self.prefixos) and 'websockify' not in destino and destino not in vistos:
+                        vistos.add(destino)
+                        fila.append(destino)
+            self._ultimo = {
+                'quando': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'urls': buscadas,
+                'erros': erros,
+                'pendentes': len(fila),
+                'segundos': round(time.perf_counter() - inicio, 3),
+            }
+            print(f"[prewarm] Cache do proxy aquecido: {buscadas} URLs em {self._ultimo['segundos']}s ({erros} erros)")
+            return dict(self._ultimo)
+        finally:
+            self._lock.release()
+
+    def _executar(self):
+        saudavel_antes, assinatura_antes = False, None
+        while True:
+            try:
+                saudavel, assinatura = self.sondar()
+            except Exception:
+                saudavel, assinatura = False, None
+            # Inicialização, servidor voltando a responder ou entrada diferente (container recriado)
+            if saudavel and (not saudavel_antes or assinatura != assinatura_antes):
+                try:
+                    self.aquecer()
+                except Exception as e:
+                    print(f"[prewarm] Erro no aquecimento: {e}")
+            saudavel_antes, assinatura_antes = saudavel, assinatura
+            if self._parar.wait(self.intervalo):
+                return
+
+    def iniciar(self):
+        """Inicia a thread de sondagem/aquecimento (uma única vez)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._executar, name='proxy-prewarm', daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+
+    def stats(self):
+        return {'ativo': self._thread is not None and self._thread.is_alive(), 'ultimo': dict(self._ultimo)}
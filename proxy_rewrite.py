@@ -0,0 +1,592 @@
+"""
+Motor de reescrita de URLs para o proxy do robô (KasmVNC)
+
+Cada tipo de conteúdo (HTML, JavaScript, CSS) tem um único padrão compilado
+que combina todas as regras de reescrita. O corpo é percorrido uma única vez
+e cada ocorrência é despachada pelo nome do grupo que casou, escrevendo o
+resultado em um único buffer de saída.
+
+HTML e CSS também podem ser reescritos em streaming (rewrite_body_stream):
+o corpo é processado bloco a bloco com uma janela fixa no fim do buffer, de
+forma que a memória usada não depende do tamanho do recurso.
+"""
+
+import codecs
+import re
+import time
+from functools import lru_cache
+from urllib.parse import urlparse, quote as url_quote
+
+PROXY_PREFIX = '/api/robo-proxy'
+WS_PROXY_PREFIX = '/api/robo-ws'
+
+# Extensões de recursos estáticos reconhecidas em strings JavaScript
+_EXTENSOES_RECURSOS = r'(?:\.js|\.css|\.png|\.jpg|\.jpeg|\.gif|\.svg|\.woff|\.woff2|\.ttf|\.eot|\.ico|\.mp3|\.oga|\.mp4|\.webm)'
+
+# Prefixos que nunca são reescritos
+_IGNORAR_HTML_ATRIBUTO = ('http://', 'https://', '//', 'data:', 'javascript:', 'mailto:', 'tel:', '#', PROXY_PREFIX)
+_IGNORAR_HTML_CSS = ('http://', 'https://', '//', 'data:', '#', PROXY_PREFIX)
+_IGNORAR_JS_IMPORT = ('http://', 'https://', '//', PROXY_PREFIX, 'data:', 'blob:')
+_IGNORAR_JS_FETCH = ('http://', 'https://', '//', 'data:', 'blob:', PROXY_PREFIX)
+_IGNORAR_JS_STRING = ('http://', 'https://', '//', 'data:', 'blob:', 'javascript:', 'mailto:', 'tel:', '#', PROXY_PREFIX, WS_PROXY_PREFIX)
+_IGNORAR_CSS = ('http://', 'https://', '//', 'data:', PROXY_PREFIX)
+
+# Cada padrão começa com um lookahead com os primeiros caracteres possíveis das
+# alternativas, o que evita tentar todas elas em cada posição do corpo
+_HTML_PATTERN = re.compile(
+    r'(?=[<hHsSaAfFdDbBcClLuUmMpP])'
+    r'(?:(?P<base>(?i:<base[^>]*>))'
+    r'|(?P<attr>(?i:\b(?P<attr_nome>href|src|action|formaction|data|background|cite|codebase|longdesc|usemap|profile|manifest)'
+    r'\s*=\s*(?P<attr_q>["\'])(?P<attr_url>[^"\']+)(?P=attr_q)))'
+    r'|(?P<css_url>(?i:url\s*\(\s*(?P<css_q>["\']?)(?P<css_val>[^"\'()]+)(?P=css_q)\s*\))))'
+)
+
+_JS_PATTERN = re.compile(
+    r'(?=[iInNfF."\'])'
+    r'(?:(?P<import>import\s*\(\s*["\'](?P<import_url>[^"\']+)["\']\s*\))'
+    r'|(?P<ws>(?i:new\s+WebSocket\s*\(\s*["\'](?P<ws_url>[^"\']+)["\']\s*\)))'
+    r'|(?P<fetch>(?i:fetch\s*\(\s*["\'](?P<fetch_url>[^"\']+)["\']))'
+    r'|(?P<xhr>(?i:\.open\s*\(\s*(?P<xhr_metodo>["\']?\w+["\']?)\s*,\s*["\'](?P<xhr_url>[^"\']+)["\']))'
+    r'|(?P<meta>import\.meta\.url)'
+    r'|(?P<recurso>(?P<recurso_q>["\'])(?P<recurso_url>(?:\./|\.\./|/)?[^"\']*' + _EXTENSOES_RECURSOS + r'[^"\']*)(?P=recurso_q)))'
+)
+
+_CSS_PATTERN = re.compile(
+    r'(?=[uU@])'
+    r'(?:(?P<url>(?i:url\s*\(\s*(?P<url_q>["\']?)(?P<url_val>[^"\'()]+?)(?P=url_q)\s*\)))'
+    r'|(?P<import>(?i:@import\s+["\'](?P<import_url>[^"\']+)["\'])))'
+)
+
+
+@lru_cache(maxsize=4096)
+def proxy_url(original_url):
+    """Monta a URL do proxy HTTP para uma URL do servidor original"""
+    return f'{PROXY_PREFIX}?url={url_quote(original_url, safe="")}'
+
+
+def _resolver_relativo(url, base_url, base_path):
+    """Resolve URL relativa ao diretório do documento (usado no HTML)"""
+    if url.startswith('/'):
+        return base_url.rstrip('/') + url
+    if url.startswith('./'):
+        return base_url.rstrip('/') + base_path.rstrip('/') + '/' + url[2:]
+    return base_url.rstrip('/') + base_path.rstrip('/') + '/' + url
+
+
+def _resolver_raiz(url, base_url):
+    """
+    Resolve URL sempre a partir da raiz do servidor original (usado em JS e CSS)
+
+    O navegador resolveria URLs relativas a partir do próprio arquivo
+    (/api/robo-proxy?url=.../main.bundle.js/assets/x.js), por isso
+    todas são convertidas para URLs absolutas na raiz.
+    """
+    if url.startswith('/'):
+        return base_url.rstrip('/') + url
+    if url.startswith('./'):
+        return base_url.rstrip('/') + '/' + url[2:]
+    if url.startswith('../'):
+        return base_url.rstrip('/') + '/' + url.lstrip('../').lstrip('/')
+    return base_url.rstrip('/') + '/' + url
+
+
+def _reescrever(pattern, texto, despachar):
+    """Percorre o texto uma única vez e monta a saída em um único buffer"""
+    partes = []
+    append = partes.append
+    pos = 0
+    for match in pattern.finditer(texto):
+        inicio = match.start()
+        if inicio > pos:
+            append(texto[pos:inicio])
+        append(despachar(match))
+        pos = match.end()
+    if pos == 0:
+        return texto
+    append(texto[pos:])
+    return ''.join(partes)
+
+
+# Tamanho máximo de uma ocorrência (atributo, url(...), @import) no modo streaming.
+# Ocorrências que começam antes dos últimos JANELA_STREAM caracteres do buffer
+# já têm todo o texto de que dependem e podem ser emitidas; tokens maiores que
+# a janela passam sem reescrita.
+JANELA_STREAM = 16 * 1024
+
+
+def _emitir_disponivel(pattern, buffer, pos, limite, despachar, final):
+    """
+    Reescreve o buffer a partir de pos até onde a saída já é definitiva
+
+    Returns:
+        (texto reescrito, nova posição em buffer)
+    """
+    partes = []
+    append = partes.append
+    fim = len(buffer) if final else limite
+    for match in pattern.finditer(buffer, pos):
+        inicio = match.start()
+        if not final and (inicio >= limite or match.end() == len(buffer)):
+            # A ocorrência pode continuar no próximo bloco
+            fim = min(fim, inicio)
+            break
+        if inicio > pos:
+            append(buffer[pos:inicio])
+        append(despachar(match))
+        pos = match.end()
+    fim = max(fim, pos)
+    if fim > pos:
+        append(buffer[pos:fim])
+    return ''.join(partes), fim
+
+
+def _reescrever_stream(pattern, partes, despachar, janela=JANELA_STREAM):
+    """Versão em streaming de _reescrever: recebe e gera pedaços de texto"""
+    buffer = ''
+    pos = 0
+    for parte in partes:
+        if not parte:
+            continue
+        buffer += parte
+        limite = len(buffer) - janela
+        if limite <= pos:
+            continue
+        saida, pos = _emitir_disponivel(pattern, buffer, pos, limite, despachar, final=False)
+        if saida:
+            yield saida
+        # Manter um caractere já emitido para o \b no início dos padrões
+        corte = max(pos - 1, 0)
+        buffer = buffer[corte:]
+        pos -= corte
+    saida, _ = _emitir_disponivel(pattern, buffer, pos, len(buffer), despachar, final=True)
+    if saida:
+        yield saida
+
+
+def rewrite_html(html_content, base_url, base_path='/'):
+    """
+    Reescreve URLs de um documento HTML para passarem pelo proxy
+
+    Remove tags <base>, reescreve atributos que carregam recursos
+    (href, src, action...) e url(...) de estilos inline.
+    """
+    return _reescrever(_HTML_PATTERN, html_content, _despachante_html(base_url, base_path))
+
+
+def _despachante_html(base_url, base_path):
+    def despachar(match):
+        tipo = match.lastgroup
+        if tipo == 'base':
+            return ''
+        if tipo == 'attr':
+            url = match.group('attr_url').strip()
+            if url.startswith(_IGNORAR_HTML_ATRIBUTO):
+                return match.group(0)
+            quote = match.group('attr_q')
+            new_url = proxy_url(_resolver_relativo(url, base_url, base_path))
+            return f'{match.group("attr_nome")}={quote}{new_url}{quote}'
+        url = match.group('css_val').strip()
+        if url.startswith(_IGNORAR_HTML_CSS):
+            return match.group(0)
+        quote = match.group('css_q')
+        new_url = proxy_url(_resolver_relativo(url, base_url, base_path))
+        return f'url({quote}{new_url}{quote})'
+
+    return despachar
+
+
+def _rewrite_websocket(ws_url, base_url):
+    """Converte o destino de new WebSocket(...) para o proxy WebSocket"""
+    if ws_url.startswith(('ws://', 'wss://')):
+        ws_url_clean = ws_url.replace('ws://', '').replace('wss://', '')
+        if '://' in ws_url_clean:
+            parsed = urlparse(ws_url_clean)
+            original_url = f'https://{parsed.netloc}{parsed.path or "/"}'
+        else:
+            original_url = base_url.rstrip('/') + (ws_url_clean if ws_url_clean.startswith('/') else '/' + ws_url_clean)
+    else:
+        original_url = base_url.rstrip('/') + (ws_url if ws_url.startswith('/') else '/' + ws_url)
+    return f'new WebSocket("{WS_PROXY_PREFIX}?url={url_quote(original_url, safe="")}")'
+
+
+def rewrite_js(js_content, base_url, base_href):
+    """
+    Reescreve URLs de um arquivo JavaScript para passarem pelo proxy
+
+    Trata import() dinâmico, new WebSocket(), fetch(), XMLHttpRequest.open(),
+    import.meta.url e strings que apontam para recursos estáticos. Como na
+    implementação anterior, cada regra casa diretamente o seu texto, sem
+    interpretar a sintaxe do JavaScript: aspas em expressões regulares,
+    template literals ou comentários não desalinham as ocorrências seguintes.
+
+    O proxy não aplica esta reescrita: JavaScript passa sem alteração (ver
+    rewrite_body). O padrão também é usado por discover_urls.
+    """
+    def despachar(match):
+        tipo = match.lastgroup
+        if tipo == 'recurso':
+            url = match.group('recurso_url')
+            quote = match.group('recurso_q')
+            if url.startswith(_IGNORAR_JS_STRING):
+                if url.startswith('http://'):
+                    url = url.replace('http://', 'https://', 1)
+                return f'{quote}{url}{quote}'
+            return f'{quote}{proxy_url(_resolver_raiz(url, base_url))}{quote}'
+        if tipo == 'import':
+            import_path = match.group('import_url').strip().strip('"\'')
+            if import_path.startswith(_IGNORAR_JS_IMPORT):
+                return match.group(0)
+            return f'import("{proxy_url(_resolver_raiz(import_path, base_url))}")'
+        if tipo == 'ws':
+            ws_url = match.group('ws_url').strip().strip('"\'')
+            if ws_url.startswith(WS_PROXY_PREFIX):
+                return match.group(0)
+            return _rewrite_websocket(ws_url, base_url)
+        if tipo == 'fetch':
+            fetch_url = match.group('fetch_url').strip().strip('"\'')
+            if fetch_url.startswith(_IGNORAR_JS_FETCH):
+                if fetch_url.startswith('http://'):
+                    fetch_url = fetch_url.replace('http://', 'https://', 1)
+                return match.group(0).replace(match.group('fetch_url'), fetch_url)
+            new_url = proxy_url(_resolver_raiz(fetch_url, base_url))
+            return match.group(0).replace(match.group('fetch_url'), new_url)
+        if tipo == 'xhr':
+            method = match.group('xhr_metodo')
+            xhr_url = match.group('xhr_url').strip().strip('"\'')
+            if xhr_url.startswith(_IGNORAR_JS_FETCH):
+                if xhr_url.startswith('http://'):
+                    xhr_url = xhr_url.replace('http://', 'https://', 1)
+                return f'.open({method}, "{xhr_url}"'
+            return f'.open({method}, "{proxy_url(_resolver_raiz(xhr_url, base_url))}"'
+        # import.meta.url: caminho sem host vira expressão resolvida no navegador,
+        # para que o corpo reescrito (e guardado em cache) não dependa do host
+        if base_href.startswith('/'):
+            return f'(location.origin+"{base_href}")'
+        return f'"{base_href}"'
+
+    return _reescrever(_JS_PATTERN, js_content, despachar)
+
+
+def rewrite_css(css_content, base_url):
+    """Reescreve url(...) e @import de um arquivo CSS para passarem pelo proxy"""
+    return _reescrever(_CSS_PATTERN, css_content, _despachante_css(base_url))
+
+
+def _despachante_css(base_url):
+    def despachar(match):
+        if match.lastgroup == 'url':
+            url = match.group('url_val').strip()
+            if url.startswith(_IGNORAR_CSS):
+                return match.group(0)
+            quote = match.group('url_q')
+            return f'url({quote}{proxy_url(_resolver_raiz(url, base_url))}{quote})'
+        import_url = match.group('import_url').strip().strip('"\'')
+        if import_url.startswith(_IGNORAR_CSS):
+            return match.group(0)
+        if import_url.startswith('/'):
+            original_url = base_url.rstrip('/') + import_url
+        else:
+            original_url = base_url.rstrip('/') + '/' + import_url
+        return f'@import "{proxy_url(original_url)}"'
+
+    return despachar
+
+
+# ---------------------------------------------------------------------------
+# Modo prefixo (/robo/<caminho>): o servidor original é montado 1:1 sob o
+# prefixo, então apenas caminhos absolutos na raiz precisam ser ajustados
+# ---------------------------------------------------------------------------
+
+_BASE_HREF_RAIZ = re.compile(r'(?i)(\bhref\s*=\s*["\'])/(?!/)')
+
+
+def _prefixar(url, prefix):
+    """Acrescenta o prefixo a caminhos absolutos na raiz (/x), mantendo o resto"""
+    if not url.startswith('/') or url.startswith('//'):
+        return None
+    if url == prefix or url.startswith(prefix + '/'):
+        return None
+    return prefix + url
+
+
+def rewrite_root_paths_html(html_content, prefix):
+    """Modo prefixo: ajusta caminhos absolutos na raiz em atributos, <base> e url(...)"""
+    return _reescrever(_HTML_PATTERN, html_content, _despachante_raiz_html(prefix))
+
+
+def _despachante_raiz_html(prefix):
+    def despachar(match):
+        tipo = match.lastgroup
+        if tipo == 'base':
+            return _BASE_HREF_RAIZ.sub(lambda m: m.group(1) + prefix + '/', match.group(0))
+        if tipo == 'attr':
+            new_url = _prefixar(match.group('attr_url').strip(), prefix)
+            if new_url is None:
+                return match.group(0)
+            quote = match.group('attr_q')
+            return f'{match.group("attr_nome")}={quote}{new_url}{quote}'
+        new_url = _prefixar(match.group('css_val').strip(), prefix)
+        if new_url is None:
+            return match.group(0)
+        quote = match.group('css_q')
+        return f'url({quote}{new_url}{quote})'
+
+    return despachar
+
+
+def rewrite_root_paths_css(css_content, prefix):
+    """Modo prefixo: ajusta caminhos absolutos na raiz em url(...) e @import"""
+    return _reescrever(_CSS_PATTERN, css_content, _despachante_raiz_css(prefix))
+
+
+def _despachante_raiz_css(prefix):
+    def despachar(match):
+        if match.lastgroup == 'url':
+            new_url = _prefixar(match.group('url_val').strip(), prefix)
+            if new_url is None:
+                return match.group(0)
+            quote = match.group('url_q')
+            return f'url({quote}{new_url}{quote})'
+        new_url = _prefixar(match.group('import_url').strip().strip('"\''), prefix)
+        if new_url is None:
+            return match.group(0)
+        return f'@import "{new_url}"'
+
+    return despachar
+
+
+# ---------------------------------------------------------------------------
+# Reescrita do corpo completo (bytes -> bytes)
+# Funções de módulo, sem estado, para poderem rodar em outro processo
+# (ver rewrite_pool.py): recebem tudo o que precisam nos argumentos.
+# ---------------------------------------------------------------------------
+
+def charset_of(content_type, default='utf-8'):
+    """Extrai o charset do Content-Type (ou o padrão)"""
+    if 'charset=' in content_type:
+        charset = content_type.split('charset=')[1].split(';')[0].strip()
+        if charset:
+            return charset
+    return default
+
+
+def inject_script_tag(html_content, script_tag):
+    """Injeta a tag no início do <head> para rodar antes dos outros scripts"""
+    if '<head>' in html_content:
+        return html_content.replace('<head>', '<head>' + script_tag, 1)
+    if '</head>' in html_content:
+        return html_content.replace('</head>', script_tag + '</head>', 1)
+    if '</body>' in html_content:
+        return html_content.replace('</body>', script_tag + '</body>', 1)
+    return script_tag + html_content
+
+
+def _base_path(path):
+    """Diretório do caminho pedido ao proxy, usado para resolver URLs relativas"""
+    if not path or '/' not in path:
+        return '/'
+    base_path = '/' + '/'.join(path.split('/')[:-1])
+    if not base_path.endswith('/'):
+        base_path += '/'
+    return base_path
+
+
+def _reescrever_corpo(content, encoding, reescrever_texto, tempos):
+    """Decodifica, reescreve e codifica, anotando o tempo (ms) de cada etapa em `tempos`"""
+    inicio = time.perf_counter()
+    texto = content.decode(encoding, errors='ignore')
+    decodificado = time.perf_counter()
+    texto = reescrever_texto(texto)
+    reescrito = time.perf_counter()
+    corpo = texto.encode(encoding)
+    if tempos is not None:
+        tempos['decodificacao'] = (decodificado - inicio) * 1000
+        tempos['reescrita'] = (reescrito - decodificado) * 1000
+        tempos['codificacao'] = (time.perf_counter() - reescrito) * 1000
+    return corpo
+
+
+def rewrite_body(content, content_type, base_url, path, script_tag, tempos=None):
+    """
+    Reescreve o corpo de uma resposta do proxy (modo query) conforme o tipo
+
+    Só HTML e CSS são reescritos; JavaScript e demais conteúdos passam sem
+    alteração (o interceptador injetado no HTML corrige as URLs no navegador).
+
+    Args:
+        content: Corpo original (bytes)
+        content_type: Content-Type do servidor original (minúsculo)
+        base_url: URL base do servidor original (HTTPS)
+        path: Caminho solicitado ao proxy (ou None)
+        script_tag: Tag <script> do interceptador, injetada no HTML
+        tempos: Dict opcional que recebe o tempo (ms) de decodificação,
+            reescrita e codificação
+
+    Returns:
+        Corpo reescrito (bytes); em caso de erro retorna o corpo original
+    """
+    try:
+        if 'text/html' in content_type:
+            base_path = _base_path(path)
+            return _reescrever_corpo(
+                content, charset_of(content_type),
+                lambda texto: inject_script_tag(rewrite_html(texto, base_url, base_path), script_tag),
+                tempos
+            )
+        if 'css' in content_type:
+            return _reescrever_corpo(content, 'utf-8', lambda texto: rewrite_css(texto, base_url), tempos)
+    except Exception as e:
+        print(f"Erro ao reescrever {content_type or 'conteúdo'}: {e}")
+    return content
+
+
+def rewrite_body_prefix(content, content_type, prefix, script_tag, tempos=None):
+    """
+    Reescrita mínima do modo prefixo: só caminhos absolutos na raiz em HTML e CSS
+
+    JavaScript e demais conteúdos passam sem alteração.
+    """
+    try:
+        if 'text/html' in content_type:
+            return _reescrever_corpo(
+                content, charset_of(content_type),
+                lambda texto: inject_script_tag(rewrite_root_paths_html(texto, prefix), script_tag),
+                tempos
+            )
+        if 'css' in content_type:
+            return _reescrever_corpo(content, 'utf-8', lambda texto: rewrite_root_paths_css(texto, prefix), tempos)
+    except Exception as e:
+        print(f"Erro ao processar conteúdo no modo prefixo: {e}")
+    return content
+
+
+def rewrite_body_timed(*args):
+    """rewrite_body que também retorna os tempos das etapas (para rodar no rewrite_pool)"""
+    tempos = {}
+    return rewrite_body(*args, tempos=tempos), tempos
+
+
+def rewrite_body_prefix_timed(*args):
+    """rewrite_body_prefix que também retorna os tempos das etapas"""
+    tempos = {}
+    return rewrite_body_prefix(*args, tempos=tempos), tempos
+
+
+# ---------------------------------------------------------------------------
+# Reescrita em streaming (HTML e CSS): blocos de bytes -> blocos de bytes
+# ---------------------------------------------------------------------------
+
+def is_streamable(content_type):
+    """HTML e CSS podem ser reescritos em streaming"""
+    return 'text/html' in content_type or 'css' in content_type
+
+
+def _decodificar_stream(blocos, encoding):
+    decoder = codecs.getincrementaldecoder(encoding)(errors='ignore')
+    for bloco in blocos:
+        texto = decoder.decode(bloco)
+        if texto:
+            yield texto
+    texto = decoder.decode(b'', final=True)
+    if texto:
+        yield texto
+
+
+def _codificar_stream(partes, encoding):
+    encoder = codecs.getincrementalencoder(encoding)()
+    for parte in partes:
+        bloco = encoder.encode(parte)
+        if bloco:
+            yield bloco
+    bloco = encoder.encode('', final=True)
+    if bloco:
+        yield bloco
+
+
+def _injetar_stream(partes, script_tag, limite=JANELA_STREAM):
+    """
+    inject_script_tag em streaming: segura a saída até encontrar <head>
+    (ou passar de `limite` caracteres) e então injeta a tag
+    """
+    cabeca = ''
+    for parte in partes:
+        if cabeca is None:
+            yield parte
+            continue
+        cabeca += parte
+        if '<head>' in cabeca or len(cabeca) > limite:
+            yield inject_script_tag(cabeca, script_tag)
+            cabeca = None
+    if cabeca is not None:
+        yield inject_script_tag(cabeca, script_tag)
+
+
+def _stream(blocos, content_type, despachante_html, despachante_css, script_tag):
+    if 'text/html' in content_type:
+        encoding = charset_of(content_type)
+        partes = _reescrever_stream(_HTML_PATTERN, _decodificar_stream(blocos, encoding), despachante_html())
+        return _codificar_stream(_injetar_stream(partes, script_tag), encoding)
+    partes = _reescrever_stream(_CSS_PATTERN, _decodificar_stream(blocos, 'utf-8'), despachante_css())
+    return _codificar_stream(partes, 'utf-8')
+
+
+def rewrite_body_stream(blocos, content_type, base_url, path, script_tag):
+    """
+    rewrite_body em streaming para HTML e CSS (ver is_streamable)
+
+    Gera a mesma saída de rewrite_body para ocorrências menores que
+    JANELA_STREAM, usando memória limitada a alguns blocos.
+    """
+    return _stream(
+        blocos, content_type,
+        lambda: _despachante_html(base_url, _base_path(path)),
+        lambda: _despachante_css(base_url),
+        script_tag
+    )
+
+
+def rewrite_body_prefix_stream(blocos, content_type, prefix, script_tag):
+    """rewrite_body_prefix em streaming para HTML e CSS (ver is_streamable)"""
+    return _stream(
+        blocos, content_type,
+        lambda: _despachante_raiz_html(prefix),
+        lambda: _despachante_raiz_css(prefix),
+        script_tag
+    )
+
+
+# ---------------------------------------------------------------------------
+# Descoberta de URLs referenciadas (usada pelo pré-aquecimento do cache)
+# ---------------------------------------------------------------------------
+
+_GRUPOS_URL = {
+    'attr': 'attr_url', 'css_url': 'css_val', 'url': 'url_val', 'import': 'import_url',
+    'fetch': 'fetch_url', 'xhr': 'xhr_url', 'recurso': 'recurso_url',
+}
+
+
+def discover_urls(texto, content_type):
+    """
+    Lista as URLs referenciadas em um corpo HTML, CSS ou JavaScript
+
+    Usa os mesmos padrões da reescrita, então encontra exatamente as
+    ocorrências que a reescrita trata (atributos, url(...), @import,
+    import(), fetch(), XMLHttpRequest.open e strings de recursos).
+    """
+    if 'text/html' in content_type:
+        pattern = _HTML_PATTERN
+    elif 'javascript' in content_type:
+        pattern = _JS_PATTERN
+    elif 'css' in content_type:
+        pattern = _CSS_PATTERN
+    else:
+        return []
+    urls = []
+    for match in pattern.finditer(texto):
+        grupo = _GRUPOS_URL.get(match.lastgroup)
+        if grupo is None:
+            continue
+        url = match.group(grupo).strip().strip('"\'')
+        if url:
+            urls.append(url)
+    return urls
@@ -0,0 +1,1750 @@
+#!/usr/bin/env python3
+"""
+Armazenamento dos relatórios de produção (execuções de rotinas)
+
+Cada execução registrada por registrar_relatorio (ou pela API externa) vira
+um registro (data, hora, rotina, usuário, registros). Dois backends guardam
+esses registros com a mesma interface:
+
+- csv: o arquivo relatorio.csv de sempre, só com acréscimos no final; as
+  linhas já lidas ficam em memória em colunas compactas (TabelaColunar) e
+  a cada consulta apenas o trecho acrescentado desde a última é lido
+- sqlite: banco SQLite em modo WAL com índices por data, rotina e usuário;
+  as consultas do painel de produção leem apenas as linhas do período
+  pedido em vez do histórico inteiro
+
+O backend é escolhido por RELATORIO_BACKEND (config.py). Na primeira
+abertura do banco o relatorio.csv existente é importado uma única vez, e o
+banco pode ser exportado de volta para CSV no layout original.
+
+Os dois backends mantêm totais por (dia, rotina, usuário) atualizados a cada
+gravação; o painel monta os gráficos a partir deles em vez das linhas brutas.
+
+As gravações da aplicação passam pelo GravadorEmGrupo: uma thread junta os
+registros enviados em paralelo e os grava em lotes, sob trava fcntl no
+relatorio.csv (seguro entre workers/processos), confirmando a cada chamador
+só depois do fsync.
+
+No backend csv, os meses fechados podem ser movidos para partições mensais
+imutáveis (relatorio_particoes/AAAA-MM.csv) com um resumo diário cada
+(AAAA-MM.json); ver CsvStore e Particoes.
+
+Uso:
+    python3 relatorios.py importar [--csv relatorio.csv] [--db relatorio.db] [--forcar]
+    python3 relatorios.py exportar destino.csv [--db relatorio.db]
+    python3 relatorios.py reconstruir-diario csv|sqlite
+    python3 relatorios.py reconstruir-indice [--csv relatorio.csv]
+    python3 relatorios.py particionar [--csv relatorio.csv]
+"""
+
+import argparse
+import atexit
+import bisect
+import csv
+import functools
+import heapq
+import io
+import json
+import operator
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from collections import namedtuple
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import date, datetime
+from itertools import chain
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+CABECALHO = ['data', 'hora', 'rotina', 'usuario', 'registros']
+
+ARQUIVO_CSV = 'relatorio.csv'
+ARQUIVO_DB = 'relatorio.db'
+# Totais diários do CSV: relatorio.csv -> relatorio_diario.json
+ARQUIVO_DIARIO_SUFIXO = '_diario.json'
+# Índice esparso data -> byte do CSV: relatorio.csv -> relatorio_indice.json
+ARQUIVO_INDICE_SUFIXO = '_indice.json'
+# Meses fechados do CSV: relatorio.csv -> relatorio_particoes/AAAA-MM.csv (+ AAAA-MM.json)
+DIRETORIO_PARTICOES_SUFIXO = '_particoes'
+
+# data é um datetime.date; os demais campos vêm como estão no arquivo
+Registro = namedtuple('Registro', 'data hora rotina usuario registros')
+
+# Total de um dia por rotina e usuário (soma dos registros e número de execuções)
+TotalDiario = namedtuple('TotalDiario', 'data rotina usuario registros execucoes')
+
+# Dados em colunas entregues ao motor de agregação (producao.py): arrays de
+# inteiros por posição (ordinal da data, segundos do dia, códigos de rotina e
+# usuário, registros, execuções) e os nomes de cada código. segundos é None
+# nos totais diários; execucoes é None nas linhas brutas (uma execução cada)
+Colunas = namedtuple('Colunas', 'dias segundos rotinas usuarios registros execucoes nomes_rotinas nomes_usuarios')
+
+
+# Datas distintas lembradas por parse_data (o relatório repete a mesma data
+# em todas as linhas do dia)
+MAX_DATAS_MEMORIZADAS = 1 << 16
+
+
+@functools.lru_cache(maxsize=MAX_DATAS_MEMORIZADAS)
+def _parse_data_texto(texto):
+    # Formatos gravados pela aplicação: fatias fixas, sem strptime
+    if len(texto) == 10 and texto.isascii():
+        if texto[2] == '/' and texto[5] == '/':
+            dia, mes, ano = texto[0:2], texto[3:5], texto[6:10]
+        elif texto[4] == '-' and texto[7] == '-':
+            ano, mes, dia = texto[0:4], texto[5:7], texto[8:10]
+        else:
+            dia = mes = ano = ''
+        if dia.isdigit() and mes.isdigit() and ano.isdigit():
+            try:
+                return date(int(ano), int(mes), int(dia))
+            except ValueError:
+                return None
+    # Demais variações aceitas pelo strptime (ex.: 5/2/2026, sem zeros à esquerda)
+    for formato in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_data(texto):
+    """Converte DD/MM/YYYY (formato padrão) ou YYYY-MM-DD em date (None se inválida)"""
+    if not isinstance(texto, str):
+        return None
+    return _parse_data_texto(texto)
+
+
+def parse_data_filtro(texto):
+    """Converte a data YYYY-MM-DD dos filtros do painel em date (None se vazia ou inválida)"""
+    try:
+        return datetime.strptime(texto, '%Y-%m-%d').date()
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_registros(valor):
+    try:
+        return int(valor or 0)
+    except (ValueError, TypeError):
+        return 0
+
+
+def parse_hora(texto):
+    """Converte HH:MM:SS em segundos do dia (-1 se inválida)"""
+    try:
+        h, m, seg = texto.strip().split(':')
+        return int(h) * 3600 + int(m) * 60 + int(seg)
+    except (ValueError, AttributeError):
+        return -1
+
+
+def formatar_hora(segundos):
+    if segundos < 0:
+        return ''
+    return f'{segundos // 3600:02d}:{segundos // 60 % 60:02d}:{segundos % 60:02d}'
+
+
+class Filtro(namedtuple('Filtro', 'inicio fim usuarios rotinas')):
+    """
+    Filtro das consultas: inicio/fim são date inclusivos (None = sem limite);
+    usuarios/rotinas são frozensets (None = sem filtro)
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def criar(cls, inicio=None, fim=None, usuarios=None, rotinas=None):
+        return cls(inicio, fim, frozenset(usuarios) if usuarios else None, frozenset(rotinas) if rotinas else None)
+
+    def restringir(self, inicio, fim):
+        """Interseção do filtro com o período [inicio, fim]"""
+        if inicio is not None and (self.inicio is None or inicio > self.inicio):
+            novo_inicio = inicio
+        else:
+            novo_inicio = self.inicio
+        if fim is not None and (self.fim is None or fim < self.fim):
+            novo_fim = fim
+        else:
+            novo_fim = self.fim
+        return self._replace(inicio=novo_inicio, fim=novo_fim)
+
+    def aceita(self, registro):
+        if self.inicio is not None and registro.data < self.inicio:
+            return False
+        if self.fim is not None and registro.data > self.fim:
+            return False
+        if self.usuarios is not None and registro.usuario not in self.usuarios:
+            return False
+        if self.rotinas is not None and registro.rotina not in self.rotinas:
+            return False
+        return True
+
+
+SEM_FILTRO = Filtro.criar()
+
+
+# Bytes finais já lidos guardados para detectar um arquivo reescrito no lugar
+TAMANHO_CAUDA = 64
+
+
+def _fim_registros(bloco):
+    """
+    Byte logo após o último registro completo de um bloco que começa no início de um registro
+
+    Um registro termina em uma quebra de linha fora de aspas: campos entre
+    aspas (rotina vinda da API, por exemplo) podem conter quebras de linha,
+    que não encerram o registro. Uma quebra está fora de aspas quando o
+    número de aspas antes dela, desde o início do bloco, é par (o csv.writer
+    sempre põe entre aspas, e duplica, as aspas de um campo).
+    """
+    fim = bloco.rfind(b'\n') + 1
+    aspas = bloco.count(b'"', 0, fim)
+    while aspas % 2:
+        anterior = bloco.rfind(b'\n', 0, fim - 1) + 1
+        aspas -= bloco.count(b'"', anterior, fim)
+        fim = anterior
+    return fim
+
+
+def _ler_registros(bloco):
+    """Campos de cada registro de um trecho de CSV em bytes (como o csv.reader de um arquivo aberto com newline='')"""
+    return csv.reader(io.StringIO(bloco.decode('utf-8', errors='replace'), newline=''))
+
+# Linha já interpretada: ordinal da data, segundos do dia, rotina, usuário e registros
+Linha = namedtuple('Linha', 'dia segundos rotina usuario registros')
+
+# Colunas de um instantâneo da tabela (arrays até n e nomes dos códigos)
+Visao = namedtuple('Visao', 'n dias segundos rotinas usuarios registros nomes_rotinas nomes_usuarios ordenado')
+
+
+
+def _extrator(colunas):
+    """
+    Função que tira de uma linha os campos de CABECALHO na ordem dele
+
+    Args:
+        colunas: posição de cada campo de CABECALHO no arquivo (None se ausente)
+    """
+    presentes = [i for i in colunas if i is not None]
+    tamanho = max(presentes) + 1 if presentes else 0
+    if len(presentes) == len(CABECALHO):
+        pegar = operator.itemgetter(*colunas)
+    else:
+        pegar = None
+
+    def extrair(campos):
+        if pegar is not None and len(campos) >= tamanho:
+            return pegar(campos)
+        # Colunas ausentes do cabeçalho ou linha curta: campos que faltam vêm vazios
+        return tuple(campos[i] if i is not None and i < len(campos) else '' for i in colunas)
+
+    return extrair
+
+
+class LeitorIncremental:
+    """
+    Consumidor do relatorio.csv que lê apenas o que foi acrescentado
+
+    O arquivo só recebe acréscimos no final, então o leitor guarda o byte até
+    onde leu e a cada atualização lê apenas o restante, repassando cada linha
+    interpretada a _aplicar. Se o arquivo for trocado (outro inode), encolher
+    ou tiver os últimos bytes lidos alterados, tudo é refeito do zero. O que
+    vem depois do último registro completo (última linha ainda sem quebra de
+    linha, campo entre aspas ainda aberto) é desfeito (_desfazer) e relido
+    quando for completado.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = Path(caminho)
+        self._lock = threading.Lock()
+        self.recargas = 0
+        self.leituras_incrementais = 0
+        self._limpar()
+
+    def _limpar(self):
+        self._colunas = None
+        self._extrair = None
+        self._consumido = 0
+        self._cauda = b''
+        self._identidade = None
+        self._mtime = None
+        # Registros ainda incompletos no final: (byte inicial, Linhas aplicadas)
+        self._parcial = None
+
+    def _aplicar(self, linha):
+        raise NotImplementedError
+
+    def _desfazer(self, linha):
+        raise NotImplementedError
+
+    def _cauda_confere(self, f):
+        if not self._cauda:
+            return True
+        f.seek(self._consumido - len(self._cauda))
+        return f.read(len(self._cauda)) == self._cauda
+
+    def _atualizar(self):
+        """Lê o que foi acrescentado desde a última chamada; retorna se algo mudou (chamar com o lock)"""
+        try:
+            st = os.stat(self.caminho)
+        except FileNotFoundError:
+            if self._consumido or self._colunas is not None:
+                self._limpar()
+                return True
+            return False
+        identidade = (st.st_dev, st.st_ino)
+        if identidade == self._identidade and st.st_size == self._consumido and st.st_mtime_ns == self._mtime:
+            return False
+        with open(self.caminho, 'rb') as f:
+            if identidade != self._identidade or st.st_size < self._consumido or not self._cauda_confere(f):
+                self._limpar()
+                self.recargas += 1
+            else:
+                self.leituras_incrementais += 1
+                self._desfazer_parcial()
+            f.seek(self._consumido)
+            novo = f.read(st.st_size - self._consumido)
+        self._consumir(novo)
+        self._identidade = identidade
+        self._mtime = st.st_mtime_ns
+        return True
+
+    def atualizar(self):
+        """Lê o que foi acrescentado ao arquivo desde a última chamada (ou tudo, se ele mudou)"""
+        with self._lock:
+            self._atualizar()
+        return self
+
+    def _desfazer_parcial(self):
+        if self._parcial is None:
+            return
+        inicio, linhas = self._parcial
+        for linha in reversed(linhas):
+            self._desfazer(linha)
+        descartados = self._consumido - inicio
+        self._cauda = self._cauda[:-descartados] if descartados < len(self._cauda) else b''
+        self._consumido = inicio
+        self._parcial = None
+
+    def _consumir(self, bloco):
+        inicio_bloco = self._consumido
+        completas = _fim_registros(bloco)
+        for campos in _ler_registros(bloco[:completas]):
+            linha = self._interpretar(campos)
+            if linha is not None:
+                self._aplicar(linha)
+        parcial = bloco[completas:]
+        if parcial:
+            linhas = []
+            for campos in _ler_registros(parcial):
+                linha = self._interpretar(campos)
+                if linha is not None:
+                    self._aplicar(linha)
+                    linhas.append(linha)
+            self._parcial = (inicio_bloco + completas, tuple(linhas))
+        self._consumido = inicio_bloco + len(bloco)
+        self._cauda = (self._cauda + bloco)[-TAMANHO_CAUDA:]
+
+    def _interpretar(self, campos):
+        """Converte os campos de uma linha do CSV em Linha (None para cabeçalho e linhas ignoradas)"""
+        if not campos:
+            return None  # Linhas em branco são ignoradas (como no csv.DictReader)
+        extrair = self._extrair
+        if extrair is None:
+            if self._colunas is None:
+                self._colunas = tuple(campos.index(nome) if nome in campos else None for nome in CABECALHO)
+                return None
+            extrair = self._extrair = _extrator(self._colunas)
+        texto_data, hora, rotina, usuario, registros = extrair(campos)
+        data_registro = parse_data(texto_data.strip())
+        if data_registro is None:
+            return None  # Linhas com data inválida são ignoradas
+        return Linha(data_registro.toordinal(), parse_hora(hora), rotina.strip(), usuario.strip(),
+                     parse_registros(registros))
+
+
+class TabelaColunar(LeitorIncremental):
+    """
+    Linhas do relatorio.csv em colunas compactas, lidas incrementalmente
+
+    Cada linha vira uma posição em arrays de inteiros: ordinal da data
+    (date.toordinal), segundos do dia, códigos de rotina e usuário (nomes
+    internados em listas) e registros.
+    """
+
+    def _limpar(self):
+        super()._limpar()
+        self.dias = array('i')
+        self.segundos = array('i')
+        self.rotinas = array('i')
+        self.usuarios = array('i')
+        self.registros = array('i')
+        self.nomes_rotinas = []
+        self.nomes_usuarios = []
+        self._codigos_rotinas = {}
+        self._codigos_usuarios = {}
+        # Datas em ordem não decrescente permitem localizar períodos por busca binária
+        self.ordenado = True
+
+    def __len__(self):
+        return len(self.dias)
+
+    def _codigo(self, nome, codigos, nomes):
+        codigo = codigos.get(nome)
+        if codigo is None:
+            codigo = codigos[nome] = len(nomes)
+            nomes.append(sys.intern(nome))
+        return codigo
+
+    def _aplicar(self, linha):
+        if self.dias and linha.dia < self.dias[-1]:
+            self.ordenado = False
+        self.dias.append(linha.dia)
+        self.segundos.append(linha.segundos)
+        # Nome já visto (quase sempre): só a consulta ao dicionário
+        codigo = self._codigos_rotinas.get(linha.rotina)
+        self.rotinas.append(codigo if codigo is not None else
+                            self._codigo(linha.rotina, self._codigos_rotinas, self.nomes_rotinas))
+        codigo = self._codigos_usuarios.get(linha.usuario)
+        self.usuarios.append(codigo if codigo is not None else
+                             self._codigo(linha.usuario, self._codigos_usuarios, self.nomes_usuarios))
+        self.registros.append(linha.registros)
+
+    def _desfazer(self, linha):
+        for coluna in (self.dias, self.segundos, self.rotinas, self.usuarios, self.registros):
+            coluna.pop()
+
+    @classmethod
+    def ler_trecho(cls, caminho, identidade, colunas, inicio, fim=None):
+        """
+        Tabela só com as linhas entre os bytes inicio e fim do arquivo (fim=None: até o final)
+
+        Args:
+            identidade: (st_dev, st_ino) esperado; se o arquivo foi trocado, retorna None
+            colunas: posições das colunas de CABECALHO (lidas do cabeçalho pelo índice)
+        """
+        tabela = cls(caminho)
+        try:
+            with open(caminho, 'rb') as f:
+                st = os.fstat(f.fileno())
+                if (st.st_dev, st.st_ino) != tuple(identidade):
+                    return None
+                f.seek(inicio)
+                bloco = f.read() if fim is None else f.read(max(0, fim - inicio))
+        except FileNotFoundError:
+            return None
+        with tabela._lock:
+            tabela._colunas = tuple(colunas)
+            tabela._consumido = inicio
+            tabela._consumir(bloco)
+        return tabela
+
+    def visao(self):
+        """Instantâneo consistente das colunas (acréscimos posteriores ficam fora de n)"""
+        with self._lock:
+            return Visao(len(self.dias), self.dias, self.segundos, self.rotinas, self.usuarios, self.registros,
+                         self.nomes_rotinas, self.nomes_usuarios, self.ordenado)
+
+    def colunas(self, inicio=None, fim=None):
+        """Cópia das colunas das linhas entre inicio e fim (posições fora do período podem vir junto)"""
+        with self._lock:
+            visao = Visao(len(self.dias), self.dias, self.segundos, self.rotinas, self.usuarios, self.registros,
+                          self.nomes_rotinas, self.nomes_usuarios, self.ordenado)
+            lo, hi = _intervalo(visao, inicio, fim)
+            return Colunas(self.dias[lo:hi], self.segundos[lo:hi], self.rotinas[lo:hi], self.usuarios[lo:hi],
+                           self.registros[lo:hi], None, list(self.nomes_rotinas), list(self.nomes_usuarios))
+
+    def stats(self):
+        return {
+            'linhas': len(self.dias),
+            'bytes_lidos': self._consumido,
+            'rotinas': len(self.nomes_rotinas),
+            'usuarios': len(self.nomes_usuarios),
+            'recargas': self.recargas,
+            'leituras_incrementais': self.leituras_incrementais,
+        }
+
+
+class RollupDiario(LeitorIncremental):
+    """
+    Totais diários (dia, rotina, usuário) -> [registros, execuções] do relatorio.csv
+
+    O painel de produção monta os gráficos a partir dessas células (no máximo
+    dias x rotinas x usuários) em vez das linhas brutas. Os totais são
+    gravados em um arquivo JSON ao lado do CSV junto com a posição lida, então
+    ao iniciar o processo só o trecho acrescentado depois da última gravação
+    precisa ser lido. Por isso a gravação pode ser espaçada (no máximo uma a
+    cada intervalo_gravacao segundos, e na saída do processo): o que não foi
+    gravado é relido do CSV. reconstruir() refaz tudo a partir do relatorio.csv.
+    """
+
+    # 2: registros com quebra de linha entre aspas lidos inteiros; parcial com várias Linhas
+    VERSAO = 2
+
+    def __init__(self, caminho, caminho_rollup, intervalo_gravacao=30):
+        self.caminho_rollup = Path(caminho_rollup)
+        self.intervalo_gravacao = intervalo_gravacao
+        self._gravado_em = 0.0
+        self._pendente = False
+        super().__init__(caminho)
+        self._carregar()
+        atexit.register(self.gravar_pendente)
+
+    def _limpar(self):
+        super()._limpar()
+        self.por_dia = {}
+        # Dias com células, em ordem (busca binária por período)
+        self.dias = []
+
+    def _aplicar(self, linha, sinal=1):
+        celulas = self.por_dia.get(linha.dia)
+        if celulas is None:
+            celulas = self.por_dia[linha.dia] = {}
+            bisect.insort(self.dias, linha.dia)
+        chave = (sys.intern(linha.rotina), sys.intern(linha.usuario))
+        totais = celulas.get(chave)
+        if totais is None:
+            totais = celulas[chave] = [0, 0]
+        totais[0] += sinal * linha.registros
+        totais[1] += sinal
+        if not totais[1]:
+            del celulas[chave]
+            if not celulas:
+                del self.por_dia[linha.dia]
+                self.dias.remove(linha.dia)
+
+    def _desfazer(self, linha):
+        self._aplicar(linha, sinal=-1)
+
+    def atualizar(self):
+        with self._lock:
+            if self._atualizar():
+                self._pendente = True
+            if self._pendente and time.monotonic() - self._gravado_em >= self.intervalo_gravacao:
+                self._salvar()
+        return self
+
+    def gravar_pendente(self):
+        with self._lock:
+            if self._pendente:
+                self._salvar()
+
+    def reconstruir(self):
+        """Descarta os totais e refaz a partir do relatorio.csv"""
+        with self._lock:
+            self._limpar()
+            self._atualizar()
+            self._salvar()
+        return self
+
+    def colunas(self, inicio=None, fim=None):
+        """Células dos dias entre inicio e fim, em colunas"""
+        dias, rotinas, usuarios, registros, execucoes = array('i'), array('i'), array('i'), array('i'), array('i')
+        codigos_rotinas, codigos_usuarios = {}, {}
+        with self._lock:
+            lo = bisect.bisect_left(self.dias, inicio.toordinal()) if inicio is not None else 0
+            hi = bisect.bisect_right(self.dias, fim.toordinal()) if fim is not None else len(self.dias)
+            for dia in self.dias[lo:hi]:
+                for (rotina, usuario), (soma, quantidade) in self.por_dia[dia].items():
+                    dias.append(dia)
+                    rotinas.append(codigos_rotinas.setdefault(rotina, len(codigos_rotinas)))
+                    usuarios.append(codigos_usuarios.setdefault(usuario, len(codigos_usuarios)))
+                    registros.append(soma)
+                    execucoes.append(quantidade)
+        return Colunas(dias, None, rotinas, usuarios, registros, execucoes, list(codigos_rotinas), list(codigos_usuarios))
+
+    def totais(self, filtro=SEM_FILTRO):
+        """
+        TotalDiario das células que passam pelo filtro, em ordem de data, rotina e usuário
+
+        Gerador: as células de cada dia são copiadas sob a trava na hora em
+        que o dia é percorrido, sem montar o período inteiro em memória.
+        """
+        with self._lock:
+            lo = bisect.bisect_left(self.dias, filtro.inicio.toordinal()) if filtro.inicio is not None else 0
+            hi = bisect.bisect_right(self.dias, filtro.fim.toordinal()) if filtro.fim is not None else len(self.dias)
+            dias = self.dias[lo:hi]
+        for dia in dias:
+            with self._lock:
+                celulas = sorted(self.por_dia.get(dia, {}).items())
+            data = date.fromordinal(dia)
+            for (rotina, usuario), (registros, execucoes) in celulas:
+                if filtro.usuarios is not None and usuario not in filtro.usuarios:
+                    continue
+                if filtro.rotinas is not None and rotina not in filtro.rotinas:
+                    continue
+                yield TotalDiario(data, rotina, usuario, registros, execucoes)
+
+    def _salvar(self):
+        """Grava os totais e a posição lida (arquivo temporário + rename atômico)"""
+        estado = {
+            'versao': self.VERSAO,
+            'origem': {
+                'identidade': self._identidade,
+                'mtime': self._mtime,
+                'bytes': self._consumido,
+                'cauda': self._cauda.hex(),
+                'colunas': self._colunas,
+                'parcial': self._parcial,
+            },
+            'celulas': [[dia, rotina, usuario, registros, execucoes]
+                        for dia in self.dias
+                        for (rotina, usuario), (registros, execucoes) in self.por_dia[dia].items()],
+        }
+        temporario = self.caminho_rollup.with_name(f'.{self.caminho_rollup.name}.{os.getpid()}.{threading.get_ident()}')
+        try:
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(estado, f, separators=(',', ':'))
+            os.replace(temporario, self.caminho_rollup)
+            self._gravado_em = time.monotonic()
+            self._pendente = False
+        except OSError as e:
+            print(f"Erro ao gravar totais diários ({self.caminho_rollup}): {e}")
+
+    def _carregar(self):
+        """Restaura os totais gravados; o próximo atualizar() confere se o CSV ainda corresponde"""
+        try:
+            with open(self.caminho_rollup, 'r', encoding='utf-8') as f:
+                estado = json.load(f)
+            if estado.get('versao') != self.VERSAO:
+                return
+            origem = estado['origem']
+            for dia, rotina, usuario, registros, execucoes in estado['celulas']:
+                celulas = self.por_dia.setdefault(dia, {})
+                celulas[(sys.intern(rotina), sys.intern(usuario))] = [registros, execucoes]
+            self.dias = sorted(self.por_dia)
+            self._identidade = tuple(origem['identidade']) if origem['identidade'] else None
+            self._mtime = origem['mtime']
+            self._consumido = origem['bytes']
+            self._cauda = bytes.fromhex(origem['cauda'])
+            self._colunas = tuple(origem['colunas']) if origem['colunas'] else None
+            if origem['parcial']:
+                inicio, linhas = origem['parcial']
+                self._parcial = (inicio, tuple(Linha(*linha) for linha in linhas))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Totais diários inválidos em {self.caminho_rollup}, refazendo a partir do CSV: {e}")
+            self._limpar()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'dias': len(self.dias),
+                'celulas': sum(len(c) for c in self.por_dia.values()),
+                'bytes_lidos': self._consumido,
+                'recargas': self.recargas,
+                'leituras_incrementais': self.leituras_incrementais,
+            }
+
+
+class IndiceDatas(LeitorIncremental):
+    """
+    Índice esparso data -> byte do relatorio.csv (uma entrada por dia)
+
+    As linhas são acrescentadas em ordem cronológica, então cada dia novo
+    (maior que todos os anteriores) abre uma entrada com o byte da sua
+    primeira linha: tudo antes desse byte é de dias anteriores. Linhas
+    atrasadas (data menor que a maior já vista) não abrem entrada; apenas
+    baixam a menor data do trecho em que caíram, e a leitura de um período
+    vai até o último trecho que pode conter datas dele. Assim uma consulta
+    do mês corrente lê só os bytes do mês.
+
+    O índice acompanha cada gravação (CsvStore.registrar lê só as linhas
+    acrescentadas) e é gravado ao lado do CSV como os totais diários: no
+    máximo a cada intervalo_gravacao segundos e na saída do processo, com a
+    posição lida, e o que faltar é relido do CSV. reconstruir() refaz tudo.
+    """
+
+    # 2: bytes de registros inteiros (quebras de linha entre aspas não abrem registro)
+    VERSAO = 2
+
+    def __init__(self, caminho, caminho_indice, intervalo_gravacao=30):
+        self.caminho_indice = Path(caminho_indice)
+        self.intervalo_gravacao = intervalo_gravacao
+        self._gravado_em = 0.0
+        self._pendente = False
+        self.trechos_lidos = 0
+        self.bytes_trechos = 0
+        super().__init__(caminho)
+        self._carregar()
+        atexit.register(self.gravar_pendente)
+
+    def _limpar(self):
+        super()._limpar()
+        # Entradas: dia que abre o trecho, byte inicial e menor data do trecho
+        self.dias = array('i')
+        self.posicoes = array('q')
+        self.minimos = array('i')
+
+    def _consumir(self, bloco):
+        """Como LeitorIncremental._consumir, guardando o byte de cada registro (o incompleto fica para depois)"""
+        inicio_bloco = self._consumido
+        completas = _fim_registros(bloco)
+        posicao = inicio_bloco
+        registro = b''
+        for texto in bloco[:completas].splitlines(keepends=True):
+            registro += texto
+            if registro.count(b'"') % 2:
+                continue  # Quebra de linha dentro de aspas: o registro continua na linha seguinte
+            linha = self._interpretar(next(csv.reader([registro.decode('utf-8', errors='replace')]), []))
+            if linha is not None:
+                self._indexar(linha.dia, posicao)
+            posicao += len(registro)
+            registro = b''
+        if completas < len(bloco):
+            self._parcial = (inicio_bloco + completas, ())
+        self._consumido = inicio_bloco + len(bloco)
+        self._cauda = (self._cauda + bloco)[-TAMANHO_CAUDA:]
+
+    def _indexar(self, dia, posicao):
+        if not self.dias or dia > self.dias[-1]:
+            self.dias.append(dia)
+            self.posicoes.append(posicao)
+            self.minimos.append(dia)
+        elif dia < self.minimos[-1]:
+            self.minimos[-1] = dia
+
+    def atualizar(self):
+        with self._lock:
+            if self._atualizar():
+                self._pendente = True
+            if self._pendente and time.monotonic() - self._gravado_em >= self.intervalo_gravacao:
+                self._salvar()
+        return self
+
+    def gravar_pendente(self):
+        with self._lock:
+            if self._pendente:
+                self._salvar()
+
+    def reconstruir(self):
+        """Descarta o índice e refaz a partir do relatorio.csv"""
+        with self._lock:
+            self._limpar()
+            self._atualizar()
+            self._salvar()
+        return self
+
+    def trecho(self, inicio=None, fim=None):
+        """
+        Bytes do relatorio.csv que contêm todas as linhas entre inicio e fim
+
+        Returns:
+            (identidade, colunas, byte inicial, byte final ou None = até o
+            final do arquivo), ou None se o índice ainda não tem entradas
+        """
+        self.atualizar()
+        with self._lock:
+            if not self.dias or self._colunas is None:
+                return None
+            k = bisect.bisect_right(self.dias, inicio.toordinal()) - 1 if inicio is not None else 0
+            byte_inicial = self.posicoes[max(k, 0)]
+            byte_final = None
+            if fim is not None and self._parcial is None:
+                j = len(self.dias) - 1
+                while j >= 0 and self.minimos[j] > fim.toordinal():
+                    j -= 1
+                if j + 1 < len(self.dias):
+                    byte_final = max(byte_inicial, self.posicoes[j + 1])
+            self.trechos_lidos += 1
+            self.bytes_trechos += (byte_final if byte_final is not None else self._consumido) - byte_inicial
+            return self._identidade, self._colunas, byte_inicial, byte_final
+
+    def _salvar(self):
+        """Grava as entradas e a posição lida (arquivo temporário + rename atômico)"""
+        estado = {
+            'versao': self.VERSAO,
+            'origem': {
+                'identidade': self._identidade,
+                'mtime': self._mtime,
+                'bytes': self._consumido,
+                'cauda': self._cauda.hex(),
+                'colunas': self._colunas,
+                'parcial': self._parcial[0] if self._parcial else None,
+            },
+            'entradas': [list(entrada) for entrada in zip(self.dias, self.posicoes, self.minimos)],
+        }
+        try:
+            _gravar_arquivo(self.caminho_indice, json.dumps(estado, separators=(',', ':')))
+            self._gravado_em = time.monotonic()
+            self._pendente = False
+        except OSError as e:
+            print(f"Erro ao gravar índice de datas ({self.caminho_indice}): {e}")
+
+    def _carregar(self):
+        """Restaura o índice gravado; o próximo atualizar() confere se o CSV ainda corresponde"""
+        try:
+            with open(self.caminho_indice, 'r', encoding='utf-8') as f:
+                estado = json.load(f)
+            if estado.get('versao') != self.VERSAO:
+                return
+            origem = estado['origem']
+            for dia, posicao, minimo in estado['entradas']:
+                self.dias.append(dia)
+                self.posicoes.append(posicao)
+                self.minimos.append(minimo)
+            self._identidade = tuple(origem['identidade']) if origem['identidade'] else None
+            self._mtime = origem['mtime']
+            self._consumido = origem['bytes']
+            self._cauda = bytes.fromhex(origem['cauda'])
+            self._colunas = tuple(origem['colunas']) if origem['colunas'] else None
+            if origem['parcial'] is not None:
+                self._parcial = (origem['parcial'], ())
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Índice de datas inválido em {self.caminho_indice}, refazendo a partir do CSV: {e}")
+            self._limpar()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entradas': len(self.dias),
+                'bytes_lidos': self._consumido,
+                'trechos_lidos': self.trechos_lidos,
+                'bytes_trechos': self.bytes_trechos,
+                'recargas': self.recargas,
+                'leituras_incrementais': self.leituras_incrementais,
+            }
+
+
+def _codigos(nomes, visao_nomes):
+    """Códigos dos nomes de um filtro (None = sem filtro)"""
+    if nomes is None:
+        return None
+    return {codigo for codigo, nome in enumerate(visao_nomes) if nome in nomes}
+
+
+def _intervalo(visao, inicio, fim):
+    """Faixa de posições [lo, hi) que pode conter datas entre inicio e fim"""
+    if not visao.ordenado:
+        return 0, visao.n
+    lo = bisect.bisect_left(visao.dias, inicio.toordinal(), 0, visao.n) if inicio is not None else 0
+    hi = bisect.bisect_right(visao.dias, fim.toordinal(), lo, visao.n) if fim is not None else visao.n
+    return lo, hi
+
+
+def _registros_da_visao(visao, posicoes):
+    datas = {}
+    for i in posicoes:
+        dia = visao.dias[i]
+        data_registro = datas.get(dia)
+        if data_registro is None:
+            data_registro = datas[dia] = date.fromordinal(dia)
+        yield Registro(data_registro, formatar_hora(visao.segundos[i]), visao.nomes_rotinas[visao.rotinas[i]],
+                       visao.nomes_usuarios[visao.usuarios[i]], visao.registros[i])
+
+
+def ler_csv(caminho):
+    """Todos os registros de um arquivo no layout do relatorio.csv"""
+    visao = TabelaColunar(caminho).atualizar().visao()
+    return _registros_da_visao(visao, range(visao.n))
+
+
+def _concatenar(partes):
+    """Junta Colunas de várias origens, recodificando rotinas e usuários em códigos comuns"""
+    partes = [c for c in partes if len(c.dias)]
+    if len(partes) == 1:
+        return partes[0]
+    brutas = not partes or partes[0].execucoes is None
+    dias, segundos, rotinas, usuarios, registros, execucoes = (array('i') for _ in range(6))
+    codigos_rotinas, codigos_usuarios = {}, {}
+    for parte in partes:
+        mapa_rotinas = array('i', (codigos_rotinas.setdefault(nome, len(codigos_rotinas)) for nome in parte.nomes_rotinas))
+        mapa_usuarios = array('i', (codigos_usuarios.setdefault(nome, len(codigos_usuarios)) for nome in parte.nomes_usuarios))
+        dias.extend(parte.dias)
+        rotinas.extend(mapa_rotinas[c] for c in parte.rotinas)
+        usuarios.extend(mapa_usuarios[c] for c in parte.usuarios)
+        registros.extend(parte.registros)
+        if brutas:
+            segundos.extend(parte.segundos)
+        else:
+            execucoes.extend(parte.execucoes)
+    if brutas:
+        return Colunas(dias, segundos, rotinas, usuarios, registros, None, list(codigos_rotinas), list(codigos_usuarios))
+    return Colunas(dias, None, rotinas, usuarios, registros, execucoes, list(codigos_rotinas), list(codigos_usuarios))
+
+
+def _somar_totais(totais):
+    """Soma TotalDiario consecutivos da mesma (data, rotina, usuário)"""
+    atual = None
+    for total in totais:
+        if atual is not None and total[:3] == atual[:3]:
+            atual = atual._replace(registros=atual.registros + total.registros,
+                                   execucoes=atual.execucoes + total.execucoes)
+            continue
+        if atual is not None:
+            yield atual
+        atual = total
+    if atual is not None:
+        yield atual
+
+
+def _gravar_arquivo(caminho, texto):
+    """Grava o arquivo inteiro de uma vez (temporário sincronizado + rename atômico)"""
+    temporario = caminho.with_name(f'.{caminho.name}.{os.getpid()}.{threading.get_ident()}')
+    with open(temporario, 'w', newline='', encoding='utf-8') as f:
+        f.write(texto)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+
+
+class Particao:
+    """
+    Mês fechado do relatório: AAAA-MM.csv (layout do relatorio.csv) e o resumo AAAA-MM.json
+
+    O resumo é o cabeçalho da partição (mês, datas mínima e máxima, linhas,
+    soma dos registros) mais os totais por (dia, rotina, usuário) do mês, que
+    atendem as consultas por dia sem abrir o CSV. As linhas brutas só são
+    lidas (e mantidas em memória) quando uma consulta precisa delas.
+    """
+
+    def __init__(self, caminho_resumo, resumo, mtime):
+        self.caminho_resumo = caminho_resumo
+        self.caminho_csv = caminho_resumo.with_suffix('.csv')
+        self.mtime = mtime
+        self.mes = resumo['mes']
+        self.data_min = date.fromisoformat(resumo['data_min'])
+        self.data_max = date.fromisoformat(resumo['data_max'])
+        self.linhas = resumo['linhas']
+        self.registros = resumo['registros']
+        self._celulas = resumo['celulas']
+        self._diario = None
+        self.tabela = TabelaColunar(self.caminho_csv)
+
+    def sobrepoe(self, inicio, fim):
+        return (inicio is None or self.data_max >= inicio) and (fim is None or self.data_min <= fim)
+
+    def _colunas_diarias(self):
+        if self._diario is None:
+            ano, mes = map(int, self.mes.split('-'))
+            base = date(ano, mes, 1).toordinal() - 1
+            dias, rotinas, usuarios, registros, execucoes = (array('i') for _ in range(5))
+            codigos_rotinas, codigos_usuarios = {}, {}
+            for dia, rotina, usuario, soma, quantidade in self._celulas:
+                dias.append(base + dia)
+                rotinas.append(codigos_rotinas.setdefault(rotina, len(codigos_rotinas)))
+                usuarios.append(codigos_usuarios.setdefault(usuario, len(codigos_usuarios)))
+                registros.append(soma)
+                execucoes.append(quantidade)
+            self._diario = Colunas(dias, None, rotinas, usuarios, registros, execucoes,
+                                   list(codigos_rotinas), list(codigos_usuarios))
+        return self._diario
+
+    def colunas_diarias(self, inicio=None, fim=None):
+        """Totais diários do mês entre inicio e fim (células em ordem de dia)"""
+        c = self._colunas_diarias()
+        lo = bisect.bisect_left(c.dias, inicio.toordinal()) if inicio is not None else 0
+        hi = bisect.bisect_right(c.dias, fim.toordinal()) if fim is not None else len(c.dias)
+        if (lo, hi) == (0, len(c.dias)):
+            return c
+        return c._replace(dias=c.dias[lo:hi], rotinas=c.rotinas[lo:hi], usuarios=c.usuarios[lo:hi],
+                          registros=c.registros[lo:hi], execucoes=c.execucoes[lo:hi])
+
+    def totais(self, filtro):
+        c = self.colunas_diarias(filtro.inicio, filtro.fim)
+        datas = {}
+        for i in range(len(c.dias)):
+            rotina, usuario = c.nomes_rotinas[c.rotinas[i]], c.nomes_usuarios[c.usuarios[i]]
+            if filtro.usuarios is not None and usuario not in filtro.usuarios:
+                continue
+            if filtro.rotinas is not None and rotina not in filtro.rotinas:
+                continue
+            data = datas.get(c.dias[i])
+            if data is None:
+                data = datas[c.dias[i]] = date.fromordinal(c.dias[i])
+            yield TotalDiario(data, rotina, usuario, c.registros[i], c.execucoes[i])
+
+
+class Particoes:
+    """
+    Partições mensais de um relatorio.csv (diretório relatorio_particoes)
+
+    Cada mês fechado vira AAAA-MM.csv + AAAA-MM.json (ver Particao). Uma
+    partição só é regravada quando chegam linhas atrasadas do mesmo mês, e
+    sempre por inteiro (arquivo temporário + rename). O arquivo .arquivando.json
+    registra um arquivamento em andamento: se o processo parar antes de
+    trocar o relatorio.csv, as partições voltam ao número de linhas anterior
+    (recuperar) e o arquivamento é refeito sem duplicar linhas.
+    """
+
+    VERSAO = 1
+    DIARIO_ARQUIVAMENTO = '.arquivando.json'
+
+    def __init__(self, diretorio):
+        self.diretorio = Path(diretorio)
+        self._lock = threading.Lock()
+        self._lista = []
+        self._assinatura = None
+
+    def existe(self):
+        return self.diretorio.is_dir()
+
+    def assinatura(self):
+        """mtime do diretório (muda quando uma partição é criada ou substituída)"""
+        try:
+            return os.stat(self.diretorio).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def lista(self):
+        """Partições em ordem de mês (recarrega os resumos se o diretório mudou)"""
+        assinatura = self.assinatura()
+        with self._lock:
+            if assinatura != self._assinatura:
+                anteriores = {p.mes: p for p in self._lista}
+                lista = []
+                for caminho_resumo in sorted(self.diretorio.glob('????-??.json')) if assinatura is not None else ():
+                    try:
+                        mtime = os.stat(caminho_resumo).st_mtime_ns
+                        anterior = anteriores.get(caminho_resumo.stem)
+                        if anterior is not None and anterior.mtime == mtime:
+                            lista.append(anterior)  # Mantém as linhas já lidas
+                            continue
+                        with open(caminho_resumo, 'r', encoding='utf-8') as f:
+                            resumo = json.load(f)
+                        if resumo.get('versao') == self.VERSAO:
+                            lista.append(Particao(caminho_resumo, resumo, mtime))
+                    except (OSError, ValueError, KeyError, TypeError) as e:
+                        print(f"Partição ignorada ({caminho_resumo}): {e}")
+                self._lista = lista
+                self._assinatura = assinatura
+            return list(self._lista)
+
+    def sobrepostas(self, inicio, fim):
+        return [p for p in self.lista() if p.sobrepoe(inicio, fim)]
+
+    def _linhas_csv(self, mes):
+        """Linhas de dados (listas de campos, uma por registro do CSV) da partição do mês, sem o cabeçalho"""
+        try:
+            with open(self.diretorio / f'{mes}.csv', 'r', newline='', encoding='utf-8') as f:
+                return list(csv.reader(f))[1:]
+        except FileNotFoundError:
+            return []
+
+    def _gravar(self, mes, linhas):
+        """Grava a partição do mês (CSV e resumo) com as linhas de dados dadas (listas de campos)"""
+        caminho_csv = self.diretorio / f'{mes}.csv'
+        texto = io.StringIO()
+        writer = csv.writer(texto)
+        writer.writerow(CABECALHO)
+        writer.writerows(linhas)
+        _gravar_arquivo(caminho_csv, texto.getvalue())
+        # Resumo calculado a partir do próprio arquivo gravado
+        visao = TabelaColunar(caminho_csv).atualizar().visao()
+        celulas = {}
+        for i in range(visao.n):
+            chave = (visao.dias[i], visao.nomes_rotinas[visao.rotinas[i]], visao.nomes_usuarios[visao.usuarios[i]])
+            totais = celulas.setdefault(chave, [0, 0])
+            totais[0] += visao.registros[i]
+            totais[1] += 1
+        dias = visao.dias[:visao.n]
+        ano, numero_mes = map(int, mes.split('-'))
+        base = date(ano, numero_mes, 1).toordinal() - 1
+        resumo = {
+            'versao': self.VERSAO,
+            'mes': mes,
+            'data_min': date.fromordinal(min(dias)).isoformat() if dias else f'{mes}-01',
+            'data_max': date.fromordinal(max(dias)).isoformat() if dias else f'{mes}-01',
+            'linhas': visao.n,
+            'registros': sum(visao.registros[:visao.n]),
+            'celulas': [[dia - base, rotina, usuario, soma, quantidade]
+                        for (dia, rotina, usuario), (soma, quantidade) in sorted(celulas.items())],
+        }
+        _gravar_arquivo(self.diretorio / f'{mes}.json', json.dumps(resumo, ensure_ascii=False, separators=(',', ':')))
+
+    def iniciar_arquivamento(self, origem, linhas_por_mes):
+        """
+        Acrescenta as linhas de cada mês às partições, registrando antes o
+        número de linhas que cada uma tinha (para recuperar())
+        """
+        self.diretorio.mkdir(exist_ok=True)
+        existentes = {mes: self._linhas_csv(mes) for mes in linhas_por_mes}
+        _gravar_arquivo(self.diretorio / self.DIARIO_ARQUIVAMENTO, json.dumps({
+            'origem': list(origem),
+            'meses': {mes: len(linhas) for mes, linhas in existentes.items()},
+        }))
+        for mes, linhas in sorted(linhas_por_mes.items()):
+            self._gravar(mes, existentes[mes] + linhas)
+
+    def concluir_arquivamento(self):
+        try:
+            os.unlink(self.diretorio / self.DIARIO_ARQUIVAMENTO)
+        except FileNotFoundError:
+            pass
+
+    def recuperar(self, origem):
+        """
+        Desfaz um arquivamento interrompido antes da troca do relatorio.csv
+
+        Args:
+            origem: (st_dev, st_ino) do relatorio.csv atual; se for o mesmo do
+                arquivamento interrompido, as linhas ainda estão nele e as
+                partições voltam ao tamanho anterior
+        """
+        try:
+            with open(self.diretorio / self.DIARIO_ARQUIVAMENTO, 'r', encoding='utf-8') as f:
+                diario = json.load(f)
+        except FileNotFoundError:
+            return
+        if tuple(diario['origem']) == tuple(origem):
+            for mes, quantidade in diario['meses'].items():
+                if quantidade:
+                    self._gravar(mes, self._linhas_csv(mes)[:quantidade])
+                else:
+                    for sufixo in ('.json', '.csv'):
+                        try:
+                            os.unlink(self.diretorio / f'{mes}{sufixo}')
+                        except FileNotFoundError:
+                            pass
+            print(f"Arquivamento interrompido desfeito em {self.diretorio}: {', '.join(sorted(diario['meses']))}")
+        self.concluir_arquivamento()
+
+    def stats(self):
+        lista = self.lista()
+        return {
+            'particoes': len(lista),
+            'linhas': sum(p.linhas for p in lista),
+            'meses': [lista[0].mes, lista[-1].mes] if lista else None,
+            'linhas_carregadas': sum(len(p.tabela) for p in lista),
+        }
+
+
+def arquivos_csv(caminho):
+    """Partições mensais (se houver) seguidas do próprio relatorio.csv"""
+    caminho = Path(caminho)
+    particoes = Particoes(caminho.with_name(caminho.stem + DIRETORIO_PARTICOES_SUFIXO))
+    return [p.caminho_csv for p in particoes.lista()] + [caminho]
+
+
+class CsvStore:
+    """
+    Registros no relatorio.csv (acréscimos no final, leitura incremental)
+
+    Depois da migração (python3 relatorios.py particionar) os meses fechados
+    ficam em partições mensais (Particoes) e o relatorio.csv guarda só o mês
+    corrente; a primeira gravação de cada mês arquiva o mês que fechou. As
+    consultas abrem apenas as partições que se sobrepõem ao período pedido,
+    usando os resumos diários delas sempre que as linhas brutas não são
+    necessárias.
+    """
+
+    backend = 'csv'
+
+    def __init__(self, caminho):
+        self.caminho = Path(caminho)
+        self._lock = threading.Lock()
+        self.tabela = TabelaColunar(self.caminho)
+        self.diario = RollupDiario(self.caminho, self.caminho.with_name(self.caminho.stem + ARQUIVO_DIARIO_SUFIXO))
+        self.indice = IndiceDatas(self.caminho, self.caminho.with_name(self.caminho.stem + ARQUIVO_INDICE_SUFIXO))
+        self.particoes = Particoes(self.caminho.with_name(self.caminho.stem + DIRETORIO_PARTICOES_SUFIXO))
+        self._mes_arquivado = None
+
+    @contextmanager
+    def _travado(self, modo):
+        """
+        Abre o relatorio.csv sob trava exclusiva (fcntl.flock)
+
+        Confere, já com a trava, se o arquivo aberto ainda é o do caminho: o
+        arquivamento de outro processo pode tê-lo substituído enquanto se
+        esperava a trava, e a escrita iria para o arquivo antigo.
+        """
+        while True:
+            f = open(self.caminho, modo, newline='', encoding='utf-8')
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            aberto = os.fstat(f.fileno())
+            try:
+                atual = os.stat(self.caminho)
+            except FileNotFoundError:
+                atual = None
+            if atual is not None and (atual.st_dev, atual.st_ino) == (aberto.st_dev, aberto.st_ino):
+                break
+            f.close()
+        try:
+            yield f
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            f.close()
+
+    def registrar(self, registros):
+        """
+        Acrescenta os registros ao arquivo (cabeçalho se ele ainda não existir)
+
+        As linhas são montadas em memória e gravadas em uma única escrita sob
+        trava exclusiva (fcntl.flock), para que gravações de outros processos
+        (outros workers, scripts) não se intercalem nem dupliquem o cabeçalho,
+        e sincronizadas com o disco (fsync) antes de retornar.
+        """
+        texto = io.StringIO()
+        writer = csv.writer(texto)
+        for r in registros:
+            writer.writerow([r.data.strftime('%d/%m/%Y'), r.hora, r.rotina, r.usuario, r.registros])
+        with self._lock:
+            self._arquivar_mes_fechado()
+            with self._travado('a+') as f:
+                # Tamanho conferido já com a trava: só um processo escreve o cabeçalho
+                tamanho = os.fstat(f.fileno()).st_size
+                if tamanho == 0:
+                    csv.writer(f).writerow(CABECALHO)
+                elif os.pread(f.fileno(), 1, tamanho - 1) not in (b'\n', b'\r'):
+                    f.write('\r\n')  # Última linha sem quebra (arquivo editado à mão): não emenda a nova nela
+                f.write(texto.getvalue())
+                f.flush()
+                os.fsync(f.fileno())
+                # Índice de datas lê as linhas acrescentadas ainda com a trava
+                self.indice.atualizar()
+            # Totais diários acompanham cada gravação
+            self.diario.atualizar()
+        return len(registros)
+
+    def _arquivar_mes_fechado(self):
+        """Na primeira gravação de cada mês, arquiva o mês que fechou (só com partições)"""
+        hoje = date.today()
+        if self._mes_arquivado == (hoje.year, hoje.month) or not self.particoes.existe():
+            return
+        self._mes_arquivado = (hoje.year, hoje.month)
+        dias = self.diario.atualizar().dias
+        if dias and dias[0] < date(hoje.year, hoje.month, 1).toordinal():
+            try:
+                movidas = self._arquivar(hoje)
+                print(f"Relatório: meses arquivados em {self.particoes.diretorio}: {movidas}")
+            except (OSError, ValueError) as e:
+                # Gravação segue no relatorio.csv; o arquivamento é tentado de novo no próximo mês ou pela CLI
+                print(f"Erro ao arquivar meses fechados do relatório: {e}")
+
+    def arquivar(self, hoje=None):
+        """
+        Move as linhas de meses anteriores ao de hoje para as partições mensais
+
+        É a migração de um relatorio.csv existente (cria o diretório de
+        partições) e a rotação mensal. Linhas atrasadas de um mês já
+        arquivado são acrescentadas à partição dele. Linhas com data inválida
+        ou de meses abertos permanecem no relatorio.csv com os mesmos campos.
+        O arquivo é lido por registros do CSV (um campo entre aspas pode ter
+        quebras de linha) e tudo é regravado pelo csv.writer.
+
+        Returns:
+            {'AAAA-MM': linhas movidas}
+        """
+        with self._lock:
+            return self._arquivar(hoje or date.today())
+
+    def _arquivar(self, hoje):
+        if not self.caminho.exists():
+            return {}
+        abertura = (hoje.year, hoje.month)
+        with self._travado('r+') as f:
+            aberto = os.fstat(f.fileno())
+            origem = (aberto.st_dev, aberto.st_ino)
+            if self.particoes.existe():
+                self.particoes.recuperar(origem)
+            colunas, ficam, movidas = None, [], {}
+            # Registros lógicos: um campo entre aspas pode conter quebras de linha
+            for campos in csv.reader(f):
+                if colunas is None or not campos:
+                    if colunas is None and campos:
+                        colunas = tuple(campos.index(nome) if nome in campos else None for nome in CABECALHO)
+                    ficam.append(campos)
+                    continue
+                valores = [campos[i] if i is not None and i < len(campos) else '' for i in colunas]
+                data_registro = parse_data(valores[0].strip())
+                if data_registro is None or (data_registro.year, data_registro.month) >= abertura:
+                    ficam.append(campos)
+                    continue
+                movidas.setdefault(f'{data_registro.year:04d}-{data_registro.month:02d}', []).append(valores)
+            if not movidas:
+                self.particoes.diretorio.mkdir(exist_ok=True)
+                return {}
+            self.particoes.iniciar_arquivamento(origem, movidas)
+            # Novo relatorio.csv só com o que fica; quem esperava a trava reabre o arquivo novo (_travado)
+            texto = io.StringIO()
+            csv.writer(texto).writerows(ficam)
+            _gravar_arquivo(self.caminho, texto.getvalue())
+            self.particoes.concluir_arquivamento()
+        self.diario.atualizar()
+        return {mes: len(linhas_mes) for mes, linhas_mes in sorted(movidas.items())}
+
+    def _posicoes(self, visao, filtro):
+        """Posições das linhas que passam pelo filtro"""
+        lo, hi = _intervalo(visao, filtro.inicio, filtro.fim)
+        ini = filtro.inicio.toordinal() if filtro.inicio is not None else None
+        fim = filtro.fim.toordinal() if filtro.fim is not None else None
+        checar_datas = not visao.ordenado and (ini is not None or fim is not None)
+        codigos_usuarios = _codigos(filtro.usuarios, visao.nomes_usuarios)
+        codigos_rotinas = _codigos(filtro.rotinas, visao.nomes_rotinas)
+        dias, usuarios, rotinas = visao.dias, visao.usuarios, visao.rotinas
+        for i in range(lo, hi):
+            if checar_datas and ((ini is not None and dias[i] < ini) or (fim is not None and dias[i] > fim)):
+                continue
+            if codigos_usuarios is not None and usuarios[i] not in codigos_usuarios:
+                continue
+            if codigos_rotinas is not None and rotinas[i] not in codigos_rotinas:
+                continue
+            yield i
+
+    def _tabela_atual(self, filtro):
+        """
+        Linhas do relatorio.csv para o filtro
+
+        Com a tabela inteira já em memória (ou sem limite de período), usa a
+        tabela; senão lê só o trecho do período, localizado pelo índice de datas.
+        """
+        if len(self.tabela) or (filtro.inicio is None and filtro.fim is None):
+            return self.tabela.atualizar()
+        trecho = self.indice.trecho(filtro.inicio, filtro.fim)
+        tabela = TabelaColunar.ler_trecho(self.caminho, *trecho) if trecho is not None else None
+        return tabela if tabela is not None else self.tabela.atualizar()
+
+    def _tabelas(self, filtro):
+        """Tabelas das partições do período do filtro e a do relatorio.csv, atualizadas"""
+        return ([p.tabela.atualizar() for p in self.particoes.sobrepostas(filtro.inicio, filtro.fim)]
+                + [self._tabela_atual(filtro)])
+
+    def registros(self, filtro=SEM_FILTRO):
+        visoes = [tabela.visao() for tabela in self._tabelas(filtro)]
+        return chain.from_iterable(_registros_da_visao(visao, self._posicoes(visao, filtro)) for visao in visoes)
+
+    def colunas(self, filtro=SEM_FILTRO, detalhe='dia'):
+        """
+        Colunas para o motor de agregação, já limitadas ao período do filtro
+
+        detalhe='dia' entrega os totais diários; 'linha' entrega as linhas
+        brutas (com a hora). Os filtros de usuário e rotina são aplicados
+        pelo motor.
+        """
+        if detalhe == 'linha':
+            return _concatenar([tabela.colunas(filtro.inicio, filtro.fim) for tabela in self._tabelas(filtro)])
+        particoes = self.particoes.sobrepostas(filtro.inicio, filtro.fim)
+        return _concatenar([p.colunas_diarias(filtro.inicio, filtro.fim) for p in particoes]
+                           + [self.diario.atualizar().colunas(filtro.inicio, filtro.fim)])
+
+    def totais_diarios(self, filtro=SEM_FILTRO):
+        """TotalDiario do filtro (gerador, em ordem de data, rotina e usuário)"""
+        particoes = self.particoes.sobrepostas(filtro.inicio, filtro.fim)
+        if not particoes:
+            return self.diario.atualizar().totais(filtro)
+        # Linhas atrasadas de meses arquivados ficam no relatorio.csv até a próxima rotação
+        fontes = [p.totais(filtro) for p in particoes] + [self.diario.atualizar().totais(filtro)]
+        return _somar_totais(heapq.merge(*fontes, key=lambda t: (t.data, t.rotina, t.usuario)))
+
+    def versao(self):
+        """
+        Identidade, tamanho e mtime do relatorio.csv e mtime do diretório de
+        partições (mudam a cada gravação ou arquivamento, de qualquer processo)
+        """
+        try:
+            st = os.stat(self.caminho)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns, self.particoes.assinatura()
+
+    def reconstruir_diario(self):
+        """Refaz os totais diários a partir do relatorio.csv"""
+        self.diario.reconstruir()
+
+    def reconstruir_indice(self):
+        """Refaz o índice de datas a partir do relatorio.csv"""
+        self.indice.reconstruir()
+
+    def gravar_pendente(self):
+        """Grava os totais diários e o índice de datas ainda não gravados"""
+        self.diario.gravar_pendente()
+        self.indice.gravar_pendente()
+
+    def stats(self):
+        return {'backend': self.backend, 'tabela': self.tabela.stats(), 'diario': self.diario.stats(),
+                'indice': self.indice.stats(), 'particoes': self.particoes.stats()}
+
+
+class SqliteStore:
+    """
+    Registros em SQLite (WAL) com índices por data, rotina e usuário
+
+    A tabela relatorio_diario guarda os totais por (data, rotina, usuário),
+    atualizados na mesma transação de cada gravação.
+    """
+
+    backend = 'sqlite'
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS relatorio (
+            id INTEGER PRIMARY KEY,
+            data TEXT NOT NULL,          -- YYYY-MM-DD (ordena e compara como data)
+            hora TEXT NOT NULL,
+            rotina TEXT NOT NULL,
+            usuario TEXT NOT NULL,
+            registros INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_relatorio_data ON relatorio (data);
+        CREATE INDEX IF NOT EXISTS idx_relatorio_rotina ON relatorio (rotina, data);
+        CREATE INDEX IF NOT EXISTS idx_relatorio_usuario ON relatorio (usuario, data);
+        CREATE TABLE IF NOT EXISTS relatorio_diario (
+            data TEXT NOT NULL,
+            rotina TEXT NOT NULL,
+            usuario TEXT NOT NULL,
+            registros INTEGER NOT NULL,
+            execucoes INTEGER NOT NULL,
+            PRIMARY KEY (data, rotina, usuario)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS meta (
+            chave TEXT PRIMARY KEY,
+            valor TEXT
+        );
+    """
+
+    SQL_INSERIR = 'INSERT INTO relatorio (data, hora, rotina, usuario, registros) VALUES (?, ?, ?, ?, ?)'
+    SQL_SOMAR_DIARIO = """
+        INSERT INTO relatorio_diario (data, rotina, usuario, registros, execucoes) VALUES (?, ?, ?, ?, 1)
+        ON CONFLICT (data, rotina, usuario)
+        DO UPDATE SET registros = registros + excluded.registros, execucoes = execucoes + 1
+    """
+
+    def __init__(self, caminho):
+        self.caminho = Path(caminho)
+        self._local = threading.local()
+        with self._conexao() as con:
+            con.executescript(self.ESQUEMA)
+        # Banco criado antes dos totais diários
+        con = self._conexao()
+        if (con.execute('SELECT 1 FROM relatorio_diario LIMIT 1').fetchone() is None
+                and con.execute('SELECT 1 FROM relatorio LIMIT 1').fetchone() is not None):
+            self.reconstruir_diario()
+
+    def _conexao(self):
+        """Uma conexão por thread (sqlite3 não compartilha conexões entre threads)"""
+        con = getattr(self._local, 'con', None)
+        if con is None:
+            con = sqlite3.connect(self.caminho, timeout=30)
+            con.execute('PRAGMA journal_mode=WAL')
+            # FULL: cada commit (um lote do GravadorEmGrupo) é sincronizado no WAL
+            con.execute('PRAGMA synchronous=FULL')
+            self._local.con = con
+        return con
+
+    def registrar(self, registros):
+        with self._conexao() as con:
+            con.executemany(self.SQL_INSERIR, [(r.data.isoformat(), r.hora, r.rotina, r.usuario, r.registros)
+                                               for r in registros])
+            con.executemany(self.SQL_SOMAR_DIARIO, [(r.data.isoformat(), r.rotina, r.usuario, r.registros)
+                                                    for r in registros])
+        return len(registros)
+
+    def versao(self):
+        """Tamanho e mtime do banco e do WAL (mudam a cada commit, de qualquer processo)"""
+        versao = []
+        for caminho in (self.caminho, self.caminho.with_name(self.caminho.name + '-wal')):
+            try:
+                st = os.stat(caminho)
+                versao.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except FileNotFoundError:
+                versao.append(None)
+        return tuple(versao)
+
+    def reconstruir_diario(self):
+        """Refaz os totais diários a partir da tabela relatorio"""
+        with self._conexao() as con:
+            con.execute('DELETE FROM relatorio_diario')
+            con.execute("""
+                INSERT INTO relatorio_diario (data, rotina, usuario, registros, execucoes)
+                SELECT data, rotina, usuario, SUM(registros), COUNT(*) FROM relatorio GROUP BY data, rotina, usuario
+            """)
+
+    @staticmethod
+    def _where(filtro):
+        condicoes, parametros = [], []
+        if filtro.inicio is not None:
+            condicoes.append('data >= ?')
+            parametros.append(filtro.inicio.isoformat())
+        if filtro.fim is not None:
+            condicoes.append('data <= ?')
+            parametros.append(filtro.fim.isoformat())
+        for coluna, valores in (('usuario', filtro.usuarios), ('rotina', filtro.rotinas)):
+            if valores is not None:
+                condicoes.append(f'{coluna} IN ({",".join("?" * len(valores))})')
+                parametros.extend(sorted(valores))
+        return (' WHERE ' + ' AND '.join(condicoes)) if condicoes else '', parametros
+
+    def registros(self, filtro=SEM_FILTRO):
+        where, parametros = self._where(filtro)
+        cursor = self._conexao().execute(
+            f'SELECT data, hora, rotina, usuario, registros FROM relatorio{where} ORDER BY id', parametros)
+        for data_iso, hora, rotina, usuario, registros in cursor:
+            yield Registro(date.fromisoformat(data_iso), hora, rotina, usuario, registros)
+
+    def totais_diarios(self, filtro=SEM_FILTRO):
+        """TotalDiario do filtro (gerador, em ordem de data, rotina e usuário)"""
+        where, parametros = self._where(filtro)
+        cursor = self._conexao().execute(
+            f'SELECT data, rotina, usuario, registros, execucoes FROM relatorio_diario{where} '
+            'ORDER BY data, rotina, usuario', parametros)
+        for data_iso, rotina, usuario, registros, execucoes in cursor:
+            yield TotalDiario(date.fromisoformat(data_iso), rotina, usuario, registros, execucoes)
+
+    def colunas(self, filtro=SEM_FILTRO, detalhe='dia'):
+        """Colunas para o motor de agregação (totais diários ou, com detalhe='linha', linhas brutas)"""
+        where, parametros = self._where(filtro)
+        if detalhe == 'linha':
+            sql = f'SELECT data, hora, rotina, usuario, registros FROM relatorio{where} ORDER BY id'
+        else:
+            sql = f'SELECT data, NULL, rotina, usuario, registros, execucoes FROM relatorio_diario{where} ORDER BY data'
+        dias, segundos, rotinas, usuarios, registros, execucoes = (array('i') for _ in range(6))
+        codigos_rotinas, codigos_usuarios, ordinais = {}, {}, {}
+        for linha in self._conexao().execute(sql, parametros):
+            dia = ordinais.get(linha[0])
+            if dia is None:
+                dia = ordinais[linha[0]] = date.fromisoformat(linha[0]).toordinal()
+            dias.append(dia)
+            rotinas.append(codigos_rotinas.setdefault(linha[2], len(codigos_rotinas)))
+            usuarios.append(codigos_usuarios.setdefault(linha[3], len(codigos_usuarios)))
+            registros.append(linha[4])
+            if detalhe == 'linha':
+                segundos.append(parse_hora(linha[1]))
+            else:
+                execucoes.append(linha[5])
+        if detalhe == 'linha':
+            return Colunas(dias, segundos, rotinas, usuarios, registros, None, list(codigos_rotinas), list(codigos_usuarios))
+        return Colunas(dias, None, rotinas, usuarios, registros, execucoes, list(codigos_rotinas), list(codigos_usuarios))
+
+    def stats(self):
+        con = self._conexao()
+        return {
+            'backend': self.backend,
+            'registros': con.execute('SELECT COUNT(*) FROM relatorio').fetchone()[0],
+            'celulas_diarias': con.execute('SELECT COUNT(*) FROM relatorio_diario').fetchone()[0],
+        }
+
+    def _meta(self, chave):
+        linha = self._conexao().execute('SELECT valor FROM meta WHERE chave = ?', (chave,)).fetchone()
+        return linha[0] if linha else None
+
+    def importar_csv(self, caminho_csv, forcar=False):
+        """
+        Importa um relatorio.csv para o banco (uma única vez)
+
+        Returns:
+            Número de registros importados (0 se a importação já foi feita)
+        """
+        caminho_csv = Path(caminho_csv)
+        if not caminho_csv.exists() or (self._meta('importado_de') and not forcar):
+            return 0
+        registros = [r for arquivo in arquivos_csv(caminho_csv) for r in ler_csv(arquivo)]
+        self.registrar(registros)
+        with self._conexao() as con:
+            con.execute('INSERT OR REPLACE INTO meta (chave, valor) VALUES (?, ?)',
+                        ('importado_de', f'{caminho_csv.resolve()} em {datetime.now():%d/%m/%Y %H:%M:%S}'))
+        return len(registros)
+
+    def exportar_csv(self, destino):
+        """Grava todos os registros no layout do relatorio.csv"""
+        total = 0
+        with open(destino, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(CABECALHO)
+            for r in self.registros():
+                writer.writerow([r.data.strftime('%d/%m/%Y'), r.hora, r.rotina, r.usuario, r.registros])
+                total += 1
+        return total
+
+
+class GravadorEmGrupo:
+    """
+    Gravação em grupo (group commit) dos registros de produção
+
+    Os registros enviados pelas requisições entram em uma fila e uma única
+    thread os grava no store em lotes: cada lote leva o que chegou enquanto o
+    anterior era gravado, esperando até intervalo_ms por mais itens (0 = sem
+    espera) e fechando ao acumular max_lote registros. Cada lote
+    custa uma abertura do arquivo, uma trava e um fsync (ou uma transação no
+    SQLite), em vez de um por registro.
+
+    Quem envia recebe uma confirmação (Future) que só é concluída depois que o
+    lote que contém seus registros foi gravado e sincronizado com o disco.
+    """
+
+    def __init__(self, store, intervalo_ms=0, max_lote=1000):
+        self.store = store
+        self.intervalo = intervalo_ms / 1000
+        self.max_lote = max_lote
+        self._fila = queue.Queue()
+        self._thread = None
+        self._iniciar_lock = threading.Lock()
+        self._contadores = {'lotes': 0, 'registros': 0, 'erros': 0, 'maior_lote': 0, 'segundos_gravando': 0.0}
+        atexit.register(self.parar)
+
+    def enviar(self, registros):
+        """Enfileira os registros; retorna um Future concluído quando estiverem gravados"""
+        confirmacao = Future()
+        registros = list(registros)
+        if not registros:
+            confirmacao.set_result(0)
+            return confirmacao
+        if threading.current_thread() is self._thread:
+            # Chamada de dentro da própria thread gravadora: grava direto
+            confirmacao.set_result(self.store.registrar(registros))
+            return confirmacao
+        self.iniciar()
+        self._fila.put((registros, confirmacao))
+        return confirmacao
+
+    def gravar(self, registros, timeout=30):
+        """
+        Envia os registros e aguarda a confirmação de gravação
+
+        Returns:
+            Número de registros gravados
+
+        Raises:
+            O erro da gravação do lote, ou TimeoutError se não houver
+            confirmação dentro do prazo
+        """
+        return self.enviar(registros).result(timeout)
+
+    def iniciar(self):
+        """Inicia a thread gravadora (uma única vez)"""
+        if self._thread is None:
+            with self._iniciar_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._executar, name='relatorio-gravador', daemon=True)
+                    self._thread.start()
+
+    def parar(self, timeout=10):
+        """Grava o que estiver na fila e encerra a thread"""
+        if self._thread is not None and self._thread.is_alive():
+            self._fila.put(None)
+            self._thread.join(timeout)
+
+    def _executar(self):
+        while True:
+            item = self._fila.get()
+            if item is None:
+                return
+            lote = [item]
+            total = len(item[0])
+            prazo = time.monotonic() + self.intervalo
+            encerrar = False
+            while total < self.max_lote:
+                try:
+                    item = self._fila.get(timeout=max(prazo - time.monotonic(), 0)) if self.intervalo else self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    encerrar = True
+                    break
+                lote.append(item)
+                total += len(item[0])
+            self._gravar_lote(lote, total)
+            if encerrar:
+                return
+
+    def _gravar_lote(self, lote, total):
+        inicio = time.perf_counter()
+        try:
+            self.store.registrar([r for registros, _ in lote for r in registros])
+        except Exception as e:
+            print(f"[relatorio] Erro ao gravar lote de {total} registros: {e}")
+            self._contadores['erros'] += 1
+            for _, confirmacao in lote:
+                confirmacao.set_exception(e)
+            return
+        self._contadores['lotes'] += 1
+        self._contadores['registros'] += total
+        self._contadores['maior_lote'] = max(self._contadores['maior_lote'], total)
+        self._contadores['segundos_gravando'] += time.perf_counter() - inicio
+        for registros, confirmacao in lote:
+            confirmacao.set_result(len(registros))
+
+    def stats(self):
+        contadores = dict(self._contadores)
+        lotes = contadores['lotes']
+        return {
+            'ativo': self._thread is not None and self._thread.is_alive(),
+            'pendentes': self._fila.qsize(),
+            'intervalo_ms': round(self.intervalo * 1000, 3),
+            'max_lote': self.max_lote,
+            **contadores,
+            'segundos_gravando': round(contadores['segundos_gravando'], 3),
+            'media_lote': round(contadores['registros'] / lotes, 2) if lotes else None,
+        }
+
+
+def abrir_store(backend, diretorio):
+    """Abre o store configurado; o banco SQLite importa o relatorio.csv na primeira abertura"""
+    diretorio = Path(diretorio)
+    if backend == 'sqlite':
+        store = SqliteStore(diretorio / ARQUIVO_DB)
+        importados = store.importar_csv(diretorio / ARQUIVO_CSV)
+        if importados:
+            print(f"✓ {importados} registros importados de {ARQUIVO_CSV} para {ARQUIVO_DB}")
+        return store
+    return CsvStore(diretorio / ARQUIVO_CSV)
+
+
+def main():
+    diretorio = Path(__file__).parent
+    parser = argparse.ArgumentParser(description='Importa/exporta os relatórios de produção (relatorio.csv <-> SQLite), refaz os totais diários e particiona o CSV por mês')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    importar = sub.add_parser('importar', help='importa o relatorio.csv para o banco SQLite')
+    importar.add_argument('--csv', default=str(diretorio / ARQUIVO_CSV))
+    importar.add_argument('--db', default=str(diretorio / ARQUIVO_DB))
+    importar.add_argument('--forcar', action='store_true', help='importa mesmo se já houve importação (duplica registros)')
+    exportar = sub.add_parser('exportar', help='exporta o banco SQLite para CSV no layout do relatorio.csv')
+    exportar.add_argument('destino')
+    exportar.add_argument('--db', default=str(diretorio / ARQUIVO_DB))
+    diario = sub.add_parser('reconstruir-diario', help='refaz os totais diários a partir dos registros brutos')
+    diario.add_argument('backend', choices=('csv', 'sqlite'))
+    diario.add_argument('--csv', default=str(diretorio / ARQUIVO_CSV))
+    diario.add_argument('--db', default=str(diretorio / ARQUIVO_DB))
+    indice = sub.add_parser('reconstruir-indice', help='refaz o índice de datas do relatorio.csv')
+    indice.add_argument('--csv', default=str(diretorio / ARQUIVO_CSV))
+    particionar = sub.add_parser('particionar', help='move os meses fechados do relatorio.csv para partições mensais')
+    particionar.add_argument('--csv', default=str(diretorio / ARQUIVO_CSV))
+    args = parser.parse_args()
+
+    if args.comando == 'particionar':
+        store = CsvStore(args.csv)
+        movidas = store.arquivar()
+        for mes, total in movidas.items():
+            print(f"  {mes}: {total} linhas")
+        print(f"✅ {sum(movidas.values())} linhas movidas para {store.particoes.diretorio} "
+              f"({store.particoes.stats()['particoes']} partições)")
+        store.gravar_pendente()
+        return 0
+
+    if args.comando == 'reconstruir-indice':
+        store = CsvStore(args.csv)
+        store.reconstruir_indice()
+        print(f"✅ Índice de datas refeito: {store.indice.stats()}")
+        return 0
+
+    if args.comando == 'reconstruir-diario':
+        store = CsvStore(args.csv) if args.backend == 'csv' else SqliteStore(args.db)
+        store.reconstruir_diario()
+        print(f"✅ Totais diários refeitos: {store.stats()}")
+        return 0
+
+    store = SqliteStore(args.db)
+    if args.comando == 'importar':
+        total = store.importar_csv(args.csv, forcar=args.forcar)
+        print(f"✅ {total} registros importados" if total else "Nada importado (arquivo ausente ou já importado; use --forcar)")
+    else:
+        print(f"✅ {store.exportar_csv(args.destino)} registros exportados para {args.destino}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
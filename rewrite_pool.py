@@ -0,0 +1,92 @@
+"""
+Reescrita do proxy do robô em processos separados
+
+O worker do Gunicorn tem poucas threads (gunicorn_config.threads), que também
+servem os streams SSE das execuções do AUTOREG e o login. A reescrita por regex
+de um bundle grande do Kasm segura o GIL por dezenas de milissegundos e atrasa
+a entrega dos eventos dessas outras threads.
+
+Corpos acima de um limiar são reescritos em um ProcessPoolExecutor pequeno:
+a thread do proxy apenas espera o resultado (sem o GIL) enquanto as demais
+continuam rodando. Corpos pequenos continuam sendo reescritos na própria
+thread, onde o custo de enviar os bytes a outro processo não compensa.
+
+As funções executadas precisam ser de módulo e leves de importar
+(proxy_rewrite); os processos são criados por forkserver, sem importar o app.
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Abaixo disso a reescrita é feita na própria thread
+LIMIAR_BYTES = 128 * 1024
+
+
+class RewritePool:
+    """Executa funções de reescrita inline ou em processos, conforme o tamanho do corpo"""
+
+    def __init__(self, max_workers=2, threshold=LIMIAR_BYTES, preload=('proxy_rewrite',)):
+        self.max_workers = max_workers
+        self.threshold = threshold
+        self.preload = list(preload)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._inline = 0
+        self._remoto = 0
+        self._falhas = 0
+
+    def _obter_executor(self):
+        """Cria o pool na primeira reescrita grande (processos sobem sob demanda)"""
+        with self._lock:
+            if self._executor is None:
+                if 'forkserver' in multiprocessing.get_all_start_methods():
+                    contexto = multiprocessing.get_context('forkserver')
+                    contexto.set_forkserver_preload(self.preload)
+                else:
+                    contexto = multiprocessing.get_context('spawn')
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=contexto)
+            return self._executor
+
+    def _descartar(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, func, content, *args):
+        """
+        Executa func(content, *args) e retorna o resultado
+
+        Se o pool quebrar (processo morto pelo sistema, por exemplo), a
+        reescrita é refeita inline e um novo pool é criado na próxima vez.
+        """
+        if self.max_workers <= 0 or len(content) < self.threshold:
+            self._inline += 1
+            return func(content, *args)
+
+        executor = self._obter_executor()
+        try:
+            resultado = executor.submit(func, content, *args).result()
+            self._remoto += 1
+            return resultado
+        except BrokenProcessPool:
+            self._falhas += 1
+            self._descartar(executor)
+            return func(content, *args)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self):
+        return {
+            'processos': self.max_workers,
+            'limiar_bytes': self.threshold,
+            'inline': self._inline,
+            'em_processo': self._remoto,
+            'falhas': self._falhas,
+        }
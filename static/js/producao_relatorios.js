@@ -51,6 +51,7 @@ function initProducaoRelatoriosModal() {
     const btnAplicarFiltros = document.getElementById('btn-aplicar-filtros');
     const btnLimparFiltros = document.getElementById('btn-limpar-filtros');
     const btnImprimir = document.getElementById('btn-imprimir-relatorio');
+    const btnExportar = document.getElementById('btn-exportar-relatorio');
     const btnToggleFiltros = document.getElementById('btn-toggle-filtros');
     const filtrosSection = document.getElementById('filtros-section');
     
@@ -125,6 +126,13 @@ function initProducaoRelatoriosModal() {
         });
     }
     
+    // Exportar execuções filtradas (CSV)
+    if (btnExportar) {
+        btnExportar.addEventListener('click', function() {
+            exportarCSV();
+        });
+    }
+    
     // Fechar modal ao clicar fora
     if (modal) {
         modal.addEventListener('click', function(e) {
@@ -161,6 +169,59 @@ function inicializarFiltros() {
     }
 }
 
+/**
+ * Parâmetros de URL com os filtros ativos (mesmos para dados e exportação)
+ */
+function parametrosFiltros() {
+    const params = new URLSearchParams();
+    if (filtrosAtivos.data_inicial) {
+        params.append('data_inicial', filtrosAtivos.data_inicial);
+    }
+    if (filtrosAtivos.data_final) {
+        params.append('data_final', filtrosAtivos.data_final);
+    }
+    filtrosAtivos.usuarios.forEach(u => params.append('usuarios[]', u));
+    filtrosAtivos.modulos.forEach(m => params.append('modulos[]', m));
+    return params;
+}
+
+/**
+ * Baixa as execuções dos filtros ativos em CSV (gerado em streaming pelo servidor)
+ */
+function exportarCSV() {
+    window.location.href = `/api/producao-relatorios/export?${parametrosFiltros().toString()}`;
+}
+
+/**
+ * Converte as séries do formato esparso (CSR) para datasets com um valor por rótulo do eixo X
+ * (gráficos com muitos valores não nulos já chegam com datasets)
+ */
+function expandirEsparso(data) {
+    if (data.formato !== 'esparso') {
+        return data;
+    }
+    const expandir = (grafico, rotulo) => {
+        if (!grafico.indptr) {
+            return grafico;
+        }
+        const datasets = grafico.series.map((serie, i) => {
+            const valores = new Array(grafico.labels.length).fill(0);
+            for (let j = grafico.indptr[i]; j < grafico.indptr[i + 1]; j++) {
+                valores[grafico.indices[j]] = grafico.valores[j];
+            }
+            return { label: rotulo(serie), data: valores };
+        });
+        return { labels: grafico.labels, datasets: datasets, tipo_eixo: grafico.tipo_eixo };
+    };
+    const detalhado = data.dados_usuario_detalhado;
+    return {
+        ...data,
+        dados_modulo: expandir(data.dados_modulo, serie => serie),
+        dados_usuario: expandir(data.dados_usuario, serie => serie),
+        dados_usuario_detalhado: expandir(detalhado, ([r, u]) => `${detalhado.rotinas[r]} — ${detalhado.usuarios[u]}`)
+    };
+}
+
 /**
  * Carrega dados do backend
  */
@@ -173,22 +234,15 @@ function carregarDados() {
     if (loadingMsg) loadingMsg.style.display = 'flex';
     if (errorMsg) errorMsg.style.display = 'none';
     
-    // Construir URL com filtros
-    const params = new URLSearchParams();
-    if (filtrosAtivos.data_inicial) {
-        params.append('data_inicial', filtrosAtivos.data_inicial);
-    }
-    if (filtrosAtivos.data_final) {
-        params.append('data_final', filtrosAtivos.data_final);
-    }
-    filtrosAtivos.usuarios.forEach(u => params.append('usuarios[]', u));
-    filtrosAtivos.modulos.forEach(m => params.append('modulos[]', m));
+    // Construir URL com filtros (séries em formato esparso, expandidas aqui)
+    const params = parametrosFiltros();
+    params.append('formato', 'esparso');
     
     fetch(`/api/producao-relatorios/dados?${params.toString()}`)
         .then(response => response.json())
         .then(data => {
             if (data.success) {
-                dadosAtuais = data;
+                dadosAtuais = expandirEsparso(data);
                 atualizarFiltrosDisponiveis(data);
                 atualizarGraficos();
                 if (loadingMsg) loadingMsg.style.display = 'none';
@@ -0,0 +1,597 @@
+/**
+ * Interceptador do proxy do robô (KasmVNC)
+ * Reescreve conexões WebSocket e corrige URLs de recursos em tempo de execução
+ *
+ * Incluído no <head> das páginas servidas por /api/robo-proxy. O que varia por
+ * página vem nos atributos data-* da própria tag <script>:
+ *   data-ws-base  - URL base do WebSocket (ex: wss://127.0.0.1:6901)
+ *   data-base-url - URL base do servidor original (ex: https://127.0.0.1:6901)
+ *   data-prefix   - Prefixo do modo prefixo (ex: /robo); ausente no modo query
+ */
+
+(function() {
+    // Configuração da página, passada nos atributos data-* desta tag <script>
+    const config = (document.currentScript && document.currentScript.dataset) || {};
+    
+    console.log('[Proxy] Script de interceptação WebSocket carregado');
+    const originalWebSocket = window.WebSocket;
+    const wsBaseUrl = config.wsBase || 'wss://127.0.0.1:6901';
+    const proxyBase = '/api/robo-proxy';
+    const baseUrl = config.baseUrl || 'https://127.0.0.1:6901';
+    // No modo prefixo (/robo/<caminho>) URLs relativas já resolvem certo;
+    // só os caminhos absolutos na raiz precisam receber o prefixo
+    const prefix = config.prefix || '';
+    
+    // EXECUTAR IMEDIATAMENTE - antes de qualquer outro script
+    // Interceptar recursos ANTES que sejam carregados pelo CSS
+    // Isso é crítico porque o CSS pode carregar recursos antes que nosso script execute completamente
+    
+    // Função auxiliar para corrigir URLs
+    // DEFINIR PRIMEIRO para que possa ser usada imediatamente
+    function fixUrl(url) {
+        if (!url || typeof url !== 'string') return url;
+        
+        const originalUrl = url;
+        
+        if (prefix) {
+            if (url.startsWith('/') && !url.startsWith('//') &&
+                url !== prefix && !url.startsWith(prefix + '/')) {
+                return prefix + url;
+            }
+            return url;
+        }
+        
+        // Se já é uma URL absoluta válida e passa pelo proxy, manter
+        if (url.startsWith('/api/robo-proxy')) {
+            // Verificar se a URL está malformada (contém .css/ ou .js/ no path)
+            // Exemplo: /api/robo-proxy?url=https%3A%2F%2F127.0.0.1%3A6901%2Fassets%2Fwebutil-Dix4qgyj.css%2Fsplash-D03O8R4K.jpg
+            if (url.includes('.css/') || url.includes('.js/')) {
+                // Extrair a parte após url=
+                const match = url.match(/url=([^&]+)/);
+                if (match) {
+                    try {
+                        const decodedUrl = decodeURIComponent(match[1]);
+                        console.log('[Proxy] URL malformada detectada, decodificada:', decodedUrl);
+                        
+                        // Extrair o caminho do recurso após .css/ ou .js/
+                        // Padrão: captura o nome do arquivo .css/.js e o caminho após
+                        // Exemplo: /assets/webutil-Dix4qgyj.css/splash-D03O8R4K.jpg
+                        const resourceMatch = decodedUrl.match(/([^/]+\.(css|js))\/([^?&#]+)/);
+                        if (resourceMatch) {
+                            const resourcePath = resourceMatch[3];
+                            // Limpar o caminho do recurso (remover query strings, etc.)
+                            const cleanPath = resourcePath.split('?')[0].split('#')[0];
+                            // Construir URL correta na raiz
+                            // Se o recurso começa com /, usar diretamente, senão adicionar /
+                            const correctedPath = cleanPath.startsWith('/') ? cleanPath : '/' + cleanPath;
+                            const correctedUrl = baseUrl + correctedPath;
+                            const encodedUrl = encodeURIComponent(correctedUrl);
+                            url = proxyBase + '?url=' + encodedUrl;
+                            console.log('[Proxy] URL malformada corrigida:', originalUrl, '->', url);
+                            return url;
+                        }
+                        
+                        // Tentar padrão alternativo: pode ser que o caminho esteja codificado de forma diferente
+                        // Exemplo: assets%2Fwebutil-Dix4qgyj.css%2Fsplash-D03O8R4K.jpg
+                        const altMatch = decodedUrl.match(/([^/]+\.(css|js))\/([^?&#]+)/);
+                        if (altMatch) {
+                            const resourcePath = altMatch[3];
+                            const cleanPath = resourcePath.split('?')[0].split('#')[0];
+                            const correctedPath = cleanPath.startsWith('/') ? cleanPath : '/' + cleanPath;
+                            const correctedUrl = baseUrl + correctedPath;
+                            const encodedUrl = encodeURIComponent(correctedUrl);
+                            url = proxyBase + '?url=' + encodedUrl;
+                            console.log('[Proxy] URL malformada corrigida (padrão alternativo):', originalUrl, '->', url);
+                            return url;
+                        }
+                    } catch (e) {
+                        console.warn('[Proxy] Erro ao decodificar URL:', e, 'URL original:', originalUrl);
+                    }
+                }
+            }
+            return url;
+        }
+        
+        // Se começa com /api/ mas não é /api/robo-proxy, reescrever
+        if (url.startsWith('/api/') && !url.startsWith('/api/robo-proxy')) {
+            const resourcePath = url.replace('/api/', '');
+            const correctedUrl = baseUrl + '/' + resourcePath;
+            const encodedUrl = encodeURIComponent(correctedUrl);
+            url = proxyBase + '?url=' + encodedUrl;
+            console.log('[Proxy] URL /api/ reescrita:', originalUrl, '->', url);
+            return url;
+        }
+        
+        // Se é URL absoluta externa, manter
+        if (url.startsWith('http://') || url.startsWith('https://') || url.startsWith('//') || 
+            url.startsWith('data:') || url.startsWith('blob:') || url.startsWith('javascript:') || 
+            url.startsWith('mailto:') || url.startsWith('tel:') || url.startsWith('#')) {
+            return url;
+        }
+        
+        // Se é URL relativa, converter para proxy
+        const absoluteUrl = url.startsWith('/') ? baseUrl + url : baseUrl + '/' + url;
+        const encodedUrl = encodeURIComponent(absoluteUrl);
+        url = proxyBase + '?url=' + encodedUrl;
+        console.log('[Proxy] URL relativa reescrita:', originalUrl, '->', url);
+        return url;
+    }
+    
+    // INTERCEPTAÇÃO PRECOCE - Executar ANTES de qualquer outro script
+    // Interceptar fetch() e XMLHttpRequest IMEDIATAMENTE para capturar recursos carregados pelo CSS
+    const originalFetch = window.fetch;
+    window.fetch = function(input, init) {
+        let url = typeof input === 'string' ? input : (input.url || input);
+        const fixedUrl = fixUrl(url);
+        if (fixedUrl !== url) {
+            console.log('[Proxy] fetch() URL corrigida (precoce):', url, '->', fixedUrl);
+        }
+        if (typeof input !== 'string' && input instanceof Request) {
+            return originalFetch.call(this, new Request(fixedUrl, init || {}));
+        }
+        return originalFetch.call(this, fixedUrl, init);
+    };
+    
+    const originalXHROpen = XMLHttpRequest.prototype.open;
+    XMLHttpRequest.prototype.open = function(method, url, async, user, password) {
+        const fixedUrl = fixUrl(url);
+        if (fixedUrl !== url) {
+            console.log('[Proxy] XMLHttpRequest URL corrigida (precoce):', url, '->', fixedUrl);
+        }
+        return originalXHROpen.call(this, method, fixedUrl, async, user, password);
+    };
+    
+    // Interceptar WebSocket - DEVE ser executado antes de qualquer outro script
+    window.WebSocket = function(url, protocols) {
+        console.log('[Proxy] WebSocket chamado com URL:', url);
+        
+        // No modo prefixo, tirar o prefixo do caminho antes de montar a URL do servidor original
+        if (prefix) {
+            let path = url;
+            if (url.startsWith('wss://') || url.startsWith('ws://')) {
+                const parsed = new URL(url);
+                if (parsed.host !== window.location.host) {
+                    return new originalWebSocket(url.replace('ws://', 'wss://'), protocols);
+                }
+                path = parsed.pathname + parsed.search;
+            } else if (!url.startsWith('/')) {
+                path = new URL(url, window.location.href).pathname;
+            }
+            if (path === prefix || path.startsWith(prefix + '/')) {
+                path = path.slice(prefix.length) || '/';
+            }
+            console.log('[Proxy] WebSocket rewrite (prefixo):', url, '->', wsBaseUrl + path);
+            return new originalWebSocket(wsBaseUrl + path, protocols);
+        }
+        
+        // Se já é uma URL absoluta wss://, usar diretamente (garantindo HTTPS)
+        if (url.startsWith('wss://')) {
+            console.log('[Proxy] WebSocket wss:// detectado, usando diretamente');
+            return new originalWebSocket(url, protocols);
+        }
+        
+        // Se é ws://, converter para wss://
+        if (url.startsWith('ws://')) {
+            url = url.replace('ws://', 'wss://');
+            console.log('[Proxy] WebSocket ws:// convertido para wss://:', url);
+            return new originalWebSocket(url, protocols);
+        }
+        
+        // Se é URL relativa, construir URL completa com base
+        let fullUrl;
+        if (url.startsWith('/')) {
+            fullUrl = wsBaseUrl + url;
+        } else {
+            fullUrl = wsBaseUrl + '/' + url;
+        }
+        
+        console.log('[Proxy] WebSocket rewrite:', url, '->', fullUrl);
+        return new originalWebSocket(fullUrl, protocols);
+    };
+    
+    // Preservar propriedades do WebSocket original
+    Object.setPrototypeOf(window.WebSocket.prototype, originalWebSocket.prototype);
+    Object.setPrototypeOf(window.WebSocket, originalWebSocket);
+    
+    // Preservar constantes
+    window.WebSocket.CONNECTING = originalWebSocket.CONNECTING;
+    window.WebSocket.OPEN = originalWebSocket.OPEN;
+    window.WebSocket.CLOSING = originalWebSocket.CLOSING;
+    window.WebSocket.CLOSED = originalWebSocket.CLOSED;
+    
+    // fetch() já foi interceptado acima (interceptação precoce)
+    
+    // Interceptar todas as requisições de recursos ANTES que sejam feitas
+    // Isso é crítico para recursos carregados pelo CSS
+    const originalCreateElementNS = document.createElementNS;
+    document.createElementNS = function(namespace, tagName, options) {
+        const element = originalCreateElementNS.call(this, namespace, tagName, options);
+        if (tagName.toLowerCase() === 'style') {
+            // Interceptar quando CSS é adicionado via <style>
+            const originalTextContent = Object.getOwnPropertyDescriptor(Node.prototype, 'textContent');
+            Object.defineProperty(element, 'textContent', {
+                set: function(value) {
+                    if (value) {
+                        // Reescrever URLs no CSS inline
+                        value = value.replace(/url\s*\(\s*(["']?)([^"'()]+?)\s*\)/gi, function(match, quote, url) {
+                            const fixedUrl = fixUrl(url.trim());
+                            return 'url(' + quote + fixedUrl + quote + ')';
+                        });
+                    }
+                    if (originalTextContent && originalTextContent.set) {
+                        originalTextContent.set.call(this, value);
+                    } else {
+                        element.innerHTML = value;
+                    }
+                },
+                get: function() {
+                    return originalTextContent && originalTextContent.get ? originalTextContent.get.call(this) : element.innerHTML;
+                },
+                configurable: true
+            });
+        }
+        return element;
+    };
+    
+    // Interceptar todas as requisições de recursos usando Resource Timing API
+    // Mas mais importante: interceptar quando o CSS tenta carregar recursos
+    // Isso é feito interceptando o carregamento de imagens, fontes, etc.
+    
+    // Interceptar Image constructor para capturar imagens carregadas pelo CSS
+    const originalImage = window.Image;
+    window.Image = function(...args) {
+        const img = new originalImage(...args);
+        const originalSrcSetter = Object.getOwnPropertyDescriptor(HTMLImageElement.prototype, 'src').set;
+        Object.defineProperty(img, 'src', {
+            set: function(value) {
+                const fixedValue = fixUrl(value);
+                if (fixedValue !== value) {
+                    console.log('[Proxy] Image src corrigido:', value, '->', fixedValue);
+                }
+                originalSrcSetter.call(this, fixedValue);
+            },
+            get: function() {
+                return this.getAttribute('src');
+            },
+            configurable: true
+        });
+        return img;
+    };
+    
+    // Interceptar FontFace para capturar fontes carregadas pelo CSS
+    if (window.FontFace) {
+        const originalFontFace = window.FontFace;
+        window.FontFace = function(family, source, descriptors) {
+            if (typeof source === 'string') {
+                source = fixUrl(source);
+            }
+            return new originalFontFace(family, source, descriptors);
+        };
+    }
+    
+    // Interceptar todas as requisições de recursos usando PerformanceObserver
+    // Isso captura recursos carregados pelo CSS antes que sejam requisitados
+    if (window.PerformanceObserver) {
+        try {
+            const resourceObserver = new PerformanceObserver(function(list) {
+                list.getEntries().forEach(function(entry) {
+                    if (entry.initiatorType === 'css' || entry.name.includes('.css/') || entry.name.includes('.js/')) {
+                        const fixedUrl = fixUrl(entry.name);
+                        if (fixedUrl !== entry.name) {
+                            console.log('[Proxy] Recurso CSS detectado e corrigido:', entry.name, '->', fixedUrl);
+                            // Não podemos redirecionar aqui, mas podemos logar para debug
+                        }
+                    }
+                });
+            });
+            resourceObserver.observe({entryTypes: ['resource']});
+        } catch (e) {
+            console.warn('[Proxy] PerformanceObserver não disponível:', e);
+        }
+    }
+    
+    // Interceptar todas as tags <style> para reescrever URLs no CSS inline
+    function rewriteInlineCSS(element) {
+        if (element.tagName === 'STYLE' && element.textContent) {
+            const originalContent = element.textContent;
+            const rewritten = originalContent.replace(/url\s*\(\s*(["']?)([^"'()]+?)\s*\)/gi, function(match, quote, url) {
+                const fixedUrl = fixUrl(url.trim());
+                return 'url(' + quote + fixedUrl + quote + ')';
+            });
+            if (rewritten !== originalContent) {
+                element.textContent = rewritten;
+                console.log('[Proxy] CSS inline reescrito');
+            }
+        }
+    }
+    
+    // Reescrever CSS inline em elementos existentes
+    document.querySelectorAll('style').forEach(rewriteInlineCSS);
+    
+    // Interceptar quando novos elementos <style> são adicionados
+    const styleObserver = new MutationObserver(function(mutations) {
+        mutations.forEach(function(mutation) {
+            mutation.addedNodes.forEach(function(node) {
+                if (node.nodeType === 1 && node.tagName === 'STYLE') {
+                    rewriteInlineCSS(node);
+                }
+            });
+        });
+    });
+    styleObserver.observe(document.documentElement, {
+        childList: true,
+        subtree: true
+    });
+    
+    // Interceptar recursos carregados pelo CSS usando um interceptor de recursos mais agressivo
+    // Isso captura recursos que são carregados diretamente pelo CSS antes que possamos interceptá-los
+    const originalInsertRule = CSSStyleSheet.prototype.insertRule;
+    CSSStyleSheet.prototype.insertRule = function(rule, index) {
+        if (rule && typeof rule === 'string') {
+            const rewritten = rule.replace(/url\s*\(\s*(["']?)([^"'()]+?)\s*\)/gi, function(match, quote, url) {
+                const fixedUrl = fixUrl(url.trim());
+                return 'url(' + quote + fixedUrl + quote + ')';
+            });
+            if (rewritten !== rule) {
+                console.log('[Proxy] CSS insertRule reescrito');
+                rule = rewritten;
+            }
+        }
+        return originalInsertRule.call(this, rule, index);
+    };
+    
+    // Interceptar quando estilos são adicionados via CSSStyleSheet
+    const originalAddRule = CSSStyleSheet.prototype.addRule;
+    if (originalAddRule) {
+        CSSStyleSheet.prototype.addRule = function(selector, style, index) {
+            if (style && typeof style === 'string') {
+                const rewritten = style.replace(/url\s*\(\s*(["']?)([^"'()]+?)\s*\)/gi, function(match, quote, url) {
+                    const fixedUrl = fixUrl(url.trim());
+                    return 'url(' + quote + fixedUrl + quote + ')';
+                });
+                if (rewritten !== style) {
+                    console.log('[Proxy] CSS addRule reescrito');
+                    style = rewritten;
+                }
+            }
+            return originalAddRule.call(this, selector, style, index);
+        };
+    }
+    
+    // Interceptar getComputedStyle para corrigir URLs em background-image, etc.
+    const originalGetComputedStyle = window.getComputedStyle;
+    window.getComputedStyle = function(element, pseudoElement) {
+        const style = originalGetComputedStyle.call(this, element, pseudoElement);
+        
+        // Interceptar getPropertyValue para corrigir URLs
+        const originalGetPropertyValue = style.getPropertyValue;
+        style.getPropertyValue = function(property) {
+            const value = originalGetPropertyValue.call(this, property);
+            if (value && (property === 'background-image' || property === 'background' || property === 'content')) {
+                // Tentar corrigir URLs em valores CSS
+                const urlMatch = value.match(/url\(["']?([^"')]+)["']?\)/);
+                if (urlMatch) {
+                    const url = urlMatch[1];
+                    const fixedUrl = fixUrl(url);
+                    if (fixedUrl !== url) {
+                        return value.replace(url, fixedUrl);
+                    }
+                }
+            }
+            return value;
+        };
+        
+        return style;
+    };
+    
+    // Interceptar também o setter da propriedade 'src' de elementos para capturar recursos carregados pelo CSS
+    // Isso é crítico porque o CSS pode carregar recursos antes que nosso script execute
+    const originalDefineProperty = Object.defineProperty;
+    const interceptedElements = new WeakSet();
+    
+    function interceptElementSrc(element) {
+        if (interceptedElements.has(element)) return;
+        interceptedElements.add(element);
+        
+        // Interceptar src para img, script, link, etc.
+        if (element.tagName === 'IMG' || element.tagName === 'SCRIPT' || element.tagName === 'LINK') {
+            const attrName = element.tagName === 'LINK' ? 'href' : 'src';
+            const originalDescriptor = Object.getOwnPropertyDescriptor(element, attrName);
+            
+            if (!originalDescriptor || originalDescriptor.configurable) {
+                Object.defineProperty(element, attrName, {
+                    get: function() {
+                        const value = this.getAttribute(attrName);
+                        return value ? fixUrl(value) : value;
+                    },
+                    set: function(value) {
+                        const fixedValue = fixUrl(value);
+                        this.setAttribute(attrName, fixedValue);
+                        if (fixedValue !== value) {
+                            console.log('[Proxy] ' + element.tagName + ' ' + attrName + ' corrigido:', value, '->', fixedValue);
+                        }
+                    },
+                    configurable: true,
+                    enumerable: true
+                });
+            }
+        }
+    }
+    
+    // Interceptar todos os elementos existentes
+    document.querySelectorAll('img, script, link').forEach(interceptElementSrc);
+    
+    // Interceptar TODAS as requisições de recursos usando um interceptor global
+    // Isso captura recursos carregados pelo CSS que não passam por fetch/XMLHttpRequest
+    const originalCreateElement = document.createElement;
+    document.createElement = function(tagName, options) {
+        const element = originalCreateElement.call(this, tagName, options);
+        
+        // Interceptar elementos que podem carregar recursos
+        if (tagName.toLowerCase() === 'link' || tagName.toLowerCase() === 'script' || tagName.toLowerCase() === 'img') {
+            const originalSetAttribute = element.setAttribute;
+            element.setAttribute = function(name, value) {
+                if ((name === 'href' || name === 'src') && value) {
+                    const fixedValue = fixUrl(value);
+                    if (fixedValue !== value) {
+                        console.log('[Proxy] <' + tagName + '> ' + name + ' corrigido:', value, '->', fixedValue);
+                    }
+                    return originalSetAttribute.call(this, name, fixedValue);
+                }
+                return originalSetAttribute.call(this, name, value);
+            };
+            
+            // Interceptar também propriedades diretas
+            if (tagName.toLowerCase() === 'link') {
+                Object.defineProperty(element, 'href', {
+                    get: function() {
+                        return this.getAttribute('href');
+                    },
+                    set: function(value) {
+                        const fixedValue = fixUrl(value);
+                        this.setAttribute('href', fixedValue);
+                    },
+                    configurable: true
+                });
+            } else if (tagName.toLowerCase() === 'script' || tagName.toLowerCase() === 'img') {
+                Object.defineProperty(element, 'src', {
+                    get: function() {
+                        return this.getAttribute('src');
+                    },
+                    set: function(value) {
+                        const fixedValue = fixUrl(value);
+                        this.setAttribute('src', fixedValue);
+                    },
+                    configurable: true
+                });
+            }
+            
+            // Interceptar este elemento também
+            interceptElementSrc(element);
+        }
+        
+        return element;
+    };
+    
+    
+    // Interceptar elementos já existentes no DOM
+    function fixExistingElements() {
+        // Corrigir <link> tags
+        document.querySelectorAll('link[href]').forEach(link => {
+            const href = link.getAttribute('href');
+            if (href) {
+                const fixedHref = fixUrl(href);
+                if (fixedHref !== href) {
+                    link.setAttribute('href', fixedHref);
+                    console.log('[Proxy] <link> existente corrigido:', href, '->', fixedHref);
+                }
+                // Interceptar este elemento
+                interceptElementSrc(link);
+            }
+        });
+        
+        // Corrigir <script> tags
+        document.querySelectorAll('script[src]').forEach(script => {
+            const src = script.getAttribute('src');
+            if (src) {
+                const fixedSrc = fixUrl(src);
+                if (fixedSrc !== src) {
+                    script.setAttribute('src', fixedSrc);
+                    console.log('[Proxy] <script> existente corrigido:', src, '->', fixedSrc);
+                }
+                // Interceptar este elemento
+                interceptElementSrc(script);
+            }
+        });
+        
+        // Corrigir <img> tags
+        document.querySelectorAll('img[src]').forEach(img => {
+            const src = img.getAttribute('src');
+            if (src) {
+                const fixedSrc = fixUrl(src);
+                if (fixedSrc !== src) {
+                    img.setAttribute('src', fixedSrc);
+                    console.log('[Proxy] <img> existente corrigido:', src, '->', fixedSrc);
+                }
+                // Interceptar este elemento
+                interceptElementSrc(img);
+            }
+        });
+    }
+    
+    // Executar imediatamente e também quando o DOM estiver pronto
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', fixExistingElements);
+    } else {
+        fixExistingElements();
+    }
+    
+    // Usar MutationObserver para interceptar elementos adicionados dinamicamente
+    // Consolidar com o resourceObserver anterior
+    const observer = new MutationObserver(function(mutations) {
+        mutations.forEach(function(mutation) {
+            mutation.addedNodes.forEach(function(node) {
+                if (node.nodeType === 1) { // Element node
+                    // Corrigir URLs em elementos que podem carregar recursos
+                    if (node.tagName === 'LINK' && node.href) {
+                        const fixedHref = fixUrl(node.href);
+                        if (fixedHref !== node.href) {
+                            node.setAttribute('href', fixedHref);
+                            console.log('[Proxy] <link> dinâmico corrigido:', node.href, '->', fixedHref);
+                        }
+                        interceptElementSrc(node);
+                    } else if (node.tagName === 'SCRIPT' && node.src) {
+                        const fixedSrc = fixUrl(node.src);
+                        if (fixedSrc !== node.src) {
+                            node.setAttribute('src', fixedSrc);
+                            console.log('[Proxy] <script> dinâmico corrigido:', node.src, '->', fixedSrc);
+                        }
+                        interceptElementSrc(node);
+                    } else if (node.tagName === 'IMG' && node.src) {
+                        const fixedSrc = fixUrl(node.src);
+                        if (fixedSrc !== node.src) {
+                            node.setAttribute('src', fixedSrc);
+                            console.log('[Proxy] <img> dinâmico corrigido:', node.src, '->', fixedSrc);
+                        }
+                        interceptElementSrc(node);
+                    }
+                    
+                    // Corrigir URLs em atributos style inline
+                    if (node.hasAttribute('style')) {
+                        const originalStyle = node.getAttribute('style');
+                        const fixedStyle = originalStyle.replace(/url\s*\(\s*(["']?)([^"'()]+?)\s*\)/gi, function(match, quote, url) {
+                            const fixedUrl = fixUrl(url.trim());
+                            return 'url(' + quote + fixedUrl + quote + ')';
+                        });
+                        if (fixedStyle !== originalStyle) {
+                            node.setAttribute('style', fixedStyle);
+                            console.log('[Proxy] Estilo inline corrigido');
+                        }
+                    }
+                }
+            });
+            
+            // Interceptar mudanças em atributos src/href
+            if (mutation.type === 'attributes') {
+                const target = mutation.target;
+                if (mutation.attributeName === 'src' || mutation.attributeName === 'href') {
+                    const originalValue = target.getAttribute(mutation.attributeName);
+                    if (originalValue) {
+                        const fixedValue = fixUrl(originalValue);
+                        if (fixedValue !== originalValue) {
+                            target.setAttribute(mutation.attributeName, fixedValue);
+                            console.log('[Proxy] Atributo ' + mutation.attributeName + ' modificado corrigido:', originalValue, '->', fixedValue);
+                        }
+                    }
+                }
+            }
+        });
+    });
+    
+    observer.observe(document.documentElement, {
+        childList: true,
+        subtree: true,
+        attributes: true,
+        attributeFilter: ['src', 'href', 'style']
+    });
+})();
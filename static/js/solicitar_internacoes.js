@@ -180,7 +180,9 @@
         const modalHeader = modalRobo ? modalRobo.querySelector('.modal-header') : null;
         
         // URL do serviço do robô - usar proxy para melhor performance
-        const targetUrl = '/api/robo-proxy?url=' + encodeURIComponent('https://cms.michelpaes.com.br');
+        // URL definida pelo servidor conforme o modo do proxy (query ou prefixo /robo/)
+        const targetUrl = (iframeRobo && iframeRobo.dataset.roboUrl) ||
+            '/api/robo-proxy?url=' + encodeURIComponent('https://cms.michelpaes.com.br');
         
         // NÃO carregar o iframe imediatamente - apenas quando o modal for aberto
         // Isso melhora a performance inicial
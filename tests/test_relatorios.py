@@ -0,0 +1,155 @@
+"""
+Testes do armazenamento dos relatórios (relatorios.py)
+
+Executar na raiz do projeto:
+    python3 -m pytest tests
+"""
+
+import csv
+import os
+import sys
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import relatorios  # noqa: E402
+
+# Rotinas que o csv.writer grava entre aspas, com quebras de linha e
+# separadores de linha Unicode que não encerram o registro
+ROTINAS_ESPECIAIS = [
+    'Linha1\nLinha2',
+    'Linha1\r\nLinha2',
+    'Sep\u2028X',
+    'Par\u2029X',
+    'Nel\x85X',
+    'Ff\x0cVt\x0bX',
+    'Com "aspas"\ne quebra',
+    'Vírgula, simples',
+]
+
+
+def _gravar_csv(caminho, linhas, modo='w'):
+    with open(caminho, modo, newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if modo == 'w':
+            writer.writerow(relatorios.CABECALHO)
+        writer.writerows(linhas)
+
+
+def _linhas_exemplo():
+    linhas = []
+    for i, rotina in enumerate(ROTINAS_ESPECIAIS):
+        linhas.append([f'{10 + i:02d}/08/2026', f'10:00:{i:02d}', rotina, 'ana', str(i + 1)])
+        linhas.append([f'{10 + i:02d}/08/2026', f'11:00:{i:02d}', 'Rotina comum', 'bia', '2'])
+    return linhas
+
+
+def _esperado(caminho):
+    """Registros como o csv.DictReader lê o arquivo (mesmas normalizações de _interpretar)"""
+    with open(caminho, 'r', newline='', encoding='utf-8') as f:
+        return [(relatorios.parse_data(r['data']), r['hora'], r['rotina'].strip(), r['usuario'].strip(),
+                 int(r['registros'])) for r in csv.DictReader(f)]
+
+
+def _lidos(tabela):
+    visao = tabela.visao()
+    return [tuple(r) for r in relatorios._registros_da_visao(visao, range(visao.n))]
+
+
+class LeitorIncrementalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.caminho = Path(self.diretorio.name) / 'relatorio.csv'
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_campos_com_quebras_de_linha_como_dictreader(self):
+        _gravar_csv(self.caminho, _linhas_exemplo())
+        self.assertEqual(_lidos(relatorios.TabelaColunar(self.caminho).atualizar()), _esperado(self.caminho))
+
+    def test_acrescimo_cortado_dentro_de_aspas(self):
+        _gravar_csv(self.caminho, _linhas_exemplo()[:2])
+        tabela = relatorios.TabelaColunar(self.caminho).atualizar()
+        # Registro gravado em duas etapas, cortado no meio do campo entre aspas
+        with open(self.caminho, 'ab') as f:
+            f.write(b'20/08/2026,12:00:00,"Primeira\n')
+        tabela.atualizar()
+        self.assertEqual(len(tabela), 3)  # Registro incompleto aplicado provisoriamente
+        with open(self.caminho, 'ab') as f:
+            f.write(b'segunda",ana,5\r\n')
+        _gravar_csv(self.caminho, _linhas_exemplo()[2:], modo='a')
+        tabela.atualizar()
+        self.assertEqual(_lidos(tabela), _esperado(self.caminho))
+        self.assertEqual(tabela.recargas, 1)  # Só a primeira leitura
+        self.assertIn('Primeira\nsegunda', tabela.nomes_rotinas)
+
+    def test_totais_diarios_com_quebras_de_linha(self):
+        _gravar_csv(self.caminho, _linhas_exemplo())
+        rollup = relatorios.RollupDiario(self.caminho, Path(self.diretorio.name) / 'diario.json')
+        rollup.reconstruir()
+        totais = {(t.data, t.rotina): t.registros for t in rollup.totais()}
+        for data, _, rotina, _, registros in _esperado(self.caminho):
+            if rotina != 'Rotina comum':
+                self.assertEqual(totais[(data, rotina)], registros)
+
+
+class IndiceDatasTest(unittest.TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.caminho = Path(self.diretorio.name) / 'relatorio.csv'
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_trechos_comecam_em_registros_inteiros(self):
+        linhas = _linhas_exemplo()
+        # Primeiro registro de cada dia com quebras de linha entre aspas; a
+        # segunda linha física dele começa com a data do dia seguinte
+        linhas = [[data, hora, f'Abre\n{int(data[:2]) + 1:02d}{data[2:]},com "aspas"', usuario, registros]
+                  if hora.startswith('10:') else [data, hora, rotina, usuario, registros]
+                  for data, hora, rotina, usuario, registros in linhas]
+        _gravar_csv(self.caminho, linhas)
+        indice = relatorios.IndiceDatas(self.caminho, Path(self.diretorio.name) / 'indice.json').atualizar()
+        esperado = _esperado(self.caminho)
+        self.assertEqual(len(indice.dias), len(ROTINAS_ESPECIAIS))
+        for dia in indice.dias:
+            inicio = date.fromordinal(dia)
+            identidade, colunas, byte_inicial, byte_final = indice.trecho(inicio, inicio)
+            tabela = relatorios.TabelaColunar.ler_trecho(self.caminho, identidade, colunas, byte_inicial, byte_final)
+            self.assertEqual([r for r in _lidos(tabela) if r[0] == inicio], [r for r in esperado if r[0] == inicio])
+            self.assertTrue(_lidos(tabela)[0][2].startswith('Abre\n'))
+
+
+class ArquivamentoTest(unittest.TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.caminho = Path(self.diretorio.name) / 'relatorio.csv'
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_particionar_preserva_campos_com_quebras_de_linha(self):
+        linhas = _linhas_exemplo() + [['05/10/2026', '09:00:00', 'Mês\naberto', 'ana', '4']]
+        _gravar_csv(self.caminho, linhas)
+        esperado = _esperado(self.caminho)
+        store = relatorios.CsvStore(self.caminho)
+        movidas = store.arquivar(hoje=date(2026, 10, 19))
+        self.assertEqual(movidas, {'2026-08': len(linhas) - 1})
+        # Nenhum fragmento de registro fica para trás no relatorio.csv
+        self.assertEqual(_esperado(self.caminho), esperado[-1:])
+        particao = store.particoes.diretorio / '2026-08.csv'
+        self.assertEqual(_esperado(particao), esperado[:-1])
+        resumo = {(c[1], c[2]): c[3] for c in store.particoes.lista()[0]._celulas}
+        self.assertEqual(resumo[('Linha1\nLinha2', 'ana')], 1)
+        self.assertEqual(sorted(tuple(r) for r in store.registros()), sorted(esperado))
+
+
+if __name__ == '__main__':
+    unittest.main()
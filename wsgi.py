@@ -8,8 +8,9 @@ import os
 # Adiciona o diretório do projeto ao path
 sys.path.insert(0, os.path.dirname(__file__))
 
-from app import app as application
+from app import app as application, iniciar_aquecedor_proxy
 
 if __name__ == "__main__":
+    iniciar_aquecedor_proxy()
     application.run()
 